@@ -0,0 +1,146 @@
+'''
+Tests of thunder_download against a Range-capable server on localhost
+'''
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import asyncio
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+import thunder_download
+
+PAYLOAD = bytes(range(256)) * 256  # 64 KiB
+SEGMENT_SIZE = 1024
+RANGE_PATTERN = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD at /file.bin, honouring single byte ranges"""
+    protocol_version = 'HTTP/1.1'
+    requests = None      # ranges asked for, set per server
+    fail_at = None       # segment start answered with 404
+    shift_range = False  # answer segment requests with the wrong Content-Range
+    delay = 0.0          # seconds to stall midway through a segment
+
+    def do_GET(self):
+        match = RANGE_PATTERN.fullmatch(self.headers.get('Range', ''))
+        if match is None:
+            self.send(200, PAYLOAD)
+            return
+        start = int(match.group(1))
+        end = int(match.group(2)) + 1 if match.group(2) else len(PAYLOAD)
+        self.requests.append((start, end))
+        is_probe = (start, end) == (0, 1)
+        if not is_probe and start == self.fail_at:
+            self.send(404, b'')
+            return
+        shown = 0 if self.shift_range and not is_probe else start
+        self.send(206, PAYLOAD[start:end],
+                  f"bytes {shown}-{shown + end - start - 1}/{len(PAYLOAD)}")
+
+    def send(self, status, body, content_range=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        if content_range is not None:
+            self.send_header('Content-Range', content_range)
+        self.end_headers()
+        half = len(body) // 2
+        self.wfile.write(body[:half])
+        self.wfile.flush()
+        if self.delay and status == 206 and len(body) > 1:
+            time.sleep(self.delay)
+        self.wfile.write(body[half:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.object(thunder_download, 'MIN_SEGMENT_SIZE', SEGMENT_SIZE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, **options):
+        """Start a RangeHandler server; return the URL of its file"""
+        self.requests = []
+        handler = type('Handler', (RangeHandler,), dict(options, requests=self.requests))
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_address[1]}/file.bin'
+
+    def download(self, url):
+        """Download url; return its result and the tasks still pending afterwards"""
+        async def run():
+            downloader = thunder_download.Downloader(self.directory.name, retries=0)
+            [result] = await downloader.download_many([url])
+            return result, asyncio.all_tasks() - {asyncio.current_task()}
+        return asyncio.run(run())
+
+    def path(self, name='file.bin'):
+        return os.path.join(self.directory.name, name)
+
+    def test_segmented_download(self):
+        url = self.serve()
+        result, pending = self.download(url)
+        self.assertEqual(result.status, thunder_download.STATUS_DONE)
+        self.assertEqual(result.size, len(PAYLOAD))
+        with open(self.path(), 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        starts = {start for start, _ in self.requests[1:]}
+        self.assertEqual(len(starts), thunder_download.DEFAULT_SEGMENTS)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['file.bin'])
+        self.assertFalse(pending)
+
+    def test_resume_from_checkpoint(self):
+        url = self.serve()
+        half = len(PAYLOAD) // 2
+        segments = [[half, half], [half + 100, len(PAYLOAD)]]
+        with open(self.path() + thunder_download.PART_SUFFIX, 'wb') as f:
+            f.write(PAYLOAD[:half + 100] + bytes(len(PAYLOAD) - half - 100))
+        thunder_download.DownloadState(self.path() + thunder_download.STATE_SUFFIX,
+                                       url, len(PAYLOAD), segments).save()
+        result, _ = self.download(url)
+        self.assertEqual(result.status, thunder_download.STATUS_DONE)
+        with open(self.path(), 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        # Only the missing tail is fetched, after the one-byte probe
+        self.assertEqual(self.requests, [(0, 1), (half + 100, len(PAYLOAD))])
+        self.assertFalse(os.path.exists(self.path() + thunder_download.STATE_SUFFIX))
+
+    def test_content_range_mismatch(self):
+        url = self.serve(shift_range=True)
+        result, pending = self.download(url)
+        self.assertEqual(result.status, thunder_download.STATUS_FAILED)
+        self.assertIn('Content-Range', result.error)
+        self.assertFalse(pending)
+
+    def test_failing_segment_stops_the_others(self):
+        url = self.serve(fail_at=0, delay=2.0)
+        started = time.monotonic()
+        result, pending = self.download(url)
+        self.assertEqual(result.status, thunder_download.STATUS_FAILED)
+        self.assertEqual(result.error, 'range request answered with HTTP 404')
+        self.assertFalse(pending)
+        self.assertLess(time.monotonic() - started, 1.5)
+        # The stopped segments are checkpointed, so a later run resumes them
+        state = thunder_download.DownloadState.load(self.path() + thunder_download.STATE_SUFFIX)
+        self.assertEqual(state.size, len(PAYLOAD))
+        with open(self.path() + thunder_download.PART_SUFFIX, 'rb') as f:
+            data = f.read()
+        planned = thunder_download.split_segments(len(PAYLOAD), thunder_download.DEFAULT_SEGMENTS)
+        for (start, _), (pos, _) in zip(planned, state.segments):
+            self.assertEqual(data[start:pos], PAYLOAD[start:pos])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+'''
+Tests of thunder_probe against http.server on localhost
+'''
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+import os
+import tempfile
+import threading
+import unittest
+import thunder_probe
+
+BODY = b'thunder-https\n'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serves a directory, without logging to stderr"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GetOnlyHandler(BaseHTTPRequestHandler):
+    """Answers GET only; http.server answers HEAD with 501 Not Implemented"""
+    methods = None  # methods received, set per server
+
+    def do_GET(self):
+        self.methods.append(self.command)
+        self.send_response(206)
+        self.send_header('Content-Range', f"bytes 0-0/{len(BODY)}")
+        self.send_header('Content-Length', '1')
+        self.end_headers()
+        self.wfile.write(BODY[:1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProbeTest(unittest.TestCase):
+
+    def serve(self, handler):
+        """Start a server for handler; return its base URL"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    def serve_directory(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, 'file.txt'), 'wb') as f:
+            f.write(BODY)
+        os.mkdir(os.path.join(directory.name, 'folder'))
+        return self.serve(partial(QuietHandler, directory=directory.name))
+
+    def test_ok(self):
+        base = self.serve_directory()
+        [result] = thunder_probe.probe_urls([base + '/file.txt'])
+        self.assertEqual(result, thunder_probe.ProbeResult(
+            base + '/file.txt', 200, len(BODY), base + '/file.txt', None))
+
+    def test_redirect(self):
+        # http.server redirects a folder without its trailing slash
+        base = self.serve_directory()
+        [result] = thunder_probe.probe_urls([base + '/folder'])
+        self.assertEqual(result.status, 200)
+        self.assertEqual(result.final_url, base + '/folder/')
+        self.assertIsNone(result.error)
+
+    def test_not_found(self):
+        base = self.serve_directory()
+        [result] = thunder_probe.probe_urls([base + '/missing.txt'])
+        self.assertEqual(result.status, 404)
+        self.assertIsNone(result.error)
+
+    def test_results_in_input_order(self):
+        base = self.serve_directory()
+        urls = [base + '/missing.txt', base + '/file.txt', base + '/folder']
+        results = thunder_probe.probe_urls(urls, concurrency=2)
+        self.assertEqual([result.url for result in results], urls)
+        self.assertEqual([result.status for result in results], [404, 200, 200])
+
+    def test_head_not_implemented_falls_back_to_get(self):
+        handler = type('Handler', (GetOnlyHandler,), {'methods': []})
+        base = self.serve(handler)
+        [result] = thunder_probe.probe_urls([base + '/file.txt'])
+        self.assertEqual(result.status, 206)
+        # The size comes from the Content-Range of the one-byte GET
+        self.assertEqual(result.content_length, len(BODY))
+        self.assertEqual(handler.methods, ['GET'])
+
+    def test_connection_refused(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+        port = server.server_address[1]
+        server.server_close()
+        [result] = thunder_probe.probe_urls([f'http://127.0.0.1:{port}/'], retries=0)
+        self.assertIsNone(result.status)
+        self.assertTrue(result.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
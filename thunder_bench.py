@@ -0,0 +1,319 @@
+'''
+Benchmark suite for the thunder-https conversion pipeline
+Generates a reproducible synthetic corpus and measures links/sec, p50/p99
+per-link latency and peak memory of each decode path, printing the
+results as JSON so runs can be compared across releases.
+
+Usage:
+    python thunder_bench.py --lines 1000000 --output bench.json
+    python thunder_bench.py --lines 100000000 --corpus big.txt --paths stream,parallel
+'''
+from array import array
+from itertools import chain, islice
+from urllib import parse
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import thunder_core
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PATHS = ('single', 'batch', 'parallel', 'stream', 'mmap', 'render')
+
+# Share of each kind of line in the corpus, the rest is valid links
+DEFAULT_MIX = {
+    'bad_prefix': 0.02,
+    'bad_base64': 0.03,
+    'bad_envelope': 0.03,
+    'non_utf8': 0.02,
+    'long_url': 0.02,
+}
+
+# Latency percentiles are computed from at most this many samples; on
+# larger corpora each sample covers a group of consecutive links
+MAX_SAMPLES = 200000
+
+BATCH_SIZE = 10000
+RENDER_MAX_LINES = 1000000
+EXTENSIONS = ('zip', 'mp4', 'mkv', 'exe', 'rar', 'iso', 'pdf')
+POPULAR_POOL_SIZE = 1000
+
+
+def encode(payload):
+    return 'thunder://' + base64.b64encode(payload).decode('ascii')
+
+
+def make_url(rng, i):
+    host = f"mirror{rng.randrange(50)}.example.com"
+    name = f"file_{i}.{rng.choice(EXTENSIONS)}"
+    if rng.random() < 0.3:
+        name = parse.quote(f"资源_{i}.{rng.choice(EXTENSIONS)}")
+    return f"http://{host}/files/{i % 997}/{name}"
+
+
+def make_line(rng, i, kind):
+    """Build one corpus line of the given kind"""
+    if kind == 'bad_prefix':
+        return 'thunderx://' + make_url(rng, i)
+    if kind == 'bad_base64':
+        link = encode(b'AA' + make_url(rng, i).encode() + b'ZZ')
+        return link.rstrip('=')[:-1]
+    if kind == 'bad_envelope':
+        return encode(make_url(rng, i).encode())
+    if kind == 'non_utf8':
+        return encode(b'AA' + make_url(rng, i).encode() + b'\xff\xfeZZ')
+    if kind == 'long_url':
+        url = make_url(rng, i) + '?q=' + 'x' * rng.randrange(2048, 8192)
+        return encode(b'AA' + url.encode() + b'ZZ')
+    return encode(b'AA' + make_url(rng, i).encode() + b'ZZ')
+
+
+def generate_corpus(lines, seed=0, mix=None, dup_ratio=0.3):
+    """Yield a reproducible mix of valid, malformed and duplicated links"""
+    rng = random.Random(seed)
+    mix = DEFAULT_MIX if mix is None else mix
+    kinds = list(mix) + ['valid']
+    weights = list(mix.values()) + [max(0.0, 1.0 - sum(mix.values()))]
+    popular = [make_line(rng, i, 'valid') for i in range(POPULAR_POOL_SIZE)]
+    for i in range(lines):
+        if rng.random() < dup_ratio:
+            yield rng.choice(popular)
+        else:
+            yield make_line(rng, i, rng.choices(kinds, weights)[0])
+
+
+def write_corpus(path, lines, seed, dup_ratio):
+    with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        for line in generate_corpus(lines, seed, dup_ratio=dup_ratio):
+            f.write(line)
+            f.write('\n')
+
+
+def count_lines(path):
+    """Count the lines of a corpus file, a last line without newline included"""
+    count = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+    return count + (last != b'\n')
+
+
+def read_batches(path, size):
+    """Yield lists of stripped links read from the corpus file"""
+    with open(path, encoding='utf-8', buffering=1 << 20) as f:
+        batch = []
+        for link in thunder_core.iter_links(f):
+            batch.append(link)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def timed_results(results, group):
+    """Consume results, sampling the per-link latency once every group links"""
+    samples = array('d')
+    count = 0
+    clock = time.perf_counter
+    last = clock()
+    for _ in results:
+        count += 1
+        if count % group == 0:
+            now = clock()
+            samples.append((now - last) / group)
+            last = now
+    return count, samples
+
+
+def path_results(name, corpus, lines, workers):
+    """Return (results iterator, natural latency group) for a decode path"""
+    if name == 'single':
+        decode = thunder_core.decode_link
+        links = chain.from_iterable(read_batches(corpus, BATCH_SIZE))
+        return (decode(link) for link in links), 1
+    if name == 'batch':
+        batches = read_batches(corpus, BATCH_SIZE)
+        return chain.from_iterable(map(thunder_core.decode_many, batches)), BATCH_SIZE
+    if name == 'parallel':
+        links = chain.from_iterable(read_batches(corpus, BATCH_SIZE))
+        return thunder_core.decode_parallel(links, workers), thunder_core.CHUNK_SIZE
+    if name == 'mmap':
+        # Memory-mapped bytes lines through the bytes fast path
+        return thunder_core.decode_stream(thunder_core.iter_mapped_lines(corpus)), 1
+    return stream_results(corpus), 1
+
+
+def stream_results(corpus):
+    with open(corpus, encoding='utf-8', buffering=1 << 20) as f:
+        yield from thunder_core.decode_stream(f)
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_kb(children=False):
+    """Peak resident memory in KB, or None when unavailable"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def bench_render(corpus):
+    """Compare building the result text with join against += concatenation"""
+    # Only the rendered lines are decoded, whatever the corpus size
+    results = thunder_core.decode_many(
+        islice(chain.from_iterable(read_batches(corpus, BATCH_SIZE)), RENDER_MAX_LINES))
+    texts = [r.url if r.url is not None else f"# Error: {r.link}" for r in results]
+
+    start = time.perf_counter()
+    "\n".join(texts)
+    join_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = ""
+    for text in texts:
+        output += text + "\n"
+    concat_seconds = time.perf_counter() - start
+
+    return {
+        'path': 'render',
+        'lines': len(texts),
+        'join_seconds': join_seconds,
+        'concat_seconds': concat_seconds,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def bench_path(name, corpus, lines, workers):
+    """Run one decode path over the corpus and return its measurements"""
+    if name == 'render':
+        return bench_render(corpus)
+    results, group = path_results(name, corpus, lines, workers)
+    group = max(group, lines // MAX_SAMPLES)
+    start = time.perf_counter()
+    count, samples = timed_results(results, group)
+    seconds = time.perf_counter() - start
+    report = {
+        'path': name,
+        'lines': count,
+        'seconds': seconds,
+        'links_per_sec': count / seconds if seconds else None,
+        'latency_group': group,
+        'p50_us': None,
+        'p99_us': None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+    if samples:
+        report['p50_us'] = percentile(samples, 0.50) * 1e6
+        report['p99_us'] = percentile(samples, 0.99) * 1e6
+    if name == 'parallel':
+        report['workers'] = workers or os.cpu_count()
+        report['workers_peak_rss_kb'] = peak_rss_kb(children=True)
+    return report
+
+
+def _bench_child(conn, name, corpus, lines, workers):
+    conn.send(bench_path(name, corpus, lines, workers))
+    conn.close()
+
+
+def run_isolated(name, corpus, lines, workers):
+    """Run a path in a fresh process so peak memory is measured per path"""
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_bench_child, args=(child, name, corpus, lines, workers))
+    process.start()
+    child.close()
+    report = parent.recv()
+    process.join()
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the thunder-https decode paths")
+    parser.add_argument('--lines', type=int, default=100000,
+                        help="corpus size in lines (default: 100000)")
+    parser.add_argument('--seed', type=int, default=0, help="corpus random seed")
+    parser.add_argument('--dup-ratio', type=float, default=0.3,
+                        help="share of lines repeating a popular link (default: 0.3)")
+    parser.add_argument('--corpus', metavar='PATH',
+                        help="reuse this corpus file, generating it if missing")
+    parser.add_argument('--paths', default=','.join(PATHS),
+                        help=f"comma separated paths to run (default: {','.join(PATHS)})")
+    parser.add_argument('-j', '--workers', type=int, default=0, metavar='N',
+                        help="worker processes for the parallel path (0 = one per CPU core)")
+    parser.add_argument('-o', '--output', metavar='PATH',
+                        help="write the JSON report here instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    paths = [p for p in args.paths.split(',') if p]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        print(f"Error: unknown paths: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    corpus = args.corpus
+    temp_corpus = None
+    if corpus is None:
+        fd, temp_corpus = tempfile.mkstemp(suffix='.txt', prefix='thunder_bench_')
+        os.close(fd)
+        corpus = temp_corpus
+    try:
+        lines = args.lines
+        if temp_corpus or not os.path.exists(corpus):
+            write_corpus(corpus, lines, args.seed, args.dup_ratio)
+        else:
+            # A reused corpus may have been generated with another --lines
+            lines = count_lines(corpus)
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'corpus': {
+                'lines': lines,
+                'seed': args.seed,
+                'dup_ratio': args.dup_ratio,
+                'mix': DEFAULT_MIX,
+                'bytes': os.path.getsize(corpus),
+            },
+            'results': [run_isolated(name, corpus, lines, args.workers or None)
+                        for name in paths],
+        }
+    finally:
+        if temp_corpus:
+            os.remove(temp_corpus)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+'''
+LRU decode cache for thunder-https
+Scraped inputs repeat the same links many times, so decoded results are
+kept in a bounded LRU cache keyed by the input link. The cache can be
+saved to a local SQLite file and reloaded on the next run.
+
+Results depend on the decoder (e.g. thunder_schemes.decode_any also
+decodes flashget:// links that decode_link rejects), so a saved cache
+records the decoder that filled it and is dropped when loaded for another.
+'''
+from collections import OrderedDict
+import sys
+import thunder_core
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CREATE_TABLE_SQL = ('CREATE TABLE IF NOT EXISTS decode_cache '
+                    '(link TEXT PRIMARY KEY, url TEXT, status TEXT, error TEXT, detail TEXT)')
+CREATE_INFO_SQL = 'CREATE TABLE IF NOT EXISTS cache_info (key TEXT PRIMARY KEY, value TEXT)'
+
+# Rough per-entry cost of the OrderedDict slot and DecodeResult tuple
+ENTRY_OVERHEAD = 200
+
+
+def decoder_name(decode):
+    """Return the name a saved cache records for its decoder"""
+    return f'{decode.__module__}.{decode.__qualname__}'
+
+
+class DecodeCache:
+    """Bounded LRU cache of DecodeResults with hit/miss/eviction counters
+
+    decode is the decoder whose results are cached; stale is set when the
+    file at path was filled by another decoder and has been dropped.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 path=None, decode=thunder_core.decode_link):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.decoder = decode
+        self.stale = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, link):
+        return link in self._entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, link):
+        """Return the cached result for link, or None on a miss"""
+        result = self._entries.get(link)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(link)
+        self.hits += 1
+        return result
+
+    def put(self, link, result):
+        """Store a result, evicting the least recently used entries if needed"""
+        if link in self._entries:
+            self._bytes -= self._sizes[link]
+            self._entries.move_to_end(link)
+        size = sys.getsizeof(link) + sys.getsizeof(result.url) + ENTRY_OVERHEAD
+        self._entries[link] = result
+        self._sizes[link] = size
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            old_link, _ = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_link)
+            self.evictions += 1
+
+    def decode(self, link):
+        """Decode a link, going through the cache"""
+        result = self.get(link)
+        if result is None:
+            result = self.decoder(link)
+            self.put(link, result)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self._bytes = 0
+
+    def stats(self):
+        """Return cache counters as a dict"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def load(self):
+        """Load the most recently used entries from the on-disk store
+
+        Entries saved for another decoder, or by a version that did not
+        record it, are not loaded; the next save replaces them.
+        """
+        import sqlite3
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute(CREATE_TABLE_SQL)
+                db.execute(CREATE_INFO_SQL)
+            mode = db.execute("SELECT value FROM cache_info WHERE key = 'decoder'").fetchone()
+            if mode is None or mode[0] != decoder_name(self.decoder):
+                self.stale = db.execute('SELECT 1 FROM decode_cache LIMIT 1').fetchone() is not None
+                return
+            rows = db.execute('SELECT link, url, status, error, detail FROM decode_cache '
+                              'ORDER BY rowid DESC LIMIT ?', (self.max_entries,)).fetchall()
+        finally:
+            db.close()
+        for link, url, status, error, detail in reversed(rows):
+            # Keys of byte lines are stored as BLOBs, results always carry str links
+            text = link.decode('utf-8', 'surrogateescape') if isinstance(link, bytes) else link
+            self.put(link, thunder_core.DecodeResult(text.strip(), url, status, error, detail))
+
+    def save(self):
+        """Write the cache to the on-disk store, oldest entries first"""
+        if not self.path:
+            return
+        import sqlite3
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute('DROP TABLE IF EXISTS decode_cache')
+                db.execute(CREATE_TABLE_SQL)
+                db.execute(CREATE_INFO_SQL)
+                db.execute("INSERT OR REPLACE INTO cache_info VALUES ('decoder', ?)",
+                           (decoder_name(self.decoder),))
+                db.executemany('INSERT INTO decode_cache VALUES (?, ?, ?, ?, ?)',
+                               ((link,) + tuple(result)[1:]
+                                for link, result in self._entries.items()))
+        finally:
+            db.close()
+
+    def close(self):
+        self.save()
@@ -10,16 +10,43 @@ in 2025.06.23
 5. 在 open_links 函数中移除了不必要的异常处理，因为 QDesktopServices.openUrl 不会抛出需要捕获的异常。
 '''
 import sys
+import thunder_instance
+
+if __name__ == '__main__':
+    # 两者都在导入Qt之前处理：再次启动时把链接交给已打开的窗口，无界面模式无需PyQt5
+    if thunder_instance.is_forwardable(sys.argv[1:]):
+        if thunder_instance.forward(sys.argv[1:]):
+            sys.exit(0)
+    else:
+        # 无界面模式，例如 thunder_ch.py decode links.txt > urls.txt
+        import thunder_cli
+        if sys.argv[1] in thunder_cli.COMMANDS:
+            sys.exit(thunder_cli.main(sys.argv[1:]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLineEdit, QPushButton, QLabel,
-                            QMessageBox, QMenuBar, QAction, QStatusBar, 
-                            QFileDialog, QPlainTextEdit, QSizePolicy, QSpacerItem)
-from PyQt5.QtGui import QIcon, QDesktopServices, QTextCursor, QFont
-from PyQt5.QtCore import Qt, QUrl
-from urllib import parse
-import base64
+                            QMessageBox, QAction, QStatusBar, QFileDialog,
+                            QPlainTextEdit, QProgressBar, QCheckBox, QTableView,
+                            QHeaderView, QDialog, QDialogButtonBox)
+from PyQt5.QtGui import QDesktopServices, QFont, QColor
+from PyQt5.QtCore import (Qt, QUrl, QObject, QThread, QTimer, QProcess, pyqtSignal,
+                          QAbstractTableModel, QModelIndex)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import count, takewhile
+from time import perf_counter_ns
 import os
-import re
+import thunder_cache
+import thunder_core
+import thunder_report
+import thunder_schemes
+import thunder_store
+import thunder_writers
+
+# asyncio、multiprocessing及命令行模块只在用到时导入，
+# 窗口无需等待它们即可显示
 
 # 样式常量
 INPUT_STYLE = """
@@ -58,7 +85,7 @@ BUTTON_STYLE = """
 """
 
 RESULT_STYLE = """
-    QPlainTextEdit {
+    QTableView {
         border: 2px solid #2ecc71;
         border-radius: 10px;
         padding: 8px;
@@ -67,6 +94,353 @@ RESULT_STYLE = """
     }
 """
 
+# 各解码错误码对应的提示信息
+ERROR_MESSAGES = {
+    thunder_core.ERROR_PREFIX: "地址必须以thunder://开头",
+    thunder_core.ERROR_FORMAT: "无效的thunder链接格式",
+    thunder_core.ERROR_CONTENT: "无效的thunder链接内容",
+    thunder_core.ERROR_DECODE: "处理过程中发生异常: ",
+    thunder_core.ERROR_SCHEME: "不支持的链接类型",
+    thunder_core.ERROR_ENCODE: "URL不是有效的UTF-8文本: ",
+    thunder_core.ERROR_ROUNDTRIP: "编码后的链接无法解码回原URL: ",
+}
+
+# 每次增量刷新结果之间解码的链接数量
+CONVERT_CHUNK_SIZE = 2000
+
+# 实时转换：最后一次编辑后等待多久再解码编辑过的行
+LIVE_DELAY_MS = 300
+
+# 就地重新解码的最多编辑行数；编辑更多行时（如粘贴大段文本）在工作线程中重新转换全部输入
+LIVE_MAX_LINES = 5000
+
+# 浏览器打开链接：每批链接数量和批次之间的间隔
+OPEN_BATCH_SIZE = 5
+OPEN_INTERVAL_MS = 2000
+
+# 保存对话框的文件类型及其对应的结构化格式（None表示纯URL文本）
+SAVE_FORMATS = {
+    "文本文件 (*.txt)": None,
+    "JSON Lines文件 (*.jsonl)": 'jsonl',
+    "CSV文件 (*.csv)": 'csv',
+    # 需要pyarrow；未安装时保存会提示安装方法
+    "Parquet文件 (*.parquet)": 'parquet',
+    "所有文件 (*)": None,
+}
+
+# 下载工具命令，{file} 会被替换为包含所有URL的列表文件
+DOWNLOAD_MANAGER = os.environ.get('THUNDER_HTTPS_DOWNLOADER', 'aria2c --input-file {file}')
+
+# 汇总对话框中列出的失败下载数
+MAX_LISTED_FAILURES = 20
+
+def format_error(result):
+    """格式化失败结果的错误原因"""
+    message = ERROR_MESSAGES[result.error]
+    if result.detail:
+        message += result.detail
+    return message
+
+def format_report(summary):
+    """格式化批量统计报告"""
+    lines = [f"链接: {summary['links']} 条（成功 {summary['ok']} 条，失败 {summary['failed']} 条）",
+             f"重复URL: {summary['duplicates']} 条（不重复 {summary['unique_urls']} 条）"]
+    if summary['ok']:
+        lines.append(f"重复比例: {100 * summary['duplicates'] / summary['ok']:.1f}%")
+    for title, key in (("主要主机", 'top_hosts'), ("主要扩展名", 'top_extensions')):
+        if summary[key]:
+            lines.append("")
+            lines.append(f"{title}:")
+            lines.extend(f"    {number}  {name}" for name, number in summary[key])
+    if summary['errors']:
+        lines.append("")
+        lines.append("错误:")
+        lines.extend(f"    {number}  {ERROR_MESSAGES[error].rstrip(': ')}"
+                     for error, number in summary['errors'].items())
+    return "\n".join(lines)
+
+class ConvertWorker(QObject):
+    """在后台线程中解码链接，并分块发送结果"""
+    chunk_ready = pyqtSignal(list)  # 解码结果
+    progress = pyqtSignal(int, int)  # 已完成数量, 总数
+    failed = pyqtSignal(str)  # 错误信息
+    finished = pyqtSignal(int, int, bool)  # 成功数, 失败数, 是否已取消
+    
+    def __init__(self, thunder_urls, total=0, cache=None, profiler=None, encode=False):
+        super().__init__()
+        self.thunder_urls = thunder_urls
+        self.total = total  # 未知时为0
+        self.cache = cache
+        self.profiler = profiler
+        self.encode = encode
+        self._cancelled = False
+        
+    def run(self):
+        """解码所有链接，取消时提前结束"""
+        done = 0
+        success_count = 0
+        error_count = 0
+        
+        links = self.thunder_urls
+        profiler = self.profiler
+        if profiler is not None:
+            links = profiler.sample_links(profiler.iterate(links, 'read'))
+        try:
+            for chunk in thunder_core.iter_chunks(links, CONVERT_CHUNK_SIZE):
+                if self._cancelled:
+                    break
+                if self.encode:
+                    # 表格依次显示输入和输出，因此URL放在链接一列
+                    results = [thunder_core.DecodeResult(result.url, result.link, *result[2:])
+                               for result in thunder_core.encode_many(chunk, verify=True)]
+                elif profiler is None:
+                    results = thunder_core.decode_many(
+                        chunk, cache=self.cache, decode=thunder_schemes.decode_any)
+                else:
+                    start = perf_counter_ns()
+                    results = thunder_core.decode_many(
+                        chunk, cache=self.cache, decode=thunder_schemes.decode_any)
+                    profiler.add('decode', perf_counter_ns() - start, len(chunk))
+                ok = sum(1 for result in results if result.status == thunder_core.STATUS_OK)
+                success_count += ok
+                error_count += len(results) - ok
+                done += len(chunk)
+                self.chunk_ready.emit(results)
+                self.progress.emit(done, self.total)
+        except OSError as e:
+            # 读取文件中途失败
+            self.failed.emit(str(e))
+            
+        self.finished.emit(success_count, error_count, self._cancelled)
+        
+    def cancel(self):
+        """请求工作线程在当前分块结束后停止"""
+        self._cancelled = True
+
+class DownloadWorker(QObject):
+    """在后台线程中分段下载URL，支持断点续传"""
+    progress = pyqtSignal(int, int, object, object)  # 已完成文件数, 文件总数, 已下载字节数, 总字节数
+    finished = pyqtSignal(list)  # 下载结果
+    
+    def __init__(self, urls, directory):
+        super().__init__()
+        import thunder_download
+        self.urls = urls
+        self.downloader = thunder_download.Downloader(directory, progress=self.progress.emit)
+        
+    def run(self):
+        """下载所有URL；停止的下载保留未完成文件以便续传"""
+        self.finished.emit(self.downloader.run(self.urls))
+        
+    def stop(self):
+        """停止下载，可在界面线程中调用"""
+        self.downloader.stop()
+
+class InstanceServer(QObject):
+    """通过本地套接字接收之后启动时传入的链接"""
+    links_received = pyqtSignal(list)  # 链接
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        
+    def listen(self):
+        """开始监听；名称被其他窗口占用时返回False"""
+        name = thunder_instance.server_name()
+        # listen()也会替换正在运行的窗口的套接字（设置套接字选项后Qt在别处绑定再重命名覆盖），
+        # 因此只占用无人应答的名称；崩溃的窗口会留下套接字文件
+        if not self.is_free(name):
+            return False
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+        
+    def is_free(self, name):
+        """无人在name上应答时返回True，说明名称可以占用"""
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(int(thunder_instance.CONNECT_TIMEOUT * 1000)):
+            probe.disconnectFromServer()
+            return False
+        # 超时可能只是窗口繁忙，名称不算空闲
+        return probe.error() in (QLocalSocket.ServerNotFoundError,
+                                 QLocalSocket.ConnectionRefusedError)
+        
+    def accept(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.disconnected.connect(lambda connection=connection: self.receive(connection))
+            # 发送很快的连接可能在取出前就已断开
+            if connection.state() == QLocalSocket.UnconnectedState:
+                self.receive(connection)
+                
+    def receive(self, connection):
+        """发出已结束连接中的链接"""
+        data = bytes(connection.readAll()).decode('utf-8', 'replace')
+        connection.deleteLater()
+        self.links_received.emit(thunder_core.split_links(data))
+
+class ResultModel(QAbstractTableModel):
+    """基于ResultStore的表格模型，只在显示时格式化行"""
+    HEADERS = ("输入", "输出", "状态")
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = None  # 过滤时显示的行在结果中的索引，None表示显示全部
+        self.errors_only = False
+        self.host = ''
+        
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if self.rows is None else len(self.rows)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole, Qt.ForegroundRole):
+            return None
+        row = index.row() if self.rows is None else self.rows[index.row()]
+        result = self.store[row]
+        ok = result.status == thunder_core.STATUS_OK
+        if role == Qt.ForegroundRole:
+            return None if ok else QColor("#c0392b")
+        column = index.column()
+        if column == 0:
+            return result.link
+        if column == 1:
+            return result.url if ok else ""
+        return "成功" if ok else format_error(result)
+        
+    def append(self, results):
+        """把一块结果加入存储，并显示符合过滤条件的行"""
+        start = len(self.store)
+        if not results:
+            return
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), start, start + len(results) - 1)
+            self.store.extend(results)
+            self.endInsertRows()
+            return
+        self.store.extend(results)
+        matches = array('q', self.store.find(self.errors_only, self.host, start))
+        if matches:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+            self.rows.extend(matches)
+            self.endInsertRows()
+        
+    def replace(self, start, end, results):
+        """用results替换存储中start..end的行，并就地更新显示的行"""
+        if self.rows is None:
+            old, new = end - start, len(results)
+            if new < old:
+                self.beginRemoveRows(QModelIndex(), start + new, end - 1)
+                self.store.replace(start, end, results)
+                self.endRemoveRows()
+            elif new > old:
+                self.beginInsertRows(QModelIndex(), start + old, start + new - 1)
+                self.store.replace(start, end, results)
+                self.endInsertRows()
+            else:
+                self.store.replace(start, end, results)
+            if min(old, new):
+                self.dataChanged.emit(self.index(start, 0),
+                                      self.index(start + min(old, new) - 1, len(self.HEADERS) - 1))
+            return
+        # start之后显示的行指向替换后的位置，平移后再换入更新的行
+        rows = self.rows
+        first = bisect_left(rows, start)
+        last = bisect_left(rows, end)
+        shift = len(results) - (end - start)
+        tail = rows[last:] if not shift else array('q', [row + shift for row in rows[last:]])
+        self.store.replace(start, end, results)
+        stop = start + len(results)
+        matches = array('q', takewhile(lambda row: row < stop,
+                                       self.store.find(self.errors_only, self.host, start)))
+        if last > first:
+            self.beginRemoveRows(QModelIndex(), first, last - 1)
+            self.rows = rows[:first] + tail
+            self.endRemoveRows()
+        else:
+            self.rows = rows[:first] + tail
+        if matches:
+            self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+            self.rows[first:first] = matches
+            self.endInsertRows()
+        
+    def set_filter(self, errors_only, host):
+        """只显示错误和/或主机名包含host的成功链接"""
+        self.beginResetModel()
+        self.errors_only = errors_only
+        self.host = host.strip().lower()
+        if errors_only or self.host:
+            self.rows = array('q', self.store.find(self.errors_only, self.host))
+        else:
+            self.rows = None
+        self.endResetModel()
+        
+    def clear(self):
+        """清空所有结果"""
+        self.beginResetModel()
+        self.store.clear()
+        if self.rows is not None:
+            self.rows = array('q')
+        self.endResetModel()
+
+class LinkOpener(QObject):
+    """定时分批在浏览器中打开链接"""
+    progress = pyqtSignal(int, int)  # 已打开数量, 总数
+    finished = pyqtSignal()
+    
+    def __init__(self, urls, batch_size=OPEN_BATCH_SIZE, interval=OPEN_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.queue = deque(urls)
+        self.total = len(self.queue)
+        self.batch_size = batch_size
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.open_batch)
+        
+    def start(self):
+        self.open_batch()
+        if self.queue:
+            self.timer.start()
+        
+    def open_batch(self):
+        """打开下一批链接"""
+        for _ in range(min(self.batch_size, len(self.queue))):
+            QDesktopServices.openUrl(QUrl(self.queue.popleft()))
+        self.progress.emit(self.total - len(self.queue), self.total)
+        if not self.queue:
+            self.timer.stop()
+            self.finished.emit()
+        
+    def is_paused(self):
+        return bool(self.queue) and not self.timer.isActive()
+        
+    def pause(self):
+        """暂停打开链接"""
+        self.timer.stop()
+        
+    def resume(self):
+        """继续打开链接"""
+        if self.queue:
+            self.timer.start()
+        
+    def stop(self):
+        """丢弃所有尚未打开的链接"""
+        self.timer.stop()
+        self.queue.clear()
+
 class AboutDialog(QMessageBox):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -96,10 +470,88 @@ class AboutDialog(QMessageBox):
         self.setText(content)
         self.setIcon(QMessageBox.Information)
 
+class DiagnosticsDialog(QDialog):
+    """显示缓存、内存和性能分析数据，并可保存为JSON"""
+    def __init__(self, converter):
+        super().__init__(converter)
+        self.converter = converter
+        self.setWindowTitle("诊断信息")
+        self.resize(600, 420)
+        layout = QVBoxLayout(self)
+        
+        # 从下一次转换开始生效
+        self.profile_check = QCheckBox("分析转换性能（抽样计时，开销很小）")
+        self.profile_check.setChecked(converter.profiling)
+        self.profile_check.toggled.connect(self.set_profiling)
+        layout.addWidget(self.profile_check)
+        
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        font = QFont("Courier New", 9)
+        font.setStyleHint(QFont.TypeWriter)
+        self.text.setFont(font)
+        layout.addWidget(self.text)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        refresh_btn = buttons.addButton("刷新", QDialogButtonBox.ActionRole)
+        refresh_btn.clicked.connect(self.refresh)
+        save_btn = buttons.addButton("保存JSON...", QDialogButtonBox.ActionRole)
+        save_btn.clicked.connect(self.save_json)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.refresh()
+        
+    def set_profiling(self, enabled):
+        self.converter.profiling = enabled
+        
+    def refresh(self):
+        """显示当前数据"""
+        diagnostics = self.converter.diagnostics()
+        results = diagnostics['results']
+        cache = diagnostics['cache']
+        lines = [
+            f"结果: {results['total']} 条（成功 {results['ok']} 条，失败 {results['failed']} 条），占用 {results['bytes'] / 1024:.0f} KB",
+            f"解码缓存: {cache['entries']} 条，命中 {cache['hits']} 次，未命中 {cache['misses']} 次，淘汰 {cache['evictions']} 条",
+            "",
+        ]
+        if diagnostics['profile'] is not None:
+            import thunder_profile
+            lines.extend(thunder_profile.format_snapshot(diagnostics['profile']))
+        elif self.converter.profiling:
+            lines.append("性能分析已开启，进行一次转换后即可查看计时。")
+        else:
+            lines.append("性能分析未开启。")
+        self.text.setPlainText("\n".join(lines))
+        
+    def save_json(self):
+        """将数据保存为JSON"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存诊断信息", "thunder_diagnostics.json", "JSON文件 (*.json);;所有文件 (*)")
+        if file_path:
+            import json
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.converter.diagnostics(), f, indent=2)
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"保存文件时出错: {str(e)}")
+
 class ThunderConverter(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.converted_urls = []  # 存储所有转换后的URL
+        self.worker = None
+        self.worker_thread = None
+        self.link_opener = None
+        self.download_worker = None  # 内置下载器，运行时有效
+        self.download_thread = None
+        # 在多次转换之间复用解码结果
+        self.decode_cache = thunder_cache.DecodeCache(decode=thunder_schemes.decode_any)
+        self.results = thunder_store.ResultStore()  # 上次转换的解码结果，供表格、复制、保存和打开共用
+        self.report = thunder_report.BatchReport(exact_limit=None)  # 上次转换的重复、主机和错误统计
+        self.encoded = False  # 结果是由URL编码得到的迅雷链接，而不是解码得到的URL
+        self.live_lines = None  # 实时模式下结果对应的输入行（已去除首尾空白），关闭时为None
+        self.live_head = self.live_tail = sys.maxsize  # 编辑范围前后未改动的行数（按当前文档计）
+        self.profiling = False
+        self.profiler = None  # 开启性能分析时，上次转换的抽样计时
         self.initUI()
         
     def initUI(self):
@@ -109,7 +561,16 @@ class ThunderConverter(QMainWindow):
         
         # 创建菜单栏
         menubar = self.menuBar()
+        file_menu = menubar.addMenu('文件')
+        open_action = QAction('打开文件...', self)
+        open_action.setShortcut('Ctrl+O')
+        open_action.triggered.connect(self.open_file)
+        file_menu.addAction(open_action)
+        
         about_menu = menubar.addMenu('帮助')
+        diagnostics_action = QAction('诊断信息...', self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        about_menu.addAction(diagnostics_action)
         about_action = QAction('关于', self)
         about_action.triggered.connect(self.show_about)
         about_menu.addAction(about_action)
@@ -127,7 +588,7 @@ class ThunderConverter(QMainWindow):
         layout.addWidget(input_label)
         
         self.input_field = QPlainTextEdit()
-        self.input_field.setPlaceholderText("请输入thunder://开头的迅雷链接（每行一个，支持从剪贴板粘贴）...")
+        self.input_field.setPlaceholderText("请输入thunder://、flashget://或qqdl://链接（每行一个，支持从剪贴板粘贴）...")
         self.input_field.setStyleSheet(INPUT_STYLE)
         self.input_field.setMinimumHeight(100)
         layout.addWidget(self.input_field)
@@ -136,20 +597,82 @@ class ThunderConverter(QMainWindow):
         self.convert_btn = QPushButton("转换链接")
         self.convert_btn.setStyleSheet(BUTTON_STYLE.format("#3498db", "#2980b9", "#1c6da8"))
         self.convert_btn.clicked.connect(self.convert_links)
-        layout.addWidget(self.convert_btn, 0, Qt.AlignHCenter)
+        
+        # 编码按钮：把URL编码为迅雷链接，与转换相反
+        self.encode_btn = QPushButton("编码URL")
+        self.encode_btn.setStyleSheet(BUTTON_STYLE.format("#1abc9c", "#16a085", "#138d75"))
+        self.encode_btn.clicked.connect(self.encode_urls)
+        
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setStyleSheet(BUTTON_STYLE.format("#e74c3c", "#c0392b", "#a93226"))
+        self.cancel_btn.clicked.connect(self.cancel_conversion)
+        self.cancel_btn.setEnabled(False)
+        
+        # 从普通文本或HTML中查找链接，而不是要求每行一个
+        self.extract_check = QCheckBox("从文本/HTML中提取链接")
+        
+        # 编辑输入时自动转换，只重新解码改动的行
+        self.live_check = QCheckBox("实时转换")
+        self.live_check.toggled.connect(self.set_live)
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_DELAY_MS)
+        self.live_timer.timeout.connect(self.live_convert)
+        self.input_field.document().contentsChange.connect(self.input_changed)
+        
+        convert_layout = QHBoxLayout()
+        convert_layout.addStretch(1)
+        convert_layout.addWidget(self.convert_btn)
+        convert_layout.addWidget(self.encode_btn)
+        convert_layout.addWidget(self.cancel_btn)
+        convert_layout.addWidget(self.extract_check)
+        convert_layout.addWidget(self.live_check)
+        convert_layout.setSpacing(15)
+        convert_layout.addStretch(1)
+        layout.addLayout(convert_layout)
         
         layout.addSpacing(15)
         
         # 结果显示
         result_label = QLabel("转换结果:")
         result_label.setFont(QFont("Arial", 10, QFont.Bold))
-        layout.addWidget(result_label)
         
-        self.result_field = QPlainTextEdit()
-        self.result_field.setReadOnly(True)
-        self.result_field.setStyleSheet(RESULT_STYLE)
-        self.result_field.setMinimumHeight(150)
-        layout.addWidget(self.result_field)
+        # 结果过滤，输入停顿后生效
+        self.errors_check = QCheckBox("仅显示错误")
+        self.errors_check.toggled.connect(self.apply_filter)
+        self.host_filter = QLineEdit()
+        self.host_filter.setPlaceholderText("按主机名过滤...")
+        self.host_filter.setMaximumWidth(200)
+        self.host_filter.textChanged.connect(self.schedule_filter)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        
+        result_header = QHBoxLayout()
+        result_header.addWidget(result_label)
+        result_header.addStretch(1)
+        result_header.addWidget(self.errors_check)
+        result_header.addWidget(self.host_filter)
+        layout.addLayout(result_header)
+        
+        self.result_model = ResultModel(self.results, self)
+        self.result_table = QTableView()
+        self.result_table.setModel(self.result_model)
+        self.result_table.setStyleSheet(RESULT_STYLE)
+        self.result_table.setMinimumHeight(150)
+        self.result_table.setWordWrap(False)
+        self.result_table.setAlternatingRowColors(True)
+        self.result_table.setSelectionBehavior(QTableView.SelectRows)
+        self.result_table.verticalHeader().setVisible(False)
+        # Fixed row heights keep scrolling cheap however many rows there are
+        self.result_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.result_table.verticalHeader().setDefaultSectionSize(24)
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.result_table.horizontalHeader().setStretchLastSection(True)
+        self.result_table.setColumnWidth(0, 250)
+        self.result_table.setColumnWidth(1, 250)
+        layout.addWidget(self.result_table)
         
         layout.addSpacing(15)
         
@@ -170,9 +693,19 @@ class ThunderConverter(QMainWindow):
         self.save_btn.clicked.connect(self.save_results)
         self.save_btn.setEnabled(False)
         
+        self.report_btn = QPushButton("统计报告")
+        self.report_btn.setStyleSheet(BUTTON_STYLE.format("#34495e", "#2c3e50", "#1f2d3a"))
+        self.report_btn.clicked.connect(self.show_report)
+        self.report_btn.setEnabled(False)
+        
+        # 勾选后复制、打开和保存纯文本时跳过重复的URL
+        self.unique_check = QCheckBox("跳过重复URL")
+        
         btn_layout.addWidget(self.copy_btn)
         btn_layout.addWidget(self.open_btn)
         btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.report_btn)
+        btn_layout.addWidget(self.unique_check)
         btn_layout.setSpacing(15)
         
         btn_layout.addStretch(1)
@@ -183,12 +716,18 @@ class ThunderConverter(QMainWindow):
         # 添加状态栏
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        
+        # 转换进度指示器
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.setVisible(False)
+        self.status_bar.addPermanentWidget(self.progress_bar)
+        
         self.status_bar.showMessage("就绪", 5000)
         
     def validate_thunder_url(self, url):
         """验证thunder链接格式是否正确"""
-        pattern = r'^thunder://[A-Za-z0-9+/=]+$'
-        return bool(re.match(pattern, url))
+        return thunder_core.is_valid_link(url)
     
     def convert_links(self):
         """批量转换链接"""
@@ -197,58 +736,246 @@ class ThunderConverter(QMainWindow):
             self.show_error("请输入迅雷地址")
             return
             
-        thunder_urls = [url.strip() for url in input_text.splitlines() if url.strip()]
+        if self.extract_check.isChecked():
+            thunder_urls = list(thunder_core.scan_links(input_text))
+            if not thunder_urls:
+                self.show_error("文本中没有找到迅雷链接")
+                return
+        else:
+            thunder_urls = thunder_core.split_links(input_text)
         if not thunder_urls:
             self.show_error("没有有效的输入链接")
             return
             
-        self.converted_urls = []
-        result_text = []
-        success_count = 0
-        error_count = 0
+        self.start_conversion(thunder_urls, len(thunder_urls))
         
-        for url in thunder_urls:
-            if not url.startswith('thunder://'):
-                result_text.append(f"# 错误：{url} - 地址必须以thunder://开头")
-                error_count += 1
-            elif not self.validate_thunder_url(url):
-                result_text.append(f"# 错误：{url} - 无效的thunder链接格式")
-                error_count += 1
+    def encode_urls(self):
+        """将每行一个的URL编码为迅雷链接"""
+        input_text = self.input_field.toPlainText().strip()
+        if not input_text:
+            self.show_error("请输入URL")
+            return
+        urls = thunder_core.split_links(input_text)
+        if not urls:
+            self.show_error("没有有效的输入URL")
+            return
+        self.start_conversion(urls, len(urls), encode=True)
+        
+    def open_file(self):
+        """从文件转换链接，通过内存映射读取，压缩文件则边解压边转换"""
+        if self.worker is not None or self.download_worker is not None:
+            return
+            
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "打开链接文件", "", "文本文件 (*.txt);;HTML文件 (*.html *.htm);;"
+            "压缩文件 (*.gz *.bz2 *.xz);;所有文件 (*)", options=options)
+        
+        if file_path:
+            import thunder_compress
+            try:
+                # 在主线程中提前检查文件是否可读
+                compressed = thunder_compress.detect_codec(file_path) is not None
+            except OSError as e:
+                self.show_error(f"打开文件时出错: {str(e)}")
+                return
+            if compressed:
+                # 压缩文件无法内存映射，由后台线程解压
+                if self.extract_check.isChecked():
+                    links = thunder_compress.extract_links(file_path)
+                else:
+                    links = thunder_compress.iter_lines(file_path)
+            elif self.extract_check.isChecked():
+                links = thunder_core.extract_mapped_links(file_path)
             else:
-                try:
-                    encoded_str = url[10:]
-                    decoded_bytes = base64.b64decode(encoded_str)
-                    decoded_url = decoded_bytes.decode('utf-8')
-                    
-                    if not (decoded_url.startswith("AA") and decoded_url.endswith("ZZ")):
-                        result_text.append(f"# 错误：{url} - 无效的thunder链接内容")
-                        error_count += 1
-                    else:
-                        final_url = parse.unquote(decoded_url[2:-2])
-                        self.converted_urls.append(final_url)
-                        result_text.append(final_url)
-                        success_count += 1
-                except (base64.binascii.Error, ValueError, UnicodeDecodeError) as e:
-                    result_text.append(f"# 错误：{url} - 处理过程中发生异常: {str(e)}")
-                    error_count += 1
-        
-        self.result_field.setPlainText("\n".join(result_text))
+                links = thunder_core.iter_mapped_lines(file_path)
+            self.start_conversion(links, 0)
+            self.status_bar.showMessage(f"正在转换 {os.path.basename(file_path)}...")
+        
+    def start_conversion(self, thunder_urls, total, encode=False, live=False):
+        """在工作线程中开始转换链接；live表示实时转换的首次转换"""
+        if not live:
+            # 从文件转换或完整转换的结果不再对应输入框
+            self.live_check.setChecked(False)
+        # 转换进行中不能切换实时转换，可用取消按钮停止
+        self.live_check.setEnabled(False)
+        self.stop_opening()
+        self.result_model.clear()
+        self.report = thunder_report.BatchReport(exact_limit=None)
+        self.encoded = encode
+        self.update_buttons()
+        self.convert_btn.setEnabled(False)
+        self.encode_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setRange(0, total)  # 0..0 显示为忙碌指示
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        
+        # 在工作线程中解码，保持窗口响应；线程归窗口所有，结束后自行删除
+        self.worker_thread = QThread(self)
+        self.profiler = None
+        if self.profiling and not encode:
+            import thunder_profile
+            self.profiler = thunder_profile.Profiler(decode=thunder_schemes.decode_any)
+        # 编码不经过解码缓存，缓存的键是输入链接
+        self.worker = ConvertWorker(thunder_urls, total, None if encode else self.decode_cache,
+                                    self.profiler, encode)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.chunk_ready.connect(self.append_results)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.failed.connect(self.show_error)
+        self.worker.finished.connect(self.conversion_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+        self.worker_thread.start()
+        
+    def append_results(self, results):
+        """将一块结果追加到结果表格"""
+        if self.profiler is None:
+            self.result_model.append(results)
+            self.report.update(results)
+            return
+        start = perf_counter_ns()
+        self.result_model.append(results)
+        middle = perf_counter_ns()
+        self.report.update(results)
+        self.profiler.add('render', middle - start, len(results))
+        self.profiler.add('report', perf_counter_ns() - middle, len(results))
+        
+    def update_progress(self, done, total):
+        """在状态栏中显示转换进度"""
+        self.progress_bar.setValue(done)
+        if not total:
+            self.status_bar.showMessage(f"正在转换: {done}")
+            return
+        self.status_bar.showMessage(f"正在转换: {done}/{total}")
+        
+    def conversion_finished(self, success_count, error_count, cancelled):
+        """工作线程结束后恢复界面状态"""
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.worker = None
+        self.worker_thread = None
+        # 期间开始的下载在结束前保持其按钮状态
+        downloading = self.download_worker is not None
+        self.convert_btn.setEnabled(not self.live_check.isChecked() and not downloading)
+        self.encode_btn.setEnabled(not downloading)
+        self.cancel_btn.setEnabled(downloading)
+        self.live_check.setEnabled(True)
+        self.progress_bar.setVisible(downloading)
+        if cancelled:
+            # 取消的首次转换结果不完整，不再对应输入框，因此关闭实时转换
+            self.live_check.setChecked(False)
+        elif self.live_lines is not None and self.live_head != sys.maxsize:
+            # 处理首次转换期间的编辑
+            self.live_timer.start()
         
         # 更新按钮状态
         self.update_buttons()
         
         # 更新状态栏
-        self.status_bar.showMessage(f"转换完成: 成功 {success_count} 条, 失败 {error_count} 条", 10000)
+        title = ("已取消编码" if cancelled else "编码完成") if self.encoded else ("已取消转换" if cancelled else "转换完成")
+        self.status_bar.showMessage(f"{title}: 成功 {success_count} 条, 失败 {error_count} 条, 重复 {self.report.duplicates} 条", 10000)
         
         # 自动滚动到结果顶部
-        self.result_field.moveCursor(QTextCursor.Start)
+        self.result_table.scrollToTop()
+        
+    def set_live(self, enabled):
+        """开启或关闭实时转换；开启时先转换全部输入"""
+        self.convert_btn.setEnabled(not enabled and self.download_worker is None)
+        self.extract_check.setEnabled(not enabled)
+        self.live_timer.stop()
+        self.live_head = self.live_tail = sys.maxsize
+        if not enabled:
+            self.live_lines = None
+            return
+        # 首次转换可能很大，与普通转换一样在工作线程中进行；
+        # 之后的编辑只在这里重新解码改动的行
+        self.live_pass()
+        
+    def live_pass(self):
+        """在工作线程中转换全部输入，作为实时编辑就地更新的结果"""
+        self.live_lines = [line.strip() for line in self.input_field.toPlainText().split('\n')]
+        links = [line for line in self.live_lines if line]
+        self.start_conversion(links, len(links), live=True)
+        
+    def input_changed(self, position, removed, added):
+        """扩大编辑过的行范围，并重新开始实时转换的等待"""
+        if self.live_lines is None:
+            return
+        document = self.input_field.document()
+        first = document.findBlock(position).blockNumber()
+        block = document.findBlock(position + added)
+        last = block.blockNumber() if block.isValid() else document.blockCount() - 1
+        self.live_head = min(self.live_head, max(first, 0))
+        self.live_tail = min(self.live_tail, document.blockCount() - 1 - last)
+        self.live_timer.start()
+        
+    def live_convert(self):
+        """重新解码上次更新后编辑过的行，并就地更新对应的结果行"""
+        if self.live_lines is None:
+            return
+        if self.worker is not None:
+            # 首次转换仍在进行，结束后conversion_finished会处理这些编辑
+            return
+        document = self.input_field.document()
+        old = self.live_lines
+        total = document.blockCount()
+        head = min(self.live_head, len(old), total)
+        tail = min(self.live_tail, len(old) - head, total - head)
+        self.live_head = self.live_tail = sys.maxsize
+        if total - tail - head > LIVE_MAX_LINES:
+            # 行数太多，在主线程中解码会卡住窗口
+            self.live_pass()
+            return
+        lines = []
+        block = document.findBlockByNumber(head)
+        for _ in range(total - tail - head):
+            lines.append(block.text().strip())
+            block = block.next()
+        old_lines = old[head:len(old) - tail]
+        if lines == old_lines:
+            return
+        # 空行没有结果行
+        start = head - old[:head].count('')
+        end = start + len(old_lines) - old_lines.count('')
+        links = [line for line in lines if line]
+        results = thunder_core.decode_many(links, cache=self.decode_cache,
+                                           decode=thunder_schemes.decode_any)
+        self.result_model.replace(start, end, results)
+        old[head:len(old) - tail] = lines
+        self.report = None
+        self.update_buttons()
+        self.status_bar.showMessage(f"实时转换: 成功 {self.results.ok_count} 条, 失败 {self.results.error_count} 条 (本次解码 {len(links)} 行)", 5000)
+        
+    def schedule_filter(self):
+        """主机名过滤条件修改后稍后重新过滤"""
+        self.filter_timer.start()
+        
+    def apply_filter(self):
+        """按状态和主机名过滤结果表格"""
+        self.result_model.set_filter(self.errors_check.isChecked(), self.host_filter.text())
+        self.status_bar.showMessage(f"显示 {self.result_model.rowCount()} / {len(self.results)} 条结果", 5000)
+        
+    def cancel_conversion(self):
+        """取消正在进行的转换或下载"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+        if self.download_worker is not None:
+            self.download_worker.stop()
+            self.cancel_btn.setEnabled(False)
         
     def update_buttons(self):
         """更新操作按钮状态"""
-        has_results = bool(self.converted_urls)
-        self.copy_btn.setEnabled(has_results)
-        self.open_btn.setEnabled(has_results)
-        self.save_btn.setEnabled(has_results)
+        has_urls = self.results.ok_count > 0
+        self.copy_btn.setEnabled(has_urls)
+        # 编码得到的链接用于发布，不用于打开或统计主机；下载进行中不能再打开
+        self.open_btn.setEnabled(has_urls and not self.encoded and self.download_worker is None)
+        self.save_btn.setEnabled(len(self.results) > 0)
+        self.report_btn.setEnabled(len(self.results) > 0 and not self.encoded)
         
     def show_error(self, message):
         """显示错误信息"""
@@ -257,11 +984,12 @@ class ThunderConverter(QMainWindow):
         
     def copy_links(self):
         """复制所有转换后的链接到剪贴板"""
-        if self.converted_urls:
+        if self.results.ok_count:
+            urls = list(self.output_urls())
             clipboard = QApplication.clipboard()
-            clipboard.setText("\n".join(self.converted_urls))
+            clipboard.setText("\n".join(urls))
             self.status_bar.showMessage("链接已复制到剪贴板", 5000)
-            QMessageBox.information(self, "成功", f"已复制 {len(self.converted_urls)} 条链接到剪贴板")
+            QMessageBox.information(self, "成功", f"已复制 {len(urls)} 条链接到剪贴板")
         else:
             self.show_warning("没有可用的转换结果")
     
@@ -271,45 +999,298 @@ class ThunderConverter(QMainWindow):
         QMessageBox.warning(self, "警告", message)
     
     def open_links(self):
-        """在浏览器中打开所有转换后的链接"""
-        if not self.converted_urls:
+        """分批打开转换后的链接，或暂停/继续正在进行的打开操作"""
+        if self.link_opener is not None:
+            if self.link_opener.is_paused():
+                self.link_opener.resume()
+                self.open_btn.setText("暂停打开")
+            else:
+                self.link_opener.pause()
+                self.open_btn.setText("继续打开")
+                opened = self.link_opener.total - len(self.link_opener.queue)
+                total = self.link_opener.total
+                self.status_bar.showMessage(f"已暂停: 已打开 {opened}/{total} 个链接")
+            return
+            
+        if not self.results.ok_count:
             self.show_warning("没有可用的链接")
             return
             
-        for url in self.converted_urls:
-            QDesktopServices.openUrl(QUrl(url))
-        self.status_bar.showMessage(f"正在浏览器中打开 {len(self.converted_urls)} 个链接", 5000)
+        choice = self.ask_open_mode()
+        if choice == 'browser':
+            self.start_opening()
+        elif choice == 'download_manager':
+            self.send_to_download_manager()
+        elif choice == 'html':
+            self.write_html_index()
+        elif choice == 'download':
+            self.start_download()
+        
+    def ask_open_mode(self):
+        """询问如何打开转换后的链接"""
+        box = QMessageBox(self)
+        box.setWindowTitle("打开链接")
+        box.setIcon(QMessageBox.Question)
+        box.setText(f"如何打开 {self.output_count()} 个链接？\n\n浏览器每 {OPEN_INTERVAL_MS / 1000:g} 秒打开 {OPEN_BATCH_SIZE} 个链接，可再次点击同一按钮暂停。")
+        browser_btn = box.addButton("在浏览器中打开", QMessageBox.AcceptRole)
+        manager_btn = box.addButton("下载工具", QMessageBox.AcceptRole)
+        download_btn = box.addButton("下载到目录", QMessageBox.AcceptRole)
+        html_btn = box.addButton("HTML索引", QMessageBox.AcceptRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        clicked = box.clickedButton()
+        if clicked == browser_btn:
+            return 'browser'
+        if clicked == manager_btn:
+            return 'download_manager'
+        if clicked == html_btn:
+            return 'html'
+        if clicked == download_btn:
+            return 'download'
+        return None
+        
+    def start_opening(self):
+        """限速分批在浏览器中打开转换后的链接"""
+        self.link_opener = LinkOpener(self.output_urls(), parent=self)
+        self.link_opener.progress.connect(self.update_opening_progress)
+        self.link_opener.finished.connect(self.opening_finished)
+        self.open_btn.setText("暂停打开")
+        self.link_opener.start()
+        
+    def update_opening_progress(self, opened, total):
+        """在状态栏中显示打开链接的进度"""
+        self.status_bar.showMessage(f"正在浏览器中打开链接: {opened}/{total}")
+        
+    def opening_finished(self):
+        """所有链接打开后恢复打开链接按钮"""
+        total = self.link_opener.total
+        self.stop_opening()
+        self.status_bar.showMessage(f"已在浏览器中打开 {total} 个链接", 5000)
+        
+    def stop_opening(self):
+        """停止打开链接并恢复打开链接按钮"""
+        if self.link_opener is not None:
+            self.link_opener.stop()
+            self.link_opener.deleteLater()
+            self.link_opener = None
+        self.open_btn.setText("打开链接")
+        
+    def send_to_download_manager(self):
+        """将所有转换后的链接交给下载工具"""
+        import shlex
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt',
+                                         prefix='thunder_https_', delete=False) as f:
+            f.write("\n".join(self.output_urls()))
+        # 先拆分再替换，路径中的空格和反斜杠保持原样
+        args = [arg.replace('{file}', f.name) for arg in shlex.split(DOWNLOAD_MANAGER)]
+        command = ' '.join(args)
+        if not args or not QProcess.startDetached(args[0], args[1:]):
+            self.show_error(f"无法启动下载工具: {command}")
+            return
+        self.status_bar.showMessage(f"已将 {self.output_count()} 个链接发送到下载工具", 5000)
+        
+    def start_download(self):
+        """将转换后的链接下载到选定的目录"""
+        directory = QFileDialog.getExistingDirectory(self, "下载到")
+        if not directory:
+            return
+        self.convert_btn.setEnabled(False)
+        self.encode_btn.setEnabled(False)
+        self.open_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        
+        # 与转换线程一样归窗口所有，结束后自行删除
+        self.download_thread = QThread(self)
+        self.download_worker = DownloadWorker(list(self.output_urls()), directory)
+        self.download_worker.moveToThread(self.download_thread)
+        self.download_thread.started.connect(self.download_worker.run)
+        self.download_worker.progress.connect(self.update_download_progress)
+        self.download_worker.finished.connect(self.download_finished)
+        self.download_worker.finished.connect(self.download_thread.quit)
+        self.download_worker.finished.connect(self.download_worker.deleteLater)
+        self.download_thread.finished.connect(self.download_thread.deleteLater)
+        self.download_thread.start()
+        
+    def update_download_progress(self, files_done, files, done, total):
+        """显示下载进度；字节数会超出进度条的int范围，因此按千分比显示"""
+        if total:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(min(1000, done * 1000 // total))
+        self.status_bar.showMessage(f"正在下载: {files_done}/{files} 个文件, {done / 1e6:.1f}/{total / 1e6:.1f} MB")
+        
+    def download_finished(self, results):
+        """下载结束后恢复界面并汇总结果"""
+        import thunder_download
+        self.download_worker = None
+        self.download_thread = None
+        # 期间开始的转换（如实时转换）同样保持其按钮状态
+        converting = self.worker is not None
+        self.convert_btn.setEnabled(not self.live_check.isChecked() and not converting)
+        self.encode_btn.setEnabled(not converting)
+        self.cancel_btn.setEnabled(converting)
+        self.progress_bar.setVisible(converting)
+        self.update_buttons()
+        
+        counts = dict.fromkeys((thunder_download.STATUS_DONE, thunder_download.STATUS_SKIPPED,
+                                thunder_download.STATUS_FAILED, thunder_download.STATUS_STOPPED), 0)
+        for result in results:
+            counts[result.status] += 1
+        # 再次下载时会续传已停止的下载
+        self.status_bar.showMessage(f"下载完成: 已下载 {counts[thunder_download.STATUS_DONE]} 个, 已存在 {counts[thunder_download.STATUS_SKIPPED]} 个, 失败 {counts[thunder_download.STATUS_FAILED]} 个, 已停止 {counts[thunder_download.STATUS_STOPPED]} 个", 10000)
+        failed = [result for result in results if result.status == thunder_download.STATUS_FAILED]
+        if failed:
+            message = f"{counts[thunder_download.STATUS_FAILED]} 个下载失败:\n\n" + "\n".join(
+                f"{result.url} - {result.error}" for result in failed[:MAX_LISTED_FAILURES])
+            if len(failed) > MAX_LISTED_FAILURES:
+                message += f"\n... 以及另外 {len(failed) - MAX_LISTED_FAILURES} 个"
+            self.show_warning(message)
+        
+    def write_html_index(self):
+        """将转换后的链接写入HTML页面，并只打开该页面"""
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存HTML索引", "", "HTML文件 (*.html);;所有文件 (*)", options=options)
+        
+        if file_path:
+            try:
+                if not file_path.lower().endswith(('.html', '.htm')):
+                    file_path += '.html'
+                    
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    thunder_writers.write_html_index(f, self.output_urls(), "迅雷链接转换器")
+            except OSError as e:
+                self.show_error(f"保存文件时出错: {str(e)}")
+                return
+            self.status_bar.showMessage(f"HTML索引已保存到 {os.path.basename(file_path)}", 10000)
+            QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
         
     def save_results(self):
         """保存转换结果到文件"""
-        if not self.converted_urls:
+        if not self.results:
             self.show_warning("没有可保存的内容")
             return
             
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "保存结果", "", "文本文件 (*.txt);;所有文件 (*)", options=options)
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "保存结果", "", ";;".join(SAVE_FORMATS), options=options)
         
         if file_path:
             try:
-                if not file_path.lower().endswith('.txt'):
-                    file_path += '.txt'
+                import thunder_compress
+                fmt = SAVE_FORMATS.get(selected_filter)
+                extension = '.txt' if fmt is None else thunder_writers.FORMATS[fmt][1]
+                # 文件名以.gz、.bz2或.xz结尾时压缩保存，格式扩展名加在其前面
+                base_path = thunder_compress.strip_extension(file_path)
+                if selected_filter == "所有文件 (*)":
+                    # 选择"所有文件"时沿用用户输入的扩展名
+                    extension = os.path.splitext(base_path)[1].lower()
+                    fmt = next((name for name, (_, ext, _) in thunder_writers.FORMATS.items()
+                                if ext == extension), None)
+                elif not base_path.lower().endswith(extension):
+                    file_path = base_path + extension + file_path[len(base_path):]
                     
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write("\n".join(self.converted_urls))
+                if fmt is None:
+                    with thunder_compress.open_output(file_path, text=True, newline=None) as f:
+                        f.write("\n".join(self.output_urls()))
+                else:
+                    # 记录按链接在输入中的位置编号
+                    results = self.results
+                    if self.encoded:
+                        # 编码结果的URL保存在链接一列，写入记录前换回
+                        results = (thunder_core.DecodeResult(result.url, result.link, *result[2:])
+                                   for result in results)
+                    records = thunder_writers.iter_records(results, count(1))
+                    thunder_writers.save_records(file_path, fmt, records)
                 
                 self.status_bar.showMessage(f"结果已保存到 {os.path.basename(file_path)}", 10000)
                 QMessageBox.information(self, "保存成功", f"文件已保存到:\n{file_path}")
             except Exception as e:
                 self.show_error(f"保存文件时出错: {str(e)}")
     
+    def output_urls(self):
+        """复制、打开和保存使用的URL，按需去除重复"""
+        urls = self.results.urls()
+        if self.unique_check.isChecked():
+            return thunder_report.unique_urls(urls)
+        return urls
+        
+    def output_count(self):
+        """output_urls 返回的URL数量"""
+        if self.unique_check.isChecked():
+            report = self.current_report()
+            return report.ok - report.duplicates
+        return self.results.ok_count
+        
+    def current_report(self):
+        """当前结果的统计报告，实时编辑后重新统计"""
+        if self.report is None:
+            self.report = thunder_report.BatchReport(exact_limit=None)
+            self.report.update(self.results)
+        return self.report
+        
+    def show_report(self):
+        """显示重复数量、主要主机和扩展名以及错误分类"""
+        QMessageBox.information(self, "统计报告", format_report(self.current_report().summary()))
+        
+    def diagnostics(self):
+        """收集结果、缓存和性能分析数据"""
+        return {
+            'results': {
+                'total': len(self.results),
+                'ok': self.results.ok_count,
+                'failed': self.results.error_count,
+                'bytes': self.results.nbytes(),
+            },
+            'cache': self.decode_cache.stats(),
+            'profile': None if self.profiler is None else self.profiler.snapshot(),
+        }
+        
+    def show_diagnostics(self):
+        dialog = DiagnosticsDialog(self)
+        dialog.exec_()
+        
+    def receive_links(self, links):
+        """将窗口置于前台并转换其它启动传入的链接"""
+        self.setWindowState(self.windowState() & ~Qt.WindowMinimized | Qt.WindowActive)
+        self.raise_()
+        self.activateWindow()
+        if not links:
+            return
+        self.input_field.appendPlainText("\n".join(links))
+        # 实时模式会自行处理新加入的行
+        if self.convert_btn.isEnabled():
+            self.convert_links()
+        
     def show_about(self):
         dialog = AboutDialog(self)
         dialog.exec_()
+        
+    def closeEvent(self, event):
+        """关闭窗口前停止工作线程"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+        if self.download_worker is not None:
+            self.download_worker.stop()
+            self.download_thread.quit()
+            self.download_thread.wait()
+        self.stop_opening()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     window = ThunderConverter()
     window.show()
+    instance_server = InstanceServer(window)
+    instance_server.links_received.connect(window.receive_links)
+    instance_server.listen()
+    # 启动时传入的链接，例如作为thunder://协议处理程序启动时
+    if sys.argv[1:] and thunder_instance.is_forwardable(sys.argv[1:]):
+        QTimer.singleShot(0, lambda: window.receive_links(sys.argv[1:]))
     sys.exit(app.exec_())
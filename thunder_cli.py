@@ -0,0 +1,652 @@
+'''
+Headless command line for thunder-https
+Reads thunder links from files or stdin and streams the decoded URLs to
+stdout line by line, so memory use stays constant whatever the input size.
+
+Usage:
+    python thunder_cli.py decode [FILE ...] > urls.txt
+    python thunder_cli.py decode --workers 8 huge.txt > urls.txt
+    cat links.txt | python thunder_cli.py decode > urls.txt
+    python thunder_cli.py decode --extract crawl/*.html > urls.txt
+    python thunder_cli.py decode --format jsonl links.txt > results.jsonl
+    python thunder_cli.py decode -o urls.txt.xz links.txt.gz
+    python thunder_cli.py decode --unique --report links.txt > urls.txt
+    python thunder_cli.py decode --profile --profile-json profile.json links.txt > urls.txt
+    python thunder_cli.py encode --verify urls.txt > links.txt
+    python thunder_cli.py watch spool/ --workers 4
+    python thunder_cli.py serve --port 8080
+    python thunder_cli.py download -d downloads/ links.txt
+'''
+from collections import Counter, deque
+from time import monotonic
+import argparse
+import os
+import signal
+import sys
+import thunder_cache
+import thunder_compress
+import thunder_core
+import thunder_profile
+import thunder_report
+import thunder_schemes
+import thunder_writers
+
+# Error messages for each decode error code
+ERROR_MESSAGES = {
+    thunder_core.ERROR_PREFIX: "Address must start with thunder://",
+    thunder_core.ERROR_FORMAT: "Invalid Thunder link format",
+    thunder_core.ERROR_CONTENT: "Invalid Thunder link content",
+    thunder_core.ERROR_DECODE: "Exception occurred during processing: ",
+    thunder_core.ERROR_SCHEME: "Unsupported link scheme",
+    thunder_core.ERROR_ENCODE: "URL is not valid UTF-8: ",
+    thunder_core.ERROR_ROUNDTRIP: "Encoded link does not decode back to the URL: ",
+}
+
+COMMANDS = ('decode', 'encode', 'watch', 'serve', 'download')
+
+OUTPUT_FORMATS = ('text',) + tuple(thunder_writers.FORMATS)
+
+# Buffer size for stdin/stdout and input files
+IO_BUFFER_SIZE = 1 << 20
+
+
+def format_error(result):
+    """Format the error reason of a failed result"""
+    message = ERROR_MESSAGES[result.error]
+    if result.detail:
+        message += result.detail
+    return message
+
+
+def open_input(path):
+    """Open an input file for binary reading, '-' meaning stdin
+
+    Compressed input (gzip, bz2 or xz) is decompressed on the fly.
+    """
+    if path == '-':
+        stream = open(sys.stdin.fileno(), 'rb', buffering=IO_BUFFER_SIZE, closefd=False)
+        return thunder_compress.wrap_input(stream)
+    return thunder_compress.open_input(path, IO_BUFFER_SIZE)
+
+
+def can_map(path, use_mmap):
+    """Return True if path is to be memory-mapped; compressed files never are"""
+    return use_mmap and path != '-' and thunder_compress.detect_codec(path) is None
+
+
+def read_lines(paths, use_mmap=False):
+    """Yield raw byte lines from every input file in turn, '-' meaning stdin
+
+    Lines stay bytes so they go through the bytes fast path of the decoder.
+    """
+    for path in paths or ['-']:
+        if can_map(path, use_mmap):
+            yield from thunder_core.iter_mapped_lines(path)
+        else:
+            with open_input(path) as f:
+                yield from f
+
+
+def extract_links(paths, use_mmap=False):
+    """Yield the thunder links embedded anywhere in the input files"""
+    for path in paths or ['-']:
+        if can_map(path, use_mmap):
+            yield from thunder_core.extract_mapped_links(path)
+        else:
+            with open_input(path) as f:
+                yield from thunder_core.extract_links(f)
+
+
+def number_lines(lines, numbers):
+    """Yield the non-empty lines, appending their line numbers to numbers"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            numbers.append(number)
+            yield line
+
+
+def count_results(results, counts):
+    """Pass results through, counting successes and failures"""
+    ok = thunder_core.STATUS_OK
+    for result in results:
+        counts[0 if result.status == ok else 1] += 1
+        yield result
+
+
+def open_output(path, binary=False):
+    """Open the output file, or stdout when path is None
+
+    A path ending in .gz, .bz2 or .xz is written compressed.
+    """
+    if path:
+        return thunder_compress.open_output(path, not binary, 'surrogateescape',
+                                            buffering=IO_BUFFER_SIZE)
+    if binary:
+        return open(sys.stdout.fileno(), 'wb', buffering=IO_BUFFER_SIZE, closefd=False)
+    return open(sys.stdout.fileno(), 'w', encoding='utf-8', newline='', errors='surrogateescape',
+                buffering=IO_BUFFER_SIZE, closefd=False)
+
+
+def format_results(results, keep_errors, counts):
+    """Turn decode results into output lines, counting successes and failures"""
+    ok = thunder_core.STATUS_OK
+    for result in results:
+        if result.status == ok:
+            counts[0] += 1
+            yield result.url + '\n'
+        else:
+            counts[1] += 1
+            if keep_errors:
+                yield f"# Error: {result.link} - {format_error(result)}\n"
+
+
+def format_encoded_results(results, keep_errors, counts):
+    """Turn encode results into output lines, counting successes and failures"""
+    ok = thunder_core.STATUS_OK
+    for result in results:
+        if result.status == ok:
+            counts[0] += 1
+            yield result.link + '\n'
+        else:
+            counts[1] += 1
+            if keep_errors:
+                yield f"# Error: {result.url} - {format_error(result)}\n"
+
+
+def format_probed_results(pairs, keep_errors, counts):
+    """Like format_results, with probe columns: url, status, length, final url, error"""
+    for result, probe in pairs:
+        if probe is None:
+            counts[1] += 1
+            if keep_errors:
+                yield f"# Error: {result.link} - {format_error(result)}\n"
+            continue
+        counts[0] += 1
+        status = '-' if probe.status is None else probe.status
+        length = '-' if probe.content_length is None else probe.content_length
+        yield (f"{result.url}\t{status}\t{length}\t{probe.final_url or '-'}"
+               f"\t{probe.error or ''}\n")
+
+
+def format_report(summary):
+    """Yield the lines of a batch report"""
+    yield f"Links: {summary['links']} ({summary['ok']} successful, {summary['failed']} failed)"
+    if summary['exact']:
+        yield (f"Duplicate URLs: {summary['duplicates']} "
+               f"({summary['unique_urls']} unique)")
+    yield (f"Duplicate URLs (estimated): {summary['estimated_duplicates']} "
+           f"({summary['estimated_unique_urls']} unique)")
+    if summary['ok']:
+        duplicates = summary['duplicates' if summary['exact'] else 'estimated_duplicates']
+        yield f"Duplicate share: {100 * duplicates / summary['ok']:.1f}%"
+    for title, key in (("Top hosts", 'top_hosts'), ("Top extensions", 'top_extensions')):
+        if summary[key]:
+            yield f"{title}:"
+            for name, number in summary[key]:
+                yield f"  {number:>10}  {name}"
+    if summary['errors']:
+        yield "Errors:"
+        for error, number in summary['errors'].items():
+            yield f"  {number:>10}  {ERROR_MESSAGES[error].rstrip(': ')}"
+
+
+def run_decode(args):
+    """Stream decoded URLs from the input files to stdout"""
+    if args.format != 'text' and args.probe:
+        print("Error: --probe only supports text output", file=sys.stderr)
+        return 2
+    writer = binary = None
+    if args.format != 'text':
+        writer, _, binary = thunder_writers.FORMATS[args.format]
+        if binary and not args.output:
+            print(f"Error: {args.format} output needs --output", file=sys.stderr)
+            return 2
+    counts = [0, 0]  # successful, failed
+    decode = thunder_schemes.decode_any if args.all_schemes else thunder_core.decode_link
+    cache = None
+    if args.cache_size or args.cache_file:
+        cache = thunder_cache.DecodeCache(
+            args.cache_size or thunder_cache.DEFAULT_MAX_ENTRIES,
+            args.cache_memory * 1024 * 1024, args.cache_file, decode)
+        if cache.stale and not args.quiet:
+            print(f"Cache file {args.cache_file} was built with another decoder "
+                  f"(-a/--all-schemes differs); starting with an empty cache", file=sys.stderr)
+    profiler = None
+    if args.profile or args.profile_json:
+        profiler = thunder_profile.Profiler(decode=decode)
+    out = None
+    try:
+        if writer is not None:
+            thunder_writers.check_format(args.format)
+        out = open_output(args.output, binary)
+        numbers = None
+        if args.extract:
+            links = extract_links(args.files, args.mmap)
+        elif writer is not None:
+            # Structured records carry the input line number of each link
+            numbers = deque()
+            links = number_lines(read_lines(args.files, args.mmap), numbers)
+        else:
+            links = read_lines(args.files, args.mmap)
+        if profiler is not None:
+            links = profiler.sample_links(profiler.iterate(links, 'read'))
+        results = thunder_core.decode_stream(links, args.workers or None, cache, decode)
+        if profiler is not None:
+            # Worker pools return whole chunks at once, so every wait is timed
+            results = profiler.iterate(results, 'decode', inner='read',
+                                       exact=args.workers != 1)
+        report = None
+        if args.report or args.unique:
+            report = thunder_report.BatchReport(args.top)
+            # The line number of a dropped duplicate is next in line; drop it too
+            on_skip = None if numbers is None else lambda result: numbers.popleft()
+            results = report.track(results, args.unique, on_skip)
+        if writer is not None:
+            lines = None if numbers is None else iter(numbers.popleft, None)
+            records = thunder_writers.iter_records(count_results(results, counts), lines)
+            writer(out, records)
+        elif args.probe:
+            import thunder_probe
+            # Options not given keep the prober's defaults
+            options = {name: value for name, value in (
+                ('concurrency', args.probe_concurrency), ('timeout', args.probe_timeout),
+                ('retries', args.probe_retries)) if value is not None}
+            pairs = thunder_probe.probe_results(results, **options)
+            out.writelines(format_probed_results(pairs, args.keep_errors, counts))
+        else:
+            out.writelines(format_results(results, args.keep_errors, counts))
+        out.flush()
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head); drop whatever is still buffered
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if out is not None and args.output:
+            out.close()
+        if cache is not None:
+            cache.close()
+    if not args.quiet:
+        print(f"Conversion complete: {counts[0]} successful, {counts[1]} failed",
+              file=sys.stderr)
+        if cache is not None:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses, "
+                  f"{cache.evictions} evictions", file=sys.stderr)
+        if args.unique:
+            print(f"Skipped {report.duplicates} duplicate URLs", file=sys.stderr)
+    if args.report:
+        for line in format_report(report.summary()):
+            print(line, file=sys.stderr)
+    if profiler is not None:
+        profiler.stop()
+        if args.profile:
+            for line in thunder_profile.format_snapshot(profiler.snapshot()):
+                print(line, file=sys.stderr)
+        if args.profile_json:
+            try:
+                with open(args.profile_json, 'w', encoding='utf-8') as f:
+                    profiler.dump(f)
+            except OSError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+    return 0
+
+
+def run_encode(args):
+    """Stream thunder links for the URLs in the input files to stdout"""
+    writer = binary = None
+    if args.format != 'text':
+        writer, _, binary = thunder_writers.FORMATS[args.format]
+        if binary and not args.output:
+            print(f"Error: {args.format} output needs --output", file=sys.stderr)
+            return 2
+    counts = [0, 0]  # successful, failed
+    out = None
+    try:
+        if writer is not None:
+            thunder_writers.check_format(args.format)
+        if writer is None and not args.keep_errors:
+            # Plain links: whole chunks of output lines, no result objects
+            out = open_output(args.output, binary=True)
+            for data, ok, failed in thunder_core.encode_lines(
+                    read_lines(args.files, args.mmap), args.workers or None, args.verify):
+                out.write(data)
+                counts[0] += ok
+                counts[1] += failed
+        else:
+            out = open_output(args.output, binary)
+            numbers = None
+            lines = read_lines(args.files, args.mmap)
+            if writer is not None:
+                numbers = deque()
+                lines = number_lines(lines, numbers)
+            results = thunder_core.encode_stream(lines, args.workers or None, args.verify)
+            if writer is not None:
+                records = thunder_writers.iter_records(count_results(results, counts),
+                                                       iter(numbers.popleft, None))
+                writer(out, records)
+            else:
+                out.writelines(format_encoded_results(results, args.keep_errors, counts))
+        out.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if out is not None and args.output:
+            out.close()
+    if not args.quiet:
+        print(f"Encoding complete: {counts[0]} successful, {counts[1]} failed", file=sys.stderr)
+    return 0
+
+
+def run_watch(args):
+    """Convert link files dropped into a directory until interrupted"""
+    if not os.path.isdir(args.directory):
+        print(f"Error: not a directory: {args.directory}", file=sys.stderr)
+        return 2
+    if args.format != 'text':
+        try:
+            thunder_writers.check_format(args.format)
+        except ImportError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    import thunder_watch
+
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+    daemon = thunder_watch.WatchDaemon(
+        args.directory, args.output, args.format, args.workers or None, args.pattern,
+        args.poll_interval,
+        thunder_schemes.decode_any if args.all_schemes else thunder_core.decode_link,
+        None if args.quiet else log)
+    # Finish the increments in flight and save the checkpoints before exiting
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.run(args.once)
+    except (OSError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_serve(args):
+    """Serve the decoder over HTTP until interrupted"""
+    import asyncio
+    import thunder_server
+
+    def ready(address):
+        if not args.quiet:
+            print(f"Serving on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+    try:
+        asyncio.run(thunder_server.serve(
+            args.host, args.port, ready, max_batch=args.max_batch,
+            decode=thunder_schemes.decode_any if args.all_schemes else thunder_core.decode_link))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def download_targets(results):
+    """Yield the URL of each successful result; lines that already are
+    http(s) URLs (e.g. decode output) are passed through"""
+    for result in results:
+        if result.status == thunder_core.STATUS_OK:
+            yield result.url
+        elif result.error == thunder_core.ERROR_PREFIX and result.link.startswith(
+                ('http://', 'https://')):
+            yield result.link
+
+
+def run_download(args):
+    """Decode links and download the files into a directory"""
+    import thunder_download
+    if not os.path.isdir(args.directory):
+        print(f"Error: not a directory: {args.directory}", file=sys.stderr)
+        return 2
+    decode = thunder_schemes.decode_any if args.all_schemes else thunder_core.decode_link
+    links = extract_links(args.files) if args.extract else read_lines(args.files)
+    try:
+        # Every URL is downloaded once
+        urls = list(thunder_report.unique_urls(
+            download_targets(thunder_core.decode_stream(links, decode=decode))))
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # A single status line, redrawn in place
+    started = monotonic()
+
+    def progress(files_done, files, done, total):
+        rate = done / max(monotonic() - started, 1e-3) / 1e6
+        print(f"\rDownloading: {files_done}/{files} files, {done / 1e6:.1f}/{total / 1e6:.1f} MB, "
+              f"{rate:.1f} MB/s", end='', file=sys.stderr, flush=True)
+    show_progress = not args.quiet and sys.stderr.isatty()
+    downloader = thunder_download.Downloader(
+        args.directory, args.connections, args.segments, args.per_host, args.timeout,
+        args.retries, progress if show_progress else None)
+    # Stop cleanly so the partial files can be resumed by running again
+    signal.signal(signal.SIGINT, lambda *_: downloader.stop())
+    signal.signal(signal.SIGTERM, lambda *_: downloader.stop())
+    results = downloader.run(urls)
+
+    if show_progress:
+        print(file=sys.stderr)
+    for result in results:
+        if result.status == thunder_download.STATUS_FAILED:
+            print(f"# Failed: {result.url} - {result.error}", file=sys.stderr)
+    counts = Counter(result.status for result in results)
+    failed = counts[thunder_download.STATUS_FAILED]
+    stopped = counts[thunder_download.STATUS_STOPPED]
+    if not args.quiet:
+        print(f"Download complete: {counts[thunder_download.STATUS_DONE]} downloaded, "
+              f"{counts[thunder_download.STATUS_SKIPPED]} already present, {failed} failed, "
+              f"{stopped} stopped", file=sys.stderr)
+    return 1 if failed or stopped else 0
+
+
+def add_watch_arguments(parser):
+    """Add the options of the watch command, with the defaults of thunder_watch"""
+    import thunder_watch
+    parser.add_argument('directory', help="spool directory to watch")
+    parser.add_argument('-o', '--output', metavar='DIR',
+                        help="output directory "
+                             f"(default: DIRECTORY/{thunder_watch.OUTPUT_DIR_NAME})")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='text',
+                        help="output format, as for decode (default: text)")
+    parser.add_argument('-a', '--all-schemes', action='store_true',
+                        help="also decode flashget://, qqdl://, ed2k:// and magnet: links")
+    parser.add_argument('-j', '--workers', type=int, default=1, metavar='N',
+                        help="convert up to N files at once (0 = one per CPU core)")
+    parser.add_argument('--pattern', default=thunder_watch.DEFAULT_PATTERN,
+                        help="file name pattern to convert (default: %(default)s)")
+    parser.add_argument('--poll-interval', type=float,
+                        default=thunder_watch.DEFAULT_POLL_INTERVAL, metavar='SECONDS',
+                        help="directory poll interval where inotify is unavailable "
+                             "(default: %(default)s)")
+    parser.add_argument('--once', action='store_true',
+                        help="convert what is in the directory now and exit")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not log converted increments to stderr")
+
+
+def add_serve_arguments(parser):
+    """Add the options of the serve command, with the defaults of thunder_server"""
+    import thunder_server
+    parser.add_argument('--host', default=thunder_server.DEFAULT_HOST,
+                        help="address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=thunder_server.DEFAULT_PORT,
+                        help="port to listen on (default: %(default)s)")
+    parser.add_argument('--max-batch', type=int, default=thunder_server.DEFAULT_MAX_BATCH,
+                        metavar='N', help="most links accepted per batch request "
+                                          "(default: %(default)s)")
+    parser.add_argument('-a', '--all-schemes', action='store_true',
+                        help="also decode flashget://, qqdl://, ed2k:// and magnet: links")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print the listening address")
+
+
+def add_download_arguments(parser):
+    """Add the options of the download command, with the defaults of thunder_download"""
+    import thunder_download
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help="input files of links or URLs, one per line "
+                             "('-' or none for stdin)")
+    parser.add_argument('-d', '--directory', default='.',
+                        help="directory to download into (default: current directory)")
+    parser.add_argument('-a', '--all-schemes', action='store_true',
+                        help="also decode flashget:// and qqdl:// links")
+    parser.add_argument('-x', '--extract', action='store_true',
+                        help="find thunder links anywhere in text or HTML input")
+    parser.add_argument('-c', '--connections', type=int,
+                        default=thunder_download.DEFAULT_CONCURRENCY, metavar='N',
+                        help="connections open across the whole batch (default: %(default)s)")
+    parser.add_argument('-s', '--segments', type=int,
+                        default=thunder_download.DEFAULT_SEGMENTS, metavar='N',
+                        help="connections per file (default: %(default)s)")
+    parser.add_argument('--per-host', type=int, default=thunder_download.DEFAULT_PER_HOST,
+                        metavar='N', help="connections per host (default: %(default)s)")
+    parser.add_argument('--timeout', type=float, default=thunder_download.DEFAULT_TIMEOUT,
+                        metavar='SECONDS',
+                        help="seconds without data before a connection is retried "
+                             "(default: %(default)s)")
+    parser.add_argument('--retries', type=int, default=thunder_download.DEFAULT_RETRIES,
+                        metavar='N', help="retries per segment without progress "
+                                          "(default: %(default)s)")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print progress and the summary to stderr")
+
+
+def build_parser(command=None):
+    """Build the argument parser
+
+    Given a command, only its options are added, so a plain decode does not
+    import the modules the other commands need (asyncio, ssl, process pools).
+    """
+    def builds(name):
+        return command not in COMMANDS or command == name
+
+    parser = argparse.ArgumentParser(
+        prog='thunder-https', description="Convert Thunder links to normal URLs")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    decode = subparsers.add_parser('decode', help="decode thunder:// links")
+    decode.add_argument('files', nargs='*', metavar='FILE',
+                        help="input files, one link per line ('-' or none for stdin); "
+                             "gzip, bz2 and xz input is decompressed")
+    decode.add_argument('-e', '--keep-errors', action='store_true',
+                        help="write '# Error: ...' lines in place of failed links")
+    decode.add_argument('-a', '--all-schemes', action='store_true',
+                        help="also decode flashget:// and qqdl:// links and pass "
+                             "ed2k:// and magnet: links through")
+    decode.add_argument('-x', '--extract', action='store_true',
+                        help="find thunder links anywhere in text or HTML input "
+                             "instead of reading one link per line")
+    decode.add_argument('-m', '--mmap', action='store_true',
+                        help="memory-map input files instead of reading them "
+                             "(compressed files are always read)")
+    decode.add_argument('-j', '--workers', type=int, default=1, metavar='N',
+                        help="decode in N worker processes (0 = one per CPU core)")
+    decode.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='text',
+                        help="output format: plain URLs (default) or one record per link "
+                             "with line, link, url, status, error, detail and host "
+                             "(parquet needs pyarrow)")
+    decode.add_argument('-o', '--output', metavar='PATH',
+                        help="write to this file instead of stdout, compressed if "
+                             "PATH ends in .gz, .bz2 or .xz")
+    decode.add_argument('--cache-size', type=int, default=0, metavar='N',
+                        help="keep up to N decoded links in an LRU cache (0 = no cache)")
+    decode.add_argument('--cache-memory', type=int, default=64, metavar='MB',
+                        help="memory cap of the cache in MB (default: 64)")
+    decode.add_argument('--cache-file', metavar='PATH',
+                        help="load the cache from and save it to this SQLite file")
+    decode.add_argument('--probe', action='store_true',
+                        help="check each decoded URL over HTTP and append status, "
+                             "content length and final URL as tab separated columns")
+    decode.add_argument('--probe-concurrency', type=int, metavar='N',
+                        help="maximum probes in flight (default: 100)")
+    decode.add_argument('--probe-timeout', type=float, metavar='SECONDS',
+                        help="timeout of each request (default: 10)")
+    decode.add_argument('--probe-retries', type=int, metavar='N',
+                        help="retries on timeouts and connection errors (default: 2)")
+    decode.add_argument('-u', '--unique', action='store_true',
+                        help="write each decoded URL only once (exact up to "
+                             f"{thunder_report.EXACT_LIMIT} distinct URLs)")
+    decode.add_argument('--report', action='store_true',
+                        help="print duplicate counts, top hosts and extensions and "
+                             "the error breakdown to stderr")
+    decode.add_argument('--top', type=int, default=thunder_report.TOP_N, metavar='N',
+                        help="entries per top list of the report (default: %(default)s)")
+    decode.add_argument('--profile', action='store_true',
+                        help="print per-stage counters and sampled timings "
+                             "(read, decode and each decode step) to stderr")
+    decode.add_argument('--profile-json', metavar='PATH',
+                        help="write the profile as JSON to this file")
+    decode.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print the summary to stderr")
+    decode.set_defaults(func=run_decode)
+
+    encode = subparsers.add_parser(
+        'encode', help="encode URLs into thunder:// links, the inverse of decode")
+    encode.add_argument('files', nargs='*', metavar='FILE',
+                        help="input files, one URL per line ('-' or none for stdin); "
+                             "gzip, bz2 and xz input is decompressed")
+    encode.add_argument('-e', '--keep-errors', action='store_true',
+                        help="write '# Error: ...' lines in place of failed URLs")
+    encode.add_argument('-m', '--mmap', action='store_true',
+                        help="memory-map input files instead of reading them "
+                             "(compressed files are always read)")
+    encode.add_argument('-j', '--workers', type=int, default=1, metavar='N',
+                        help="encode in N worker processes (0 = one per CPU core)")
+    encode.add_argument('--verify', action='store_true',
+                        help="decode every new link again and fail URLs that do not "
+                             "come back unchanged (percent-escapes resolved)")
+    encode.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='text',
+                        help="output format: plain links (default) or one record per URL "
+                             "with line, link, url, status, error, detail and host "
+                             "(parquet needs pyarrow)")
+    encode.add_argument('-o', '--output', metavar='PATH',
+                        help="write to this file instead of stdout, compressed if "
+                             "PATH ends in .gz, .bz2 or .xz")
+    encode.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print the summary to stderr")
+    encode.set_defaults(func=run_encode)
+
+    watch = subparsers.add_parser(
+        'watch', help="convert link files as they are written into a directory")
+    if builds('watch'):
+        add_watch_arguments(watch)
+    watch.set_defaults(func=run_watch)
+
+    serve = subparsers.add_parser('serve', help="serve the decoder over a local HTTP/JSON API")
+    if builds('serve'):
+        add_serve_arguments(serve)
+    serve.set_defaults(func=run_serve)
+
+    download = subparsers.add_parser(
+        'download', help="decode links and download the files with segmented, resumable transfers")
+    if builds('download'):
+        add_download_arguments(download)
+    download.set_defaults(func=run_download)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # The command is the first argument that is not an option
+    command = next((arg for arg in argv if not arg.startswith('-')), None)
+    args = build_parser(command).parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
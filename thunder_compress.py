@@ -0,0 +1,213 @@
+'''
+Compressed streams for thunder-https
+Link dumps and result archives are often kept as gzip, bz2 or xz files.
+Inputs are recognised by their magic bytes, whatever their name, and
+outputs are compressed when their name ends in .gz, .bz2 or .xz, so a
+conversion reads and writes them directly instead of going through an
+unpacked temporary copy.
+
+A compressed input is decompressed in a background thread that hands
+blocks of data to the reader through a bounded queue. zlib, bz2 and lzma
+release the GIL while they work, so decompression runs on one core while
+the decoder runs on another, and the queue bounds how far ahead it gets.
+'''
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+import zlib
+import thunder_core
+
+# Magic bytes at the start of a compressed stream, and the codec they select
+MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+)
+MAGIC_LEN = max(len(magic) for magic, _ in MAGIC)
+
+# Output file extension -> codec
+EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+
+# Readers over an open binary stream, and openers of a file for writing
+DECOMPRESSORS = {
+    'gzip': lambda stream: gzip.GzipFile(fileobj=stream, mode='rb'),
+    'bz2': bz2.BZ2File,
+    'xz': lzma.LZMAFile,
+}
+COMPRESSORS = {
+    # zlib's default level: level 9 is several times slower for a few percent
+    'gzip': lambda path: gzip.open(path, 'wb', compresslevel=6),
+    'bz2': lambda path: bz2.open(path, 'wb'),
+    'xz': lambda path: lzma.open(path, 'wb'),
+}
+
+# Decompressed bytes per block handed to the reader
+BLOCK_SIZE = 1 << 20
+
+# Blocks decompressed ahead of the reader, bounding the memory they take
+QUEUE_BLOCKS = 8
+
+# Seconds between checks for a closed reader while the queue is full
+PUT_TIMEOUT = 0.1
+
+# Corrupt or truncated data; reported as OSError, like a failed read
+DATA_ERRORS = (EOFError, zlib.error, lzma.LZMAError)
+
+
+def sniff(head):
+    """Return the codec whose magic bytes start head, or None"""
+    for magic, codec in MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def detect_codec(path):
+    """Return the codec a file is compressed with, or None for a plain file"""
+    with open(path, 'rb') as f:
+        return sniff(f.read(MAGIC_LEN))
+
+
+def codec_for_path(path):
+    """Return the codec selected by the extension of path, or None"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def strip_extension(path):
+    """Return path without its compression extension, e.g. a.jsonl.gz -> a.jsonl"""
+    if codec_for_path(path) is None:
+        return path
+    return os.path.splitext(path)[0]
+
+
+class ThreadedReader(io.RawIOBase):
+    """Raw stream of the data a background thread reads from source
+
+    Wrap it in io.BufferedReader for lines and small reads. Closing it
+    stops the thread, then closes source and stream.
+    """
+
+    def __init__(self, source, stream, block_size=BLOCK_SIZE, queue_blocks=QUEUE_BLOCKS):
+        super().__init__()
+        self._source = source
+        self._stream = stream
+        self._queue = queue.Queue(queue_blocks)
+        self._stopping = threading.Event()
+        self._block = memoryview(b'')
+        self._pos = 0
+        self._done = False
+        self._thread = threading.Thread(target=self._run, args=(block_size,),
+                                        name='thunder-decompress', daemon=True)
+        self._thread.start()
+
+    def _run(self, block_size):
+        read = self._source.read
+        try:
+            while True:
+                block = read(block_size)
+                # An empty block marks the end
+                if not self._put(block) or not block:
+                    return
+        except DATA_ERRORS as e:
+            self._put(OSError(f"Invalid compressed data: {e}"))
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        """Queue item unless the reader is closing; return False once it is"""
+        while not self._stopping.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        block, pos = self._block, self._pos
+        if pos == len(block):
+            if self._done:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                self._done = True
+                raise item
+            if not item:
+                self._done = True
+                return 0
+            block, pos = memoryview(item), 0
+        size = min(len(buffer), len(block) - pos)
+        buffer[:size] = block[pos:pos + size]
+        self._block, self._pos = block, pos + size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stopping.set()
+            self._thread.join()
+            self._source.close()
+            self._stream.close()
+        super().close()
+
+
+def wrap_input(stream, block_size=BLOCK_SIZE, queue_blocks=QUEUE_BLOCKS):
+    """Return a binary stream of the decompressed data of stream
+
+    stream needs peek() (an io.BufferedReader). A plain stream is returned
+    as is; a compressed one is decompressed in a background thread, and
+    closing the returned stream closes stream too.
+    """
+    codec = sniff(stream.peek(MAGIC_LEN)[:MAGIC_LEN])
+    if codec is None:
+        return stream
+    reader = ThreadedReader(DECOMPRESSORS[codec](stream), stream, block_size, queue_blocks)
+    return io.BufferedReader(reader, block_size)
+
+
+def open_input(path, block_size=BLOCK_SIZE):
+    """Open a file for binary reading, decompressed if it is compressed"""
+    stream = open(path, 'rb', buffering=block_size)
+    try:
+        return wrap_input(stream, block_size)
+    except BaseException:
+        stream.close()
+        raise
+
+
+def iter_lines(path):
+    """Yield stripped, non-empty byte lines of a file, decompressed if it is compressed
+
+    The same lines as thunder_core.iter_mapped_lines yields for a plain file.
+    """
+    with open_input(path) as f:
+        yield from thunder_core.iter_links(f)
+
+
+def extract_links(path):
+    """Yield the thunder links found in a file, decompressed if it is compressed"""
+    with open_input(path) as f:
+        yield from thunder_core.extract_links(f)
+
+
+def open_output(path, text=False, errors='strict', newline='', buffering=BLOCK_SIZE):
+    """Open a file for writing, compressed if its name ends in .gz, .bz2 or .xz
+
+    text returns a UTF-8 text stream; newline is as for open().
+    """
+    codec = codec_for_path(path)
+    if codec is None:
+        if text:
+            return open(path, 'w', encoding='utf-8', errors=errors, newline=newline,
+                        buffering=buffering)
+        return open(path, 'wb', buffering=buffering)
+    stream = COMPRESSORS[codec](path)
+    if text:
+        return io.TextIOWrapper(stream, encoding='utf-8', errors=errors, newline=newline)
+    return stream
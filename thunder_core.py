@@ -0,0 +1,461 @@
+'''
+Qt-free decoding core for thunder-https
+Shared by thunder_en.py, thunder_ch.py and the headless tools, so the
+decoding rules live in exactly one place and can be used without PyQt5.
+
+A thunder link is "thunder://" + base64("AA" + url + "ZZ"), where url may
+be percent-encoded. encode_url builds links by the same rules, for
+publishing URLs as thunder links.
+'''
+from collections import deque, namedtuple
+from itertools import islice
+from urllib import parse
+import binascii
+import mmap
+import os
+import re
+
+PREFIX = 'thunder://'
+PREFIX_LEN = len(PREFIX)
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+# Error codes carried by DecodeResult.error
+ERROR_PREFIX = 'prefix'    # does not start with thunder://
+ERROR_FORMAT = 'format'    # payload is not made of base64 characters
+ERROR_CONTENT = 'content'  # decoded payload is missing the AA...ZZ envelope
+ERROR_DECODE = 'decode'    # base64 or UTF-8 decoding failed, see detail
+ERROR_SCHEME = 'scheme'    # no decoder registered for the link scheme
+ERROR_ENCODE = 'encode'    # URL to encode is not valid UTF-8 text, see detail
+ERROR_ROUNDTRIP = 'roundtrip'  # encoded link does not decode back to the URL
+
+# Loose format accepted by the GUI since v1.0
+THUNDER_PATTERN = re.compile(r'^thunder://[A-Za-z0-9+/=]+$')
+
+# Bytes fast path: a whole canonical link with a non-empty payload, used
+# where binascii has no strict_mode (Python < 3.11)
+PREFIX_BYTES = PREFIX.encode('ascii')
+STRICT_LINK_BYTES_PATTERN = re.compile(
+    rb'thunder://(?=[A-Za-z0-9+/])(?:[A-Za-z0-9+/]{4})*'
+    rb'(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?')
+
+try:
+    binascii.a2b_base64(b'', strict_mode=True)
+    HAVE_STRICT_BASE64 = True
+except TypeError:
+    HAVE_STRICT_BASE64 = False
+
+# Scanner for thunder tokens embedded in text or HTML: any case prefix,
+# standard or URL-safe base64, padding optional or percent-encoded (%3D)
+SCAN_PATTERN = re.compile(rb'(?i:thunder)://([A-Za-z0-9+/_-]+)(?:=|%3[Dd])*')
+SCAN_TEXT_PATTERN = re.compile(SCAN_PATTERN.pattern.decode('ascii'))
+URLSAFE_TABLE = bytes.maketrans(b'-_', b'+/')
+URLSAFE_TEXT_TABLE = str.maketrans('-_', '+/')
+
+# Bytes read per block when scanning a stream for links
+SCAN_BLOCK_SIZE = 1 << 20
+
+# Links per work unit sent to a worker process, large enough to amortize IPC
+CHUNK_SIZE = 20000
+
+DecodeResult = namedtuple('DecodeResult', 'link url status error detail')
+
+
+def is_valid_link(link):
+    """Validate Thunder link format"""
+    return THUNDER_PATTERN.match(link) is not None
+
+
+def check_link(link):
+    """Return the error code of a stripped str link's format, or None if it is well formed"""
+    if not link.startswith(PREFIX):
+        return ERROR_PREFIX
+    if THUNDER_PATTERN.match(link) is None:
+        return ERROR_FORMAT
+    return None
+
+
+def decode_payload(link):
+    """Return the base64-decoded payload of a well-formed link; raises binascii.Error"""
+    return binascii.a2b_base64(link[PREFIX_LEN:])
+
+
+def unwrap_url(text):
+    """Return the URL in a decoded AA...ZZ payload with its escapes resolved, or None"""
+    if not (text.startswith('AA') and text.endswith('ZZ')):
+        return None
+    return parse.unquote(text[2:-2])
+
+
+def decode_link(link):
+    """Decode a single thunder link (str or bytes) into a DecodeResult
+
+    The steps are check_link, decode_payload, UTF-8 decoding and
+    unwrap_url; thunder_profile times the same functions one by one.
+    """
+    if not isinstance(link, str):
+        return decode_link_bytes(link)
+    link = link.strip()
+    error = check_link(link)
+    if error is not None:
+        return DecodeResult(link, None, STATUS_ERROR, error, None)
+    try:
+        text = decode_payload(link).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        return DecodeResult(link, None, STATUS_ERROR, ERROR_DECODE, str(e))
+    url = unwrap_url(text)
+    if url is None:
+        return DecodeResult(link, None, STATUS_ERROR, ERROR_CONTENT, None)
+    return DecodeResult(link, url, STATUS_OK, None, None)
+
+
+def decode_payload_bytes(line):
+    """Validate and decode the payload of a canonical stripped bytes link, or None
+
+    With strict_mode one C call does both; only malformed links fail.
+    """
+    if HAVE_STRICT_BASE64:
+        if line.startswith(PREFIX_BYTES):
+            try:
+                return binascii.a2b_base64(line[PREFIX_LEN:], strict_mode=True)
+            except binascii.Error:
+                pass
+    elif STRICT_LINK_BYTES_PATTERN.fullmatch(line) is not None:
+        return binascii.a2b_base64(line[PREFIX_LEN:])
+    return None
+
+
+def unwrap_url_bytes(decoded):
+    """Return the URL in a decoded AA...ZZ payload as str, or None if it is unusual"""
+    if not (decoded.startswith(b'AA') and decoded.endswith(b'ZZ')):
+        return None
+    try:
+        if b'%' not in decoded:
+            return decoded[2:-2].decode('utf-8')
+        if decoded.isascii():
+            # Strict here; invalid escapes fall back to unquote's replacement
+            return parse.unquote_to_bytes(decoded[2:-2]).decode('utf-8')
+        return parse.unquote(decoded[2:-2].decode('utf-8'))
+    except UnicodeDecodeError:
+        return None
+
+
+def decode_link_bytes(line):
+    """Decode a thunder link given as bytes, e.g. a line read from a file
+
+    Canonical links are checked and decoded on the raw bytes and converted
+    to str only once at the end; anything unusual goes through decode_link
+    so results and error details stay identical.
+    """
+    line = line.strip()
+    decoded = decode_payload_bytes(line)
+    if decoded is not None:
+        url = unwrap_url_bytes(decoded)
+        if url is not None:
+            return DecodeResult(line.decode('ascii'), url, STATUS_OK, None, None)
+    return decode_link(line.decode('utf-8', 'surrogateescape'))
+
+
+def encode_url(url):
+    """Encode a URL (str or bytes) into a thunder link, the inverse of decode_link
+
+    The URL goes into the AA...ZZ envelope as UTF-8 and unchanged, the way
+    thunder links carry percent-encoded URLs; decode_link gives it back
+    with the escapes resolved. Returns a DecodeResult whose link is the
+    new thunder link, or None on error.
+    """
+    if isinstance(url, str):
+        url = url.strip()
+        try:
+            data = url.encode('utf-8')
+        except UnicodeEncodeError as e:
+            return DecodeResult(None, url, STATUS_ERROR, ERROR_ENCODE, str(e))
+    else:
+        data = url.strip()
+        try:
+            url = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            return DecodeResult(None, data.decode('utf-8', 'surrogateescape'),
+                                STATUS_ERROR, ERROR_ENCODE, str(e))
+    link = PREFIX + binascii.b2a_base64(b'AA' + data + b'ZZ', newline=False).decode('ascii')
+    return DecodeResult(link, url, STATUS_OK, None, None)
+
+
+def encode_url_verified(url):
+    """Like encode_url, and decode the new link to check it gives the URL back
+
+    The URL is compared with its escapes resolved byte-wise, so escapes
+    that are not UTF-8 (e.g. a Latin-1 %E4), which decode to U+FFFD, fail.
+    """
+    result = encode_url(url)
+    if result.status == STATUS_OK:
+        try:
+            expected = parse.unquote_to_bytes(result.url).decode('utf-8')
+        except UnicodeDecodeError as e:
+            detail = f"escapes are not UTF-8 ({e})"
+        else:
+            decoded = decode_link(result.link)
+            if decoded.url == expected:
+                return result
+            detail = (f"decodes to {decoded.url!r}" if decoded.status == STATUS_OK
+                      else f"does not decode ({decoded.error})")
+        return DecodeResult(result.link, result.url, STATUS_ERROR, ERROR_ROUNDTRIP, detail)
+    return result
+
+
+def decode_many(links, workers=1, cache=None, decode=decode_link):
+    """Decode an iterable of thunder links, returning results in input order
+
+    workers > 1 shards the links across a process pool, None uses every core.
+    With a cache (see thunder_cache.DecodeCache), identical links in the
+    batch are decoded only once and earlier results are reused. decode is
+    the per-link decoder, e.g. thunder_schemes.decode_any for mixed schemes;
+    it must be a module-level function when workers > 1.
+    """
+    if workers != 1:
+        return list(decode_parallel(links, workers, cache=cache, decode=decode))
+    if cache is not None:
+        links = list(links)
+        known, missing = _lookup_unique(links, cache)
+        for link in missing:
+            known[link] = result = decode(link)
+            cache.put(link, result)
+        return [known[link] for link in links]
+    return [decode(link) for link in links]
+
+
+def _lookup_unique(links, cache):
+    """Look up each distinct link once, returning (known results, missing links)"""
+    known = {}
+    missing = []
+    for link in links:
+        if link not in known:
+            known[link] = result = cache.get(link)
+            if result is None:
+                missing.append(link)
+    return known, missing
+
+
+def _decode_chunk(links, decode):
+    """Worker entry point: decode one work unit"""
+    return [decode(link) for link in links]
+
+
+def iter_chunks(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    it = iter(iterable)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
+
+
+def _submit_chunk(pool, chunk, cache, decode):
+    """Send the links of a chunk that are not cached to a worker process"""
+    if cache is None:
+        return chunk, None, None, pool.submit(_decode_chunk, chunk, decode)
+    known, missing = _lookup_unique(chunk, cache)
+    return chunk, known, missing, pool.submit(_decode_chunk, missing, decode)
+
+
+def _collect_chunk(work, cache):
+    """Wait for a chunk and merge worker results with cached ones"""
+    chunk, known, missing, future = work
+    results = future.result()
+    if known is None:
+        return results
+    for link, result in zip(missing, results):
+        known[link] = result
+        cache.put(link, result)
+    return [known[link] for link in chunk]
+
+
+def decode_parallel(links, workers=None, chunk_size=CHUNK_SIZE, cache=None,
+                    decode=decode_link):
+    """Decode links in worker processes, yielding results in input order
+
+    At most two work units per worker are in flight, so the input is
+    consumed lazily and memory stays bounded on streaming input. The cache
+    lives in this process; only links it cannot answer are sent out.
+    """
+    # Imported here: multiprocessing is slow to import and most callers never need it
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in iter_chunks(links, chunk_size):
+            pending.append(_submit_chunk(pool, chunk, cache, decode))
+            if len(pending) >= workers * 2:
+                yield from _collect_chunk(pending.popleft(), cache)
+        while pending:
+            yield from _collect_chunk(pending.popleft(), cache)
+
+
+def iter_links(lines):
+    """Yield stripped, non-empty lines from any iterable of lines"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def decode_stream(lines, workers=1, cache=None, decode=decode_link):
+    """Lazily decode an iterable of lines, keeping memory use constant"""
+    if workers != 1:
+        yield from decode_parallel(iter_links(lines), workers, cache=cache, decode=decode)
+        return
+    if cache is None:
+        for link in iter_links(lines):
+            yield decode(link)
+        return
+    get, put = cache.get, cache.put
+    for link in iter_links(lines):
+        result = get(link)
+        if result is None:
+            result = decode(link)
+            put(link, result)
+        yield result
+
+
+def encode_many(urls, workers=1, verify=False):
+    """Encode an iterable of URLs, returning results in input order
+
+    workers is as for decode_many; verify decodes every new link again
+    and reports a mismatch as ERROR_ROUNDTRIP.
+    """
+    return decode_many(urls, workers, decode=encode_url_verified if verify else encode_url)
+
+
+def encode_stream(lines, workers=1, verify=False):
+    """Lazily encode an iterable of URL lines, keeping memory use constant"""
+    return decode_stream(lines, workers, decode=encode_url_verified if verify else encode_url)
+
+
+def encode_chunk(urls, verify=False):
+    """Encode a chunk of stripped URL lines (bytes) into thunder link lines
+
+    The fast path for plain text output: no result objects are built, one
+    isascii call vouches for the whole chunk and base64's trailing newline
+    ends each line. Chunks with other bytes go through encode_url one by
+    one. Returns (output bytes, links written, URLs that failed).
+    """
+    b2a = binascii.b2a_base64
+    if b''.join(urls).isascii():
+        lines = [b'thunder://' + b2a(b'AA' + url + b'ZZ') for url in urls]
+        if not verify:
+            return b''.join(lines), len(lines), 0
+        # Compared byte-wise, as encode_url_verified does
+        decode, unquote = decode_link_bytes, parse.unquote_to_bytes
+        if all(decode(line).url.encode('utf-8') == unquote(url)
+               for url, line in zip(urls, lines)):
+            return b''.join(lines), len(lines), 0
+    encode = encode_url_verified if verify else encode_url
+    lines = [result.link.encode('ascii') + b'\n' for result in map(encode, urls)
+             if result.status == STATUS_OK]
+    return b''.join(lines), len(lines), len(urls) - len(lines)
+
+
+def encode_lines(lines, workers=1, verify=False, chunk_size=CHUNK_SIZE):
+    """Encode URL lines (bytes) a chunk at a time, yielding encode_chunk tuples
+
+    workers > 1 encodes chunks in a process pool, None uses every core;
+    chunks come back in input order with at most two per worker in flight.
+    Only bytes cross the process boundary, so the pool scales.
+    """
+    chunks = iter_chunks(iter_links(lines), chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield encode_chunk(chunk, verify)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(encode_chunk, chunk, verify))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_mapped_lines(path):
+    """Yield stripped, non-empty lines of a file as bytes via a memory map
+
+    Only one line at a time is copied out of the mapping, so the file is
+    never materialised as a whole.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            find = mapped.find
+            size = len(mapped)
+            start = 0
+            while start < size:
+                end = find(b'\n', start)
+                if end < 0:
+                    end = size
+                line = mapped[start:end].strip()
+                if line:
+                    yield line
+                start = end + 1
+
+
+def split_links(text):
+    """Split pasted text into stripped, non-empty lines"""
+    return [line for line in map(str.strip, text.splitlines()) if line]
+
+
+def scan_links(data):
+    """Yield every thunder link found in str, bytes or a memory map
+
+    Links are yielded in canonical form (lowercase prefix, standard base64
+    alphabet, padding restored) and of the same type as data, ready for
+    decode_link.
+    """
+    if isinstance(data, str):
+        prefix, pattern, table, pad = PREFIX, SCAN_TEXT_PATTERN, URLSAFE_TEXT_TABLE, '='
+    else:
+        prefix, pattern, table, pad = PREFIX_BYTES, SCAN_PATTERN, URLSAFE_TABLE, b'='
+    for match in pattern.finditer(data):
+        payload = match.group(1).translate(table)
+        yield prefix + payload + pad * (-len(payload) % 4)
+
+
+def extract_links(stream, block_size=SCAN_BLOCK_SIZE):
+    """Yield the thunder links found in a binary stream, one block at a time
+
+    A link cut by a block boundary is carried over to the next block, so
+    every byte is scanned once and memory stays bounded by the block size.
+    """
+    finditer = SCAN_PATTERN.finditer
+    tail = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        data = tail + block
+        end = len(data)
+        # A prefix cut by the boundary is rescanned with the next block
+        keep = max(0, end - PREFIX_LEN)
+        for match in finditer(data):
+            if match.end() == end:
+                keep = match.start()
+                break
+            payload = match.group(1).translate(URLSAFE_TABLE)
+            yield PREFIX_BYTES + payload + b'=' * (-len(payload) % 4)
+        tail = data[keep:]
+    yield from scan_links(tail)
+
+
+def extract_mapped_links(path):
+    """Yield the thunder links found in a file, scanning it through a memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from scan_links(mapped)
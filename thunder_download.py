@@ -0,0 +1,453 @@
+'''
+Segmented downloader for thunder-https
+Downloads decoded URLs with several HTTP Range requests per file over
+pooled keep-alive connections, with a cap on the connections open across
+the whole batch. Only the standard library is used.
+
+Each file is written into a preallocated NAME.part file next to a small
+NAME.part.json state file recording how far every segment got, saved
+every few seconds after the data is synced to disk. A batch interrupted
+by a crash or stop() resumes from that state on the next run; servers
+without Range support are downloaded in one piece and start over.
+'''
+from collections import namedtuple
+from urllib import parse
+import asyncio
+import json
+import os
+import re
+import thunder_probe
+
+DEFAULT_CONCURRENCY = 8     # connections open across the batch
+DEFAULT_SEGMENTS = 4        # connections per file
+DEFAULT_PER_HOST = 8
+DEFAULT_TIMEOUT = 30.0      # seconds without data before a connection is retried
+DEFAULT_RETRIES = 5
+
+# Files smaller than two of these are not split
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+# Bytes read per socket call, and collected per segment before a disk write
+READ_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Seconds between state saves, and between progress callbacks
+STATE_SAVE_INTERVAL = 2.0
+PROGRESS_INTERVAL = 0.25
+
+# Seconds between cancels of segments that have not stopped yet
+CANCEL_RETRY_INTERVAL = 0.1
+
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+
+STATUS_DONE = 'done'
+STATUS_SKIPPED = 'skipped'  # already downloaded
+STATUS_FAILED = 'failed'
+STATUS_STOPPED = 'stopped'  # resumable
+
+DownloadResult = namedtuple('DownloadResult', 'url path status size error')
+
+# Characters not allowed in file names on Windows, plus control characters
+UNSAFE_NAME_PATTERN = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+DISPOSITION_PATTERN = re.compile(
+    r'''filename\*\s*=\s*UTF-8''([^;]+)|filename\s*=\s*"([^"]*)"|filename\s*=\s*([^;]+)''',
+    re.IGNORECASE)
+MAX_NAME_LEN = 200
+
+
+class DownloadError(Exception):
+    """Raised for responses a download cannot continue from"""
+
+
+def safe_name(name):
+    """Turn a URL or header file name into a safe local file name"""
+    name = UNSAFE_NAME_PATTERN.sub('_', name).strip(' .')
+    if len(name) > MAX_NAME_LEN:
+        stem, ext = os.path.splitext(name)
+        name = stem[:MAX_NAME_LEN - len(ext)] + ext
+    return name or 'download'
+
+
+def file_name(url, headers):
+    """Name a download after Content-Disposition, or the last segment of the URL path"""
+    match = DISPOSITION_PATTERN.search(headers.get('content-disposition', ''))
+    if match:
+        if match.group(1):
+            return safe_name(parse.unquote(match.group(1).strip()))
+        return safe_name(match.group(2) if match.group(2) is not None else match.group(3).strip())
+    path = parse.urlsplit(url).path
+    return safe_name(parse.unquote(path.rsplit('/', 1)[-1]))
+
+
+class DownloadState:
+    """Segment progress of one file: [[next byte, end byte), ...], saved as JSON"""
+
+    def __init__(self, path, url, size, segments):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.segments = segments
+
+    @classmethod
+    def load(cls, path):
+        """Return the saved state, or None if there is none or it is unreadable"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(path, data['url'], data['size'], data['segments'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @property
+    def done(self):
+        return self.size - sum(end - pos for pos, end in self.segments)
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'url': self.url, 'size': self.size, 'segments': self.segments}, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def split_segments(size, count):
+    """Split size bytes into at most count segments of at least MIN_SEGMENT_SIZE"""
+    count = max(1, min(count, size // MIN_SEGMENT_SIZE))
+    bounds = [size * i // count for i in range(count + 1)]
+    return [[bounds[i], bounds[i + 1]] for i in range(count)]
+
+
+def preallocate(f, size):
+    """Reserve size bytes for f, so segments never extend the file"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            pass  # e.g. not supported by the file system
+    f.truncate(size)
+
+
+async def _iter_body(reader, headers, timeout):
+    """Yield a response body in pieces, by length, chunked or until EOF"""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            size = int(line.split(b';')[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield await asyncio.wait_for(reader.readexactly(size), timeout)
+            await reader.readexactly(2)
+    length = headers.get('content-length')
+    remaining = int(length) if length is not None else None
+    while remaining is None or remaining > 0:
+        piece = await asyncio.wait_for(
+            reader.read(READ_SIZE if remaining is None else min(remaining, READ_SIZE)), timeout)
+        if not piece:
+            if remaining is None:
+                return
+            raise asyncio.IncompleteReadError(b'', remaining)
+        if remaining is not None:
+            remaining -= len(piece)
+        yield piece
+
+
+class Downloader:
+    """Download URLs into a directory with segmented, resumable transfers
+
+    progress, if given, is called with (files finished, files, bytes
+    downloaded, bytes expected) at most every PROGRESS_INTERVAL seconds;
+    bytes expected grows as file sizes become known.
+    """
+
+    def __init__(self, directory, concurrency=DEFAULT_CONCURRENCY, segments=DEFAULT_SEGMENTS,
+                 per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 progress=None):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.segments = segments
+        self.timeout = timeout
+        self.retries = retries
+        self.progress = progress
+        self.pool = thunder_probe.ConnectionPool(per_host)
+        self.files_done = 0
+        self.files_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self._limit = None
+        self._reserved = set()  # paths claimed by this run
+        self._loop = None
+        self._tasks = []
+        self._stopping = False
+
+    def stop(self):
+        """Stop the batch, keeping partial files resumable; safe from any thread"""
+        self._stopping = True
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._cancel)
+            except RuntimeError:
+                pass  # the batch already finished and closed its loop
+
+    def _cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _open(self, url, offset=None, end=None, redirects=thunder_probe.DEFAULT_MAX_REDIRECTS):
+        """Send a GET, following redirects
+
+        Returns (key, reader, writer, status, headers, final url, reusable);
+        the caller reads the body and releases the connection.
+        """
+        for _ in range(redirects + 1):
+            key, target, host = thunder_probe.split_url(url)
+            request = (f"GET {target} HTTP/1.1\r\n"
+                       f"Host: {host}\r\n"
+                       f"User-Agent: {thunder_probe.USER_AGENT}\r\n"
+                       f"Accept-Encoding: identity\r\n")
+            if offset is not None:
+                request += f"Range: bytes={offset}-{'' if end is None else end - 1}\r\n"
+            request = (request + "\r\n").encode('latin-1')
+            reader, writer, reused = await self.pool.connect(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                version, status, headers = await asyncio.wait_for(
+                    thunder_probe.read_headers(reader), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused:
+                    raise
+                # Idle connection was closed by the server; retry on a fresh one
+                reader, writer, _ = await self.pool.connect(key)
+                writer.write(request)
+                await writer.drain()
+                version, status, headers = await asyncio.wait_for(
+                    thunder_probe.read_headers(reader), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            reusable = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            location = headers.get('location')
+            if status in thunder_probe.REDIRECT_STATUSES and location:
+                drained = await thunder_probe.drain_body(reader, 'GET', status, headers)
+                self.pool.release(key, reader, writer, drained and reusable)
+                url = parse.urljoin(url, location)
+                continue
+            return key, reader, writer, status, headers, url, reusable
+        raise DownloadError("too many redirects")
+
+    async def _probe(self, url):
+        """Return (final url, size or None, supports ranges, headers)"""
+        async with self._limit, self.pool.limit(thunder_probe.split_url(url)[0]):
+            key, reader, writer, status, headers, url, reusable = await self._open(url, 0, 1)
+            if status == 206:
+                drained = await thunder_probe.drain_body(reader, 'GET', status, headers)
+                self.pool.release(key, reader, writer, drained and reusable)
+                total = headers.get('content-range', '').rpartition('/')[2]
+                return url, int(total) if total.isdigit() else None, total.isdigit(), headers
+            # Ranges unsupported: the whole body is coming, drop the connection
+            writer.close()
+            if status != 200:
+                raise DownloadError(f"HTTP {status}")
+            length = headers.get('content-length')
+            return url, int(length) if length and length.isdigit() else None, False, headers
+
+    def _target(self, url, name, size):
+        """Pick the local path for url; return (path, saved state or None, complete)"""
+        stem, ext = os.path.splitext(name)
+        number = 0
+        while True:
+            path = os.path.join(self.directory, name if not number else f"{stem} ({number}){ext}")
+            number += 1
+            if path in self._reserved:
+                continue
+            state = DownloadState.load(path + STATE_SUFFIX)
+            if state is not None:
+                if state.url != url or state.size != size:
+                    continue
+            elif os.path.exists(path):
+                # A finished file of the expected size from an earlier run is
+                # taken as this download; paths claimed in this run are skipped above
+                if size is not None and os.path.getsize(path) == size:
+                    return path, None, True
+                continue
+            self._reserved.add(path)
+            return path, state, False
+
+    async def _fetch_segment(self, url, f, segment, state):
+        """Download one [next, end) segment into f, retrying on transient errors"""
+        failures = 0
+        host_limit = self.pool.limit(thunder_probe.split_url(url)[0])
+        while segment[0] < segment[1]:
+            buffer = bytearray()
+            start = segment[0]
+            try:
+                async with self._limit, host_limit:
+                    key, reader, writer, status, headers, _, reusable = await self._open(
+                        url, segment[0], segment[1])
+                    finished = False
+                    try:
+                        if status != 206:
+                            raise DownloadError(f"range request answered with HTTP {status}")
+                        content_range = headers.get('content-range', '')
+                        if not content_range.startswith(f"bytes {segment[0]}-"):
+                            raise DownloadError(
+                                f"asked for bytes {segment[0]}-{segment[1] - 1}, "
+                                f"got Content-Range {content_range!r}")
+                        async for piece in _iter_body(reader, headers, self.timeout):
+                            buffer += piece
+                            if len(buffer) >= WRITE_BUFFER_SIZE:
+                                self._write(f, segment, buffer)
+                        finished = True
+                    finally:
+                        self.pool.release(key, reader, writer, finished and reusable)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                failures = 0 if segment[0] + len(buffer) > start else failures + 1
+                if failures > self.retries:
+                    raise DownloadError(str(e) or e.__class__.__name__) from None
+                await asyncio.sleep(0.5 * 2 ** max(0, failures - 1))
+            finally:
+                # Whatever arrived is kept, also when cancelled
+                if buffer:
+                    self._write(f, segment, buffer)
+
+    def _write(self, f, segment, buffer):
+        size = min(len(buffer), segment[1] - segment[0])
+        f.seek(segment[0])
+        f.write(memoryview(buffer)[:size])
+        segment[0] += size
+        self.bytes_done += size
+        del buffer[:]
+
+    async def _save_periodically(self, f, state):
+        while True:
+            await asyncio.sleep(STATE_SAVE_INTERVAL)
+            self._checkpoint(f, state)
+
+    @staticmethod
+    def _checkpoint(f, state):
+        """Save the state once the data it describes is on disk"""
+        os.fsync(f.fileno())
+        state.save()
+
+    async def _fetch_whole(self, url, part):
+        """Download without ranges, in one piece from the start"""
+        async with self._limit, self.pool.limit(thunder_probe.split_url(url)[0]):
+            key, reader, writer, status, headers, _, _ = await self._open(url)
+            try:
+                if status != 200:
+                    raise DownloadError(f"HTTP {status}")
+                with open(part, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                    async for piece in _iter_body(reader, headers, self.timeout):
+                        f.write(piece)
+                        self.bytes_done += len(piece)
+            finally:
+                writer.close()
+
+    async def download(self, url):
+        """Download one URL into the directory, returning a DownloadResult"""
+        path = size = None
+        requested = url
+        try:
+            url, size, ranges, headers = await self._probe(url)
+            path, state, complete = self._target(url, file_name(url, headers), size)
+            if complete:
+                return DownloadResult(requested, path, STATUS_SKIPPED, size, None)
+            if size is not None:
+                self.bytes_total += size
+            part = path + PART_SUFFIX
+            if not ranges or not size:
+                await self._fetch_whole(url, part)
+            else:
+                await self._fetch_ranges(url, path, part, size, state)
+            os.replace(part, path)
+            return DownloadResult(requested, path, STATUS_DONE, os.path.getsize(path), None)
+        except asyncio.CancelledError:
+            return DownloadResult(requested, path, STATUS_STOPPED, size, None)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError,
+                thunder_probe.ProbeError, DownloadError) as e:
+            return DownloadResult(requested, path, STATUS_FAILED, None, str(e) or e.__class__.__name__)
+        finally:
+            self.files_done += 1
+
+    async def _fetch_ranges(self, url, path, part, size, state):
+        """Download the missing segments of a file concurrently"""
+        if state is None or not os.path.exists(part):
+            state = DownloadState(path + STATE_SUFFIX, url, size,
+                                  split_segments(size, self.segments))
+            with open(part, 'wb') as f:
+                preallocate(f, size)
+        self.bytes_done += state.done
+        with open(part, 'r+b', buffering=0) as f:
+            saver = asyncio.ensure_future(self._save_periodically(f, state))
+            tasks = [asyncio.ensure_future(self._fetch_segment(url, f, segment, state))
+                     for segment in state.segments if segment[0] < segment[1]]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # One failed segment stops the others, which must be done
+                # with f and their connections before it is closed. Cancel
+                # until they are: before Python 3.12, wait_for drops a cancel
+                # that arrives just as the read it waits on completes
+                pending = tasks
+                while pending:
+                    for task in pending:
+                        task.cancel()
+                    _, pending = await asyncio.wait(pending, timeout=CANCEL_RETRY_INTERVAL)
+                await asyncio.gather(*tasks, return_exceptions=True)
+                saver.cancel()
+                self._checkpoint(f, state)
+        state.remove()
+
+    async def _report(self):
+        while True:
+            self.progress(self.files_done, self.files_total, self.bytes_done, self.bytes_total)
+            await asyncio.sleep(PROGRESS_INTERVAL)
+
+    async def download_many(self, urls):
+        """Download URLs with at most concurrency connections, results in input order"""
+        urls = list(urls)
+        self._loop = asyncio.get_running_loop()
+        self._limit = asyncio.Semaphore(self.concurrency)
+        self.files_total = len(urls)
+        results = [None] * len(urls)
+        queue = iter(enumerate(urls))
+
+        async def worker():
+            for index, url in queue:
+                results[index] = await self.download(url)
+                if self._stopping:
+                    break
+
+        reporter = None if self.progress is None else asyncio.ensure_future(self._report())
+        # Files in flight are bounded too, so only a few part files are open at once
+        self._tasks = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        if self._stopping:
+            self._cancel()
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+                self.progress(self.files_done, self.files_total, self.bytes_done, self.bytes_total)
+            self.pool.close()
+        return [result or DownloadResult(url, None, STATUS_STOPPED, None, None)
+                for url, result in zip(urls, results)]
+
+    def run(self, urls):
+        """Download URLs on a new event loop, blocking until done or stopped"""
+        return asyncio.run(self.download_many(urls))
+
+
+def download_urls(urls, directory, **options):
+    """Synchronously download URLs into directory; options are passed to Downloader"""
+    return Downloader(directory, **options).run(urls)
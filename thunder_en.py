@@ -10,16 +10,44 @@ Updates:
 5. Removed unnecessary exception handling in the open_links function because QDesktopServices.openUrl will not throw exceptions that need to be caught.
 '''
 import sys
+import thunder_instance
+
+if __name__ == '__main__':
+    # Both are decided before the Qt imports: a second launch hands its links to the
+    # open window, and headless mode needs no PyQt5
+    if thunder_instance.is_forwardable(sys.argv[1:]):
+        if thunder_instance.forward(sys.argv[1:]):
+            sys.exit(0)
+    else:
+        # Headless mode, e.g. thunder_en.py decode links.txt > urls.txt
+        import thunder_cli
+        if sys.argv[1] in thunder_cli.COMMANDS:
+            sys.exit(thunder_cli.main(sys.argv[1:]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLineEdit, QPushButton, QLabel,
-                            QMessageBox, QMenuBar, QAction, QStatusBar, 
-                            QFileDialog, QPlainTextEdit, QSizePolicy, QSpacerItem)
-from PyQt5.QtGui import QIcon, QDesktopServices, QTextCursor, QFont
-from PyQt5.QtCore import Qt, QUrl
-from urllib import parse
-import base64
+                            QMessageBox, QAction, QStatusBar, QFileDialog,
+                            QPlainTextEdit, QProgressBar, QCheckBox, QTableView,
+                            QHeaderView, QDialog, QDialogButtonBox)
+from PyQt5.QtGui import QDesktopServices, QFont, QColor
+from PyQt5.QtCore import (Qt, QUrl, QObject, QThread, QTimer, QProcess, pyqtSignal,
+                          QAbstractTableModel, QModelIndex)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import count, takewhile
+from time import perf_counter_ns
 import os
-import re
+import thunder_cache
+import thunder_core
+import thunder_report
+import thunder_schemes
+import thunder_store
+import thunder_writers
+
+# asyncio, multiprocessing and the rest of the CLI are imported only when used,
+# so the window shows without waiting for them
 
 # Style constants
 INPUT_STYLE = """
@@ -58,7 +86,7 @@ BUTTON_STYLE = """
 """
 
 RESULT_STYLE = """
-    QPlainTextEdit {
+    QTableView {
         border: 2px solid #2ecc71;
         border-radius: 10px;
         padding: 8px;
@@ -67,6 +95,355 @@ RESULT_STYLE = """
     }
 """
 
+# Error messages for each decode error code
+ERROR_MESSAGES = {
+    thunder_core.ERROR_PREFIX: "Address must start with thunder://",
+    thunder_core.ERROR_FORMAT: "Invalid Thunder link format",
+    thunder_core.ERROR_CONTENT: "Invalid Thunder link content",
+    thunder_core.ERROR_DECODE: "Exception occurred during processing: ",
+    thunder_core.ERROR_SCHEME: "Unsupported link type",
+    thunder_core.ERROR_ENCODE: "URL is not valid UTF-8: ",
+    thunder_core.ERROR_ROUNDTRIP: "Encoded link does not decode back to the URL: ",
+}
+
+# Number of links decoded between two incremental result updates
+CONVERT_CHUNK_SIZE = 2000
+
+# Live conversion: delay after the last edit before the edited lines are decoded
+LIVE_DELAY_MS = 300
+
+# Edited lines re-decoded in place; a larger edit (e.g. a big paste) converts the
+# whole input again in the worker thread
+LIVE_MAX_LINES = 5000
+
+# Browser link opening: links per batch and delay between batches
+OPEN_BATCH_SIZE = 5
+OPEN_INTERVAL_MS = 2000
+
+# Save dialog filters and the structured format each one writes (None = plain URLs)
+SAVE_FORMATS = {
+    "Text Files (*.txt)": None,
+    "JSON Lines (*.jsonl)": 'jsonl',
+    "CSV Files (*.csv)": 'csv',
+    # Needs pyarrow; saving without it reports how to install it
+    "Parquet Files (*.parquet)": 'parquet',
+    "All Files (*)": None,
+}
+
+# Download manager command; {file} is replaced by a file listing the URLs
+DOWNLOAD_MANAGER = os.environ.get('THUNDER_HTTPS_DOWNLOADER', 'aria2c --input-file {file}')
+
+# Failed downloads listed in the summary dialog
+MAX_LISTED_FAILURES = 20
+
+def format_error(result):
+    """Format the error reason of a failed result"""
+    message = ERROR_MESSAGES[result.error]
+    if result.detail:
+        message += result.detail
+    return message
+
+def format_report(summary):
+    """Format a batch report for the report dialog"""
+    lines = [f"Links: {summary['links']} ({summary['ok']} successful, {summary['failed']} failed)",
+             f"Duplicate URLs: {summary['duplicates']} ({summary['unique_urls']} unique)"]
+    if summary['ok']:
+        lines.append(f"Duplicate share: {100 * summary['duplicates'] / summary['ok']:.1f}%")
+    for title, key in (("Top hosts", 'top_hosts'), ("Top extensions", 'top_extensions')):
+        if summary[key]:
+            lines.append("")
+            lines.append(f"{title}:")
+            lines.extend(f"    {number}  {name}" for name, number in summary[key])
+    if summary['errors']:
+        lines.append("")
+        lines.append("Errors:")
+        lines.extend(f"    {number}  {ERROR_MESSAGES[error].rstrip(': ')}"
+                     for error, number in summary['errors'].items())
+    return "\n".join(lines)
+
+class ConvertWorker(QObject):
+    """Decode links in a background thread, emitting results chunk by chunk"""
+    chunk_ready = pyqtSignal(list)  # decode results
+    progress = pyqtSignal(int, int)  # done, total
+    failed = pyqtSignal(str)  # error message
+    finished = pyqtSignal(int, int, bool)  # success_count, error_count, cancelled
+    
+    def __init__(self, thunder_urls, total=0, cache=None, profiler=None, encode=False):
+        super().__init__()
+        self.thunder_urls = thunder_urls
+        self.total = total  # 0 when unknown
+        self.cache = cache
+        self.profiler = profiler
+        self.encode = encode
+        self._cancelled = False
+        
+    def run(self):
+        """Decode all links, stopping early when cancelled"""
+        done = 0
+        success_count = 0
+        error_count = 0
+        
+        links = self.thunder_urls
+        profiler = self.profiler
+        if profiler is not None:
+            links = profiler.sample_links(profiler.iterate(links, 'read'))
+        try:
+            for chunk in thunder_core.iter_chunks(links, CONVERT_CHUNK_SIZE):
+                if self._cancelled:
+                    break
+                if self.encode:
+                    # The table shows input, then output, so the URL takes the link column
+                    results = [thunder_core.DecodeResult(result.url, result.link, *result[2:])
+                               for result in thunder_core.encode_many(chunk, verify=True)]
+                elif profiler is None:
+                    results = thunder_core.decode_many(
+                        chunk, cache=self.cache, decode=thunder_schemes.decode_any)
+                else:
+                    start = perf_counter_ns()
+                    results = thunder_core.decode_many(
+                        chunk, cache=self.cache, decode=thunder_schemes.decode_any)
+                    profiler.add('decode', perf_counter_ns() - start, len(chunk))
+                ok = sum(1 for result in results if result.status == thunder_core.STATUS_OK)
+                success_count += ok
+                error_count += len(results) - ok
+                done += len(chunk)
+                self.chunk_ready.emit(results)
+                self.progress.emit(done, self.total)
+        except OSError as e:
+            # Reading the file failed part way through
+            self.failed.emit(str(e))
+            
+        self.finished.emit(success_count, error_count, self._cancelled)
+        
+    def cancel(self):
+        """Request the worker to stop after the current chunk"""
+        self._cancelled = True
+
+class DownloadWorker(QObject):
+    """Download URLs in a background thread with segmented, resumable transfers"""
+    progress = pyqtSignal(int, int, object, object)  # files finished, files, bytes done, bytes total
+    finished = pyqtSignal(list)  # DownloadResults
+    
+    def __init__(self, urls, directory):
+        super().__init__()
+        import thunder_download
+        self.urls = urls
+        self.downloader = thunder_download.Downloader(directory, progress=self.progress.emit)
+        
+    def run(self):
+        """Download all URLs; stopped downloads keep their partial files for resuming"""
+        self.finished.emit(self.downloader.run(self.urls))
+        
+    def stop(self):
+        """Stop the downloads; safe to call from the GUI thread"""
+        self.downloader.stop()
+
+class InstanceServer(QObject):
+    """Receive the links of later launches over a local socket"""
+    links_received = pyqtSignal(list)  # links
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        
+    def listen(self):
+        """Start listening; False if another window holds the name"""
+        name = thunder_instance.server_name()
+        # listen() would replace the socket of a live window too (with socket options
+        # set, Qt binds elsewhere and renames over it), so only a name nobody answers
+        # on is taken; a window that crashed leaves its socket file behind
+        if not self.is_free(name):
+            return False
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+        
+    def is_free(self, name):
+        """Return True if nobody answers on name, so it can be taken"""
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(int(thunder_instance.CONNECT_TIMEOUT * 1000)):
+            probe.disconnectFromServer()
+            return False
+        # A timeout may be a busy window, so the name is not free
+        return probe.error() in (QLocalSocket.ServerNotFoundError,
+                                 QLocalSocket.ConnectionRefusedError)
+        
+    def accept(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.disconnected.connect(lambda connection=connection: self.receive(connection))
+            # A quick sender may be gone before the connection is handed out
+            if connection.state() == QLocalSocket.UnconnectedState:
+                self.receive(connection)
+                
+    def receive(self, connection):
+        """Emit the links of a finished connection"""
+        data = bytes(connection.readAll()).decode('utf-8', 'replace')
+        connection.deleteLater()
+        self.links_received.emit(thunder_core.split_links(data))
+
+class ResultModel(QAbstractTableModel):
+    """Table model over a ResultStore, formatting rows only when they are shown"""
+    HEADERS = ("Input", "Output", "Status")
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = None  # Store indices of the rows shown while filtered, None shows every row
+        self.errors_only = False
+        self.host = ''
+        
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if self.rows is None else len(self.rows)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole, Qt.ForegroundRole):
+            return None
+        row = index.row() if self.rows is None else self.rows[index.row()]
+        result = self.store[row]
+        ok = result.status == thunder_core.STATUS_OK
+        if role == Qt.ForegroundRole:
+            return None if ok else QColor("#c0392b")
+        column = index.column()
+        if column == 0:
+            return result.link
+        if column == 1:
+            return result.url if ok else ""
+        return "OK" if ok else format_error(result)
+        
+    def append(self, results):
+        """Add a chunk of results to the store and show the rows that match"""
+        start = len(self.store)
+        if not results:
+            return
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), start, start + len(results) - 1)
+            self.store.extend(results)
+            self.endInsertRows()
+            return
+        self.store.extend(results)
+        matches = array('q', self.store.find(self.errors_only, self.host, start))
+        if matches:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+            self.rows.extend(matches)
+            self.endInsertRows()
+        
+    def replace(self, start, end, results):
+        """Replace store rows start..end by results, patching the shown rows in place"""
+        if self.rows is None:
+            old, new = end - start, len(results)
+            if new < old:
+                self.beginRemoveRows(QModelIndex(), start + new, end - 1)
+                self.store.replace(start, end, results)
+                self.endRemoveRows()
+            elif new > old:
+                self.beginInsertRows(QModelIndex(), start + old, start + new - 1)
+                self.store.replace(start, end, results)
+                self.endInsertRows()
+            else:
+                self.store.replace(start, end, results)
+            if min(old, new):
+                self.dataChanged.emit(self.index(start, 0),
+                                      self.index(start + min(old, new) - 1, len(self.HEADERS) - 1))
+            return
+        # Shown rows from start on point past the patch; shift them and swap the patched ones
+        rows = self.rows
+        first = bisect_left(rows, start)
+        last = bisect_left(rows, end)
+        shift = len(results) - (end - start)
+        tail = rows[last:] if not shift else array('q', [row + shift for row in rows[last:]])
+        self.store.replace(start, end, results)
+        stop = start + len(results)
+        matches = array('q', takewhile(lambda row: row < stop,
+                                       self.store.find(self.errors_only, self.host, start)))
+        if last > first:
+            self.beginRemoveRows(QModelIndex(), first, last - 1)
+            self.rows = rows[:first] + tail
+            self.endRemoveRows()
+        else:
+            self.rows = rows[:first] + tail
+        if matches:
+            self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+            self.rows[first:first] = matches
+            self.endInsertRows()
+        
+    def set_filter(self, errors_only, host):
+        """Show only errors and/or successful links whose host contains host"""
+        self.beginResetModel()
+        self.errors_only = errors_only
+        self.host = host.strip().lower()
+        if errors_only or self.host:
+            self.rows = array('q', self.store.find(self.errors_only, self.host))
+        else:
+            self.rows = None
+        self.endResetModel()
+        
+    def clear(self):
+        """Drop all results"""
+        self.beginResetModel()
+        self.store.clear()
+        if self.rows is not None:
+            self.rows = array('q')
+        self.endResetModel()
+
+class LinkOpener(QObject):
+    """Open links in the browser a few at a time on a timer"""
+    progress = pyqtSignal(int, int)  # opened, total
+    finished = pyqtSignal()
+    
+    def __init__(self, urls, batch_size=OPEN_BATCH_SIZE, interval=OPEN_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.queue = deque(urls)
+        self.total = len(self.queue)
+        self.batch_size = batch_size
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.open_batch)
+        
+    def start(self):
+        self.open_batch()
+        if self.queue:
+            self.timer.start()
+        
+    def open_batch(self):
+        """Open the next batch of links"""
+        for _ in range(min(self.batch_size, len(self.queue))):
+            QDesktopServices.openUrl(QUrl(self.queue.popleft()))
+        self.progress.emit(self.total - len(self.queue), self.total)
+        if not self.queue:
+            self.timer.stop()
+            self.finished.emit()
+        
+    def is_paused(self):
+        return bool(self.queue) and not self.timer.isActive()
+        
+    def pause(self):
+        """Pause opening links"""
+        self.timer.stop()
+        
+    def resume(self):
+        """Resume opening links"""
+        if self.queue:
+            self.timer.start()
+        
+    def stop(self):
+        """Drop all links still queued"""
+        self.timer.stop()
+        self.queue.clear()
+
 class AboutDialog(QMessageBox):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -96,10 +473,88 @@ class AboutDialog(QMessageBox):
         self.setText(content)
         self.setIcon(QMessageBox.Information)
 
+class DiagnosticsDialog(QDialog):
+    """Show cache, memory and profiling figures and save them as JSON"""
+    def __init__(self, converter):
+        super().__init__(converter)
+        self.converter = converter
+        self.setWindowTitle("Diagnostics")
+        self.resize(600, 420)
+        layout = QVBoxLayout(self)
+        
+        # Takes effect from the next conversion
+        self.profile_check = QCheckBox("Profile conversions (sampled timings, small overhead)")
+        self.profile_check.setChecked(converter.profiling)
+        self.profile_check.toggled.connect(self.set_profiling)
+        layout.addWidget(self.profile_check)
+        
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        font = QFont("Courier New", 9)
+        font.setStyleHint(QFont.TypeWriter)
+        self.text.setFont(font)
+        layout.addWidget(self.text)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        refresh_btn = buttons.addButton("Refresh", QDialogButtonBox.ActionRole)
+        refresh_btn.clicked.connect(self.refresh)
+        save_btn = buttons.addButton("Save JSON...", QDialogButtonBox.ActionRole)
+        save_btn.clicked.connect(self.save_json)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.refresh()
+        
+    def set_profiling(self, enabled):
+        self.converter.profiling = enabled
+        
+    def refresh(self):
+        """Show the current figures"""
+        diagnostics = self.converter.diagnostics()
+        results = diagnostics['results']
+        cache = diagnostics['cache']
+        lines = [
+            f"Results: {results['total']} ({results['ok']} successful, {results['failed']} failed), {results['bytes'] / 1024:.0f} KB",
+            f"Decode cache: {cache['entries']} entries, {cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions",
+            "",
+        ]
+        if diagnostics['profile'] is not None:
+            import thunder_profile
+            lines.extend(thunder_profile.format_snapshot(diagnostics['profile']))
+        elif self.converter.profiling:
+            lines.append("Profiling is on; run a conversion to collect timings.")
+        else:
+            lines.append("Profiling is off.")
+        self.text.setPlainText("\n".join(lines))
+        
+    def save_json(self):
+        """Save the figures as JSON"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Diagnostics", "thunder_diagnostics.json", "JSON Files (*.json);;All Files (*)")
+        if file_path:
+            import json
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.converter.diagnostics(), f, indent=2)
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Error saving file: {str(e)}")
+
 class ThunderConverter(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.converted_urls = []  # Store all converted URLs
+        self.worker = None
+        self.worker_thread = None
+        self.link_opener = None
+        self.download_worker = None  # Built-in downloader, while it runs
+        self.download_thread = None
+        # Reuse decoded results across conversions
+        self.decode_cache = thunder_cache.DecodeCache(decode=thunder_schemes.decode_any)
+        self.results = thunder_store.ResultStore()  # Decode results of the last run, shared by the table, copy, save and open
+        self.report = thunder_report.BatchReport(exact_limit=None)  # Duplicate, host and error statistics of the last run
+        self.encoded = False  # Results are thunder links encoded from URLs rather than decoded URLs
+        self.live_lines = None  # Stripped input lines the results follow in live mode, None when off
+        self.live_head = self.live_tail = sys.maxsize  # Unchanged lines before and after the edits, in the current document
+        self.profiling = False
+        self.profiler = None  # Sampled timings of the last run when profiling is on
         self.initUI()
         
     def initUI(self):
@@ -109,7 +564,16 @@ class ThunderConverter(QMainWindow):
         
         # Create menu bar
         menubar = self.menuBar()
+        file_menu = menubar.addMenu('File')
+        open_action = QAction('Open File...', self)
+        open_action.setShortcut('Ctrl+O')
+        open_action.triggered.connect(self.open_file)
+        file_menu.addAction(open_action)
+        
         help_menu = menubar.addMenu('Help')
+        diagnostics_action = QAction('Diagnostics...', self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        help_menu.addAction(diagnostics_action)
         about_action = QAction('About', self)
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
@@ -127,7 +591,7 @@ class ThunderConverter(QMainWindow):
         layout.addWidget(input_label)
         
         self.input_field = QPlainTextEdit()
-        self.input_field.setPlaceholderText("Please enter Thunder links starting with thunder:// (one per line, supports pasting from clipboard)...")
+        self.input_field.setPlaceholderText("Please enter thunder://, flashget:// or qqdl:// links (one per line, supports pasting from clipboard)...")
         self.input_field.setStyleSheet(INPUT_STYLE)
         self.input_field.setMinimumHeight(100)
         layout.addWidget(self.input_field)
@@ -136,20 +600,82 @@ class ThunderConverter(QMainWindow):
         self.convert_btn = QPushButton("Convert Links")
         self.convert_btn.setStyleSheet(BUTTON_STYLE.format("#3498db", "#2980b9", "#1c6da8"))
         self.convert_btn.clicked.connect(self.convert_links)
-        layout.addWidget(self.convert_btn, 0, Qt.AlignHCenter)
+        
+        # Encode button: URLs to thunder links, the inverse of conversion
+        self.encode_btn = QPushButton("Encode URLs")
+        self.encode_btn.setStyleSheet(BUTTON_STYLE.format("#1abc9c", "#16a085", "#138d75"))
+        self.encode_btn.clicked.connect(self.encode_urls)
+        
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setStyleSheet(BUTTON_STYLE.format("#e74c3c", "#c0392b", "#a93226"))
+        self.cancel_btn.clicked.connect(self.cancel_conversion)
+        self.cancel_btn.setEnabled(False)
+        
+        # Find links buried in prose or HTML instead of one per line
+        self.extract_check = QCheckBox("Extract links from text/HTML")
+        
+        # Convert as the input is edited, re-decoding only the changed lines
+        self.live_check = QCheckBox("Live conversion")
+        self.live_check.toggled.connect(self.set_live)
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_DELAY_MS)
+        self.live_timer.timeout.connect(self.live_convert)
+        self.input_field.document().contentsChange.connect(self.input_changed)
+        
+        convert_layout = QHBoxLayout()
+        convert_layout.addStretch(1)
+        convert_layout.addWidget(self.convert_btn)
+        convert_layout.addWidget(self.encode_btn)
+        convert_layout.addWidget(self.cancel_btn)
+        convert_layout.addWidget(self.extract_check)
+        convert_layout.addWidget(self.live_check)
+        convert_layout.setSpacing(15)
+        convert_layout.addStretch(1)
+        layout.addLayout(convert_layout)
         
         layout.addSpacing(15)
         
         # Result display
         result_label = QLabel("Conversion Results:")
         result_label.setFont(QFont("Arial", 10, QFont.Bold))
-        layout.addWidget(result_label)
         
-        self.result_field = QPlainTextEdit()
-        self.result_field.setReadOnly(True)
-        self.result_field.setStyleSheet(RESULT_STYLE)
-        self.result_field.setMinimumHeight(150)
-        layout.addWidget(self.result_field)
+        # Result filters, applied when typing pauses
+        self.errors_check = QCheckBox("Errors only")
+        self.errors_check.toggled.connect(self.apply_filter)
+        self.host_filter = QLineEdit()
+        self.host_filter.setPlaceholderText("Filter by host...")
+        self.host_filter.setMaximumWidth(200)
+        self.host_filter.textChanged.connect(self.schedule_filter)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        
+        result_header = QHBoxLayout()
+        result_header.addWidget(result_label)
+        result_header.addStretch(1)
+        result_header.addWidget(self.errors_check)
+        result_header.addWidget(self.host_filter)
+        layout.addLayout(result_header)
+        
+        self.result_model = ResultModel(self.results, self)
+        self.result_table = QTableView()
+        self.result_table.setModel(self.result_model)
+        self.result_table.setStyleSheet(RESULT_STYLE)
+        self.result_table.setMinimumHeight(150)
+        self.result_table.setWordWrap(False)
+        self.result_table.setAlternatingRowColors(True)
+        self.result_table.setSelectionBehavior(QTableView.SelectRows)
+        self.result_table.verticalHeader().setVisible(False)
+        # Fixed row heights keep scrolling cheap however many rows there are
+        self.result_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.result_table.verticalHeader().setDefaultSectionSize(24)
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.result_table.horizontalHeader().setStretchLastSection(True)
+        self.result_table.setColumnWidth(0, 250)
+        self.result_table.setColumnWidth(1, 250)
+        layout.addWidget(self.result_table)
         
         layout.addSpacing(15)
         
@@ -170,9 +696,19 @@ class ThunderConverter(QMainWindow):
         self.save_btn.clicked.connect(self.save_results)
         self.save_btn.setEnabled(False)
         
+        self.report_btn = QPushButton("Report")
+        self.report_btn.setStyleSheet(BUTTON_STYLE.format("#34495e", "#2c3e50", "#1f2d3a"))
+        self.report_btn.clicked.connect(self.show_report)
+        self.report_btn.setEnabled(False)
+        
+        # Copy, open and plain text save skip repeated URLs when checked
+        self.unique_check = QCheckBox("Skip duplicate URLs")
+        
         btn_layout.addWidget(self.copy_btn)
         btn_layout.addWidget(self.open_btn)
         btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.report_btn)
+        btn_layout.addWidget(self.unique_check)
         btn_layout.setSpacing(15)
         
         btn_layout.addStretch(1)
@@ -183,12 +719,18 @@ class ThunderConverter(QMainWindow):
         # Add status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        
+        # Conversion progress indicator
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.setVisible(False)
+        self.status_bar.addPermanentWidget(self.progress_bar)
+        
         self.status_bar.showMessage("Ready", 5000)
         
     def validate_thunder_url(self, url):
         """Validate Thunder link format"""
-        pattern = r'^thunder://[A-Za-z0-9+/=]+$'
-        return bool(re.match(pattern, url))
+        return thunder_core.is_valid_link(url)
     
     def convert_links(self):
         """Batch convert links"""
@@ -197,58 +739,248 @@ class ThunderConverter(QMainWindow):
             self.show_error("Please enter Thunder links")
             return
             
-        thunder_urls = [url.strip() for url in input_text.splitlines() if url.strip()]
+        if self.extract_check.isChecked():
+            thunder_urls = list(thunder_core.scan_links(input_text))
+            if not thunder_urls:
+                self.show_error("No Thunder links found in the text")
+                return
+        else:
+            thunder_urls = thunder_core.split_links(input_text)
         if not thunder_urls:
             self.show_error("No valid input links")
             return
             
-        self.converted_urls = []
-        result_text = []
-        success_count = 0
-        error_count = 0
+        self.start_conversion(thunder_urls, len(thunder_urls))
         
-        for url in thunder_urls:
-            if not url.startswith('thunder://'):
-                result_text.append(f"# Error: {url} - Address must start with thunder://")
-                error_count += 1
-            elif not self.validate_thunder_url(url):
-                result_text.append(f"# Error: {url} - Invalid Thunder link format")
-                error_count += 1
+    def encode_urls(self):
+        """Encode URLs, one per line, into thunder links"""
+        input_text = self.input_field.toPlainText().strip()
+        if not input_text:
+            self.show_error("Please enter URLs")
+            return
+        urls = thunder_core.split_links(input_text)
+        if not urls:
+            self.show_error("No valid input URLs")
+            return
+        self.start_conversion(urls, len(urls), encode=True)
+        
+    def open_file(self):
+        """Convert links from a file, memory-mapped or, if compressed, decompressed on the fly"""
+        if self.worker is not None or self.download_worker is not None:
+            return
+            
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Open Link File", "", "Text Files (*.txt);;HTML Files (*.html *.htm);;"
+            "Compressed Files (*.gz *.bz2 *.xz);;All Files (*)", options=options)
+        
+        if file_path:
+            import thunder_compress
+            try:
+                # Fail early on unreadable files instead of in the worker thread
+                compressed = thunder_compress.detect_codec(file_path) is not None
+            except OSError as e:
+                self.show_error(f"Error opening file: {str(e)}")
+                return
+            if compressed:
+                # A compressed file cannot be mapped; a background thread decompresses it
+                if self.extract_check.isChecked():
+                    links = thunder_compress.extract_links(file_path)
+                else:
+                    links = thunder_compress.iter_lines(file_path)
+            elif self.extract_check.isChecked():
+                links = thunder_core.extract_mapped_links(file_path)
             else:
-                try:
-                    encoded_str = url[10:]
-                    decoded_bytes = base64.b64decode(encoded_str)
-                    decoded_url = decoded_bytes.decode('utf-8')
-                    
-                    if not (decoded_url.startswith("AA") and decoded_url.endswith("ZZ")):
-                        result_text.append(f"# Error: {url} - Invalid Thunder link content")
-                        error_count += 1
-                    else:
-                        final_url = parse.unquote(decoded_url[2:-2])
-                        self.converted_urls.append(final_url)
-                        result_text.append(final_url)
-                        success_count += 1
-                except (base64.binascii.Error, ValueError, UnicodeDecodeError) as e:
-                    result_text.append(f"# Error: {url} - Exception occurred during processing: {str(e)}")
-                    error_count += 1
-        
-        self.result_field.setPlainText("\n".join(result_text))
+                links = thunder_core.iter_mapped_lines(file_path)
+            self.start_conversion(links, 0)
+            self.status_bar.showMessage(f"Converting {os.path.basename(file_path)}...")
+        
+    def start_conversion(self, thunder_urls, total, encode=False, live=False):
+        """Start converting links in a worker thread; live marks the first pass of live conversion"""
+        if not live:
+            # Results of a file or a full conversion no longer follow the input
+            self.live_check.setChecked(False)
+        # Live conversion is not toggled while a pass runs; cancel stops it
+        self.live_check.setEnabled(False)
+        self.stop_opening()
+        self.result_model.clear()
+        self.report = thunder_report.BatchReport(exact_limit=None)
+        self.encoded = encode
+        self.update_buttons()
+        self.convert_btn.setEnabled(False)
+        self.encode_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setRange(0, total)  # 0..0 shows a busy indicator
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        
+        # Decode in a worker thread so the window stays responsive; the window owns
+        # the thread until it finishes and deletes itself
+        self.worker_thread = QThread(self)
+        self.profiler = None
+        if self.profiling and not encode:
+            import thunder_profile
+            self.profiler = thunder_profile.Profiler(decode=thunder_schemes.decode_any)
+        # Encoding bypasses the decode cache, whose keys are input links
+        self.worker = ConvertWorker(thunder_urls, total, None if encode else self.decode_cache,
+                                    self.profiler, encode)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.chunk_ready.connect(self.append_results)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.failed.connect(self.show_error)
+        self.worker.finished.connect(self.conversion_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+        self.worker_thread.start()
+        
+    def append_results(self, results):
+        """Append a chunk of results to the result table"""
+        if self.profiler is None:
+            self.result_model.append(results)
+            self.report.update(results)
+            return
+        start = perf_counter_ns()
+        self.result_model.append(results)
+        middle = perf_counter_ns()
+        self.report.update(results)
+        self.profiler.add('render', middle - start, len(results))
+        self.profiler.add('report', perf_counter_ns() - middle, len(results))
+        
+    def update_progress(self, done, total):
+        """Show conversion progress in the status bar"""
+        self.progress_bar.setValue(done)
+        if not total:
+            self.status_bar.showMessage(f"Converting: {done}")
+            return
+        self.status_bar.showMessage(f"Converting: {done}/{total}")
+        
+    def conversion_finished(self, success_count, error_count, cancelled):
+        """Restore the interface after the worker stops"""
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.worker = None
+        self.worker_thread = None
+        # A download started meanwhile keeps its controls until it finishes
+        downloading = self.download_worker is not None
+        self.convert_btn.setEnabled(not self.live_check.isChecked() and not downloading)
+        self.encode_btn.setEnabled(not downloading)
+        self.cancel_btn.setEnabled(downloading)
+        self.live_check.setEnabled(True)
+        self.progress_bar.setVisible(downloading)
+        if cancelled:
+            # Results of a cancelled first pass do not cover the input, so live mode ends
+            self.live_check.setChecked(False)
+        elif self.live_lines is not None and self.live_head != sys.maxsize:
+            # Apply the edits made while the first pass ran
+            self.live_timer.start()
         
         # Update button states
         self.update_buttons()
         
         # Update status bar
-        self.status_bar.showMessage(f"Conversion complete: {success_count} successful, {error_count} failed", 10000)
+        title = ("Encoding cancelled" if cancelled else "Encoding complete") if self.encoded else ("Conversion cancelled" if cancelled else "Conversion complete")
+        self.status_bar.showMessage(f"{title}: {success_count} successful, {error_count} failed, {self.report.duplicates} duplicates", 10000)
         
         # Auto-scroll to top of results
-        self.result_field.moveCursor(QTextCursor.Start)
+        self.result_table.scrollToTop()
+        
+    def set_live(self, enabled):
+        """Turn live conversion on or off; turning it on converts the whole input once"""
+        self.convert_btn.setEnabled(not enabled and self.download_worker is None)
+        self.extract_check.setEnabled(not enabled)
+        self.live_timer.stop()
+        self.live_head = self.live_tail = sys.maxsize
+        if not enabled:
+            self.live_lines = None
+            return
+        # The first pass can be large, so it runs in the worker like any conversion; later
+        # edits re-decode only their lines here
+        self.live_pass()
+        
+    def live_pass(self):
+        """Convert the whole input in the worker thread, as the results live edits patch"""
+        self.live_lines = [line.strip() for line in self.input_field.toPlainText().split('\n')]
+        links = [line for line in self.live_lines if line]
+        self.start_conversion(links, len(links), live=True)
+        
+    def input_changed(self, position, removed, added):
+        """Widen the edited line range and restart the live conversion delay"""
+        if self.live_lines is None:
+            return
+        document = self.input_field.document()
+        first = document.findBlock(position).blockNumber()
+        block = document.findBlock(position + added)
+        last = block.blockNumber() if block.isValid() else document.blockCount() - 1
+        self.live_head = min(self.live_head, max(first, 0))
+        self.live_tail = min(self.live_tail, document.blockCount() - 1 - last)
+        self.live_timer.start()
+        
+    def live_convert(self):
+        """Re-decode the lines edited since the last update and patch their result rows"""
+        if self.live_lines is None:
+            return
+        if self.worker is not None:
+            # The first pass is still running; conversion_finished picks up the edits
+            return
+        document = self.input_field.document()
+        old = self.live_lines
+        total = document.blockCount()
+        head = min(self.live_head, len(old), total)
+        tail = min(self.live_tail, len(old) - head, total - head)
+        self.live_head = self.live_tail = sys.maxsize
+        if total - tail - head > LIVE_MAX_LINES:
+            # Too many lines to decode without freezing the window
+            self.live_pass()
+            return
+        lines = []
+        block = document.findBlockByNumber(head)
+        for _ in range(total - tail - head):
+            lines.append(block.text().strip())
+            block = block.next()
+        old_lines = old[head:len(old) - tail]
+        if lines == old_lines:
+            return
+        # Blank lines have no result row
+        start = head - old[:head].count('')
+        end = start + len(old_lines) - old_lines.count('')
+        links = [line for line in lines if line]
+        results = thunder_core.decode_many(links, cache=self.decode_cache,
+                                           decode=thunder_schemes.decode_any)
+        self.result_model.replace(start, end, results)
+        old[head:len(old) - tail] = lines
+        self.report = None
+        self.update_buttons()
+        self.status_bar.showMessage(f"Live conversion: {self.results.ok_count} successful, {self.results.error_count} failed ({len(links)} lines decoded)", 5000)
+        
+    def schedule_filter(self):
+        """Refilter the results shortly after the host filter was edited"""
+        self.filter_timer.start()
+        
+    def apply_filter(self):
+        """Filter the result table by status and host"""
+        self.result_model.set_filter(self.errors_check.isChecked(), self.host_filter.text())
+        self.status_bar.showMessage(f"Showing {self.result_model.rowCount()} of {len(self.results)} results", 5000)
+        
+    def cancel_conversion(self):
+        """Cancel the running conversion or download"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+        if self.download_worker is not None:
+            self.download_worker.stop()
+            self.cancel_btn.setEnabled(False)
         
     def update_buttons(self):
         """Update action button states"""
-        has_results = bool(self.converted_urls)
-        self.copy_btn.setEnabled(has_results)
-        self.open_btn.setEnabled(has_results)
-        self.save_btn.setEnabled(has_results)
+        has_urls = self.results.ok_count > 0
+        self.copy_btn.setEnabled(has_urls)
+        # Encoded links are for publishing, not for opening or reporting on hosts;
+        # a running download keeps the open menu disabled
+        self.open_btn.setEnabled(has_urls and not self.encoded and self.download_worker is None)
+        self.save_btn.setEnabled(len(self.results) > 0)
+        self.report_btn.setEnabled(len(self.results) > 0 and not self.encoded)
         
     def show_error(self, message):
         """Display error message"""
@@ -257,11 +989,12 @@ class ThunderConverter(QMainWindow):
         
     def copy_links(self):
         """Copy all converted links to clipboard"""
-        if self.converted_urls:
+        if self.results.ok_count:
+            urls = list(self.output_urls())
             clipboard = QApplication.clipboard()
-            clipboard.setText("\n".join(self.converted_urls))
+            clipboard.setText("\n".join(urls))
             self.status_bar.showMessage("Links copied to clipboard", 5000)
-            QMessageBox.information(self, "Success", f"Copied {len(self.converted_urls)} links to clipboard")
+            QMessageBox.information(self, "Success", f"Copied {len(urls)} links to clipboard")
         else:
             self.show_warning("No conversion results available")
     
@@ -271,45 +1004,299 @@ class ThunderConverter(QMainWindow):
         QMessageBox.warning(self, "Warning", message)
     
     def open_links(self):
-        """Open all converted links in browser"""
-        if not self.converted_urls:
+        """Open converted links in batches, or pause/resume a running batch"""
+        if self.link_opener is not None:
+            if self.link_opener.is_paused():
+                self.link_opener.resume()
+                self.open_btn.setText("Pause Opening")
+            else:
+                self.link_opener.pause()
+                self.open_btn.setText("Resume Opening")
+                opened = self.link_opener.total - len(self.link_opener.queue)
+                total = self.link_opener.total
+                self.status_bar.showMessage(f"Paused: opened {opened} of {total} links")
+            return
+            
+        if not self.results.ok_count:
             self.show_warning("No links available")
             return
             
-        for url in self.converted_urls:
-            QDesktopServices.openUrl(QUrl(url))
-        self.status_bar.showMessage(f"Opening {len(self.converted_urls)} links in browser", 5000)
+        choice = self.ask_open_mode()
+        if choice == 'browser':
+            self.start_opening()
+        elif choice == 'download_manager':
+            self.send_to_download_manager()
+        elif choice == 'html':
+            self.write_html_index()
+        elif choice == 'download':
+            self.start_download()
+        
+    def ask_open_mode(self):
+        """Ask how to open the converted links"""
+        box = QMessageBox(self)
+        box.setWindowTitle("Open Links")
+        box.setIcon(QMessageBox.Question)
+        box.setText(f"How should {self.output_count()} links be opened?\n\nThe browser opens {OPEN_BATCH_SIZE} links every {OPEN_INTERVAL_MS / 1000:g} seconds and can be paused with the same button.")
+        browser_btn = box.addButton("Open in Browser", QMessageBox.AcceptRole)
+        manager_btn = box.addButton("Download Manager", QMessageBox.AcceptRole)
+        download_btn = box.addButton("Download Here", QMessageBox.AcceptRole)
+        html_btn = box.addButton("HTML Index", QMessageBox.AcceptRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        clicked = box.clickedButton()
+        if clicked == browser_btn:
+            return 'browser'
+        if clicked == manager_btn:
+            return 'download_manager'
+        if clicked == html_btn:
+            return 'html'
+        if clicked == download_btn:
+            return 'download'
+        return None
+        
+    def start_opening(self):
+        """Open converted links in the browser in rate-limited batches"""
+        self.link_opener = LinkOpener(self.output_urls(), parent=self)
+        self.link_opener.progress.connect(self.update_opening_progress)
+        self.link_opener.finished.connect(self.opening_finished)
+        self.open_btn.setText("Pause Opening")
+        self.link_opener.start()
+        
+    def update_opening_progress(self, opened, total):
+        """Show link opening progress in the status bar"""
+        self.status_bar.showMessage(f"Opening links in browser: {opened}/{total}")
+        
+    def opening_finished(self):
+        """Restore the Open Links button after all links are opened"""
+        total = self.link_opener.total
+        self.stop_opening()
+        self.status_bar.showMessage(f"Opened {total} links in browser", 5000)
+        
+    def stop_opening(self):
+        """Stop opening links and restore the Open Links button"""
+        if self.link_opener is not None:
+            self.link_opener.stop()
+            self.link_opener.deleteLater()
+            self.link_opener = None
+        self.open_btn.setText("Open Links")
+        
+    def send_to_download_manager(self):
+        """Hand all converted links to the download manager"""
+        import shlex
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt',
+                                         prefix='thunder_https_', delete=False) as f:
+            f.write("\n".join(self.output_urls()))
+        # Split before substituting, so spaces and backslashes in the path survive
+        args = [arg.replace('{file}', f.name) for arg in shlex.split(DOWNLOAD_MANAGER)]
+        command = ' '.join(args)
+        if not args or not QProcess.startDetached(args[0], args[1:]):
+            self.show_error(f"Could not start download manager: {command}")
+            return
+        self.status_bar.showMessage(f"Sent {self.output_count()} links to download manager", 5000)
+        
+    def start_download(self):
+        """Download the converted links into a chosen folder"""
+        directory = QFileDialog.getExistingDirectory(self, "Download To")
+        if not directory:
+            return
+        self.convert_btn.setEnabled(False)
+        self.encode_btn.setEnabled(False)
+        self.open_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        
+        # Owned by the window, like the conversion thread, until it finishes
+        self.download_thread = QThread(self)
+        self.download_worker = DownloadWorker(list(self.output_urls()), directory)
+        self.download_worker.moveToThread(self.download_thread)
+        self.download_thread.started.connect(self.download_worker.run)
+        self.download_worker.progress.connect(self.update_download_progress)
+        self.download_worker.finished.connect(self.download_finished)
+        self.download_worker.finished.connect(self.download_thread.quit)
+        self.download_worker.finished.connect(self.download_worker.deleteLater)
+        self.download_thread.finished.connect(self.download_thread.deleteLater)
+        self.download_thread.start()
+        
+    def update_download_progress(self, files_done, files, done, total):
+        """Show download progress; byte counts overflow a progress bar int, so it shows per mille"""
+        if total:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(min(1000, done * 1000 // total))
+        self.status_bar.showMessage(f"Downloading: {files_done}/{files} files, {done / 1e6:.1f}/{total / 1e6:.1f} MB")
+        
+    def download_finished(self, results):
+        """Restore the interface and summarise the downloads"""
+        import thunder_download
+        self.download_worker = None
+        self.download_thread = None
+        # Likewise a conversion started meanwhile, e.g. by live mode
+        converting = self.worker is not None
+        self.convert_btn.setEnabled(not self.live_check.isChecked() and not converting)
+        self.encode_btn.setEnabled(not converting)
+        self.cancel_btn.setEnabled(converting)
+        self.progress_bar.setVisible(converting)
+        self.update_buttons()
+        
+        counts = dict.fromkeys((thunder_download.STATUS_DONE, thunder_download.STATUS_SKIPPED,
+                                thunder_download.STATUS_FAILED, thunder_download.STATUS_STOPPED), 0)
+        for result in results:
+            counts[result.status] += 1
+        # Running again resumes the stopped downloads
+        self.status_bar.showMessage(f"Download complete: {counts[thunder_download.STATUS_DONE]} downloaded, {counts[thunder_download.STATUS_SKIPPED]} already present, {counts[thunder_download.STATUS_FAILED]} failed, {counts[thunder_download.STATUS_STOPPED]} stopped", 10000)
+        failed = [result for result in results if result.status == thunder_download.STATUS_FAILED]
+        if failed:
+            message = f"{counts[thunder_download.STATUS_FAILED]} downloads failed:\n\n" + "\n".join(
+                f"{result.url} - {result.error}" for result in failed[:MAX_LISTED_FAILURES])
+            if len(failed) > MAX_LISTED_FAILURES:
+                message += f"\n... and {len(failed) - MAX_LISTED_FAILURES} more"
+            self.show_warning(message)
+        
+    def write_html_index(self):
+        """Write the converted links to an HTML page and open it once"""
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save HTML Index", "", "HTML Files (*.html);;All Files (*)", options=options)
+        
+        if file_path:
+            try:
+                if not file_path.lower().endswith(('.html', '.htm')):
+                    file_path += '.html'
+                    
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    thunder_writers.write_html_index(f, self.output_urls(), "Thunder Link Converter")
+            except OSError as e:
+                self.show_error(f"Error saving file: {str(e)}")
+                return
+            self.status_bar.showMessage(f"HTML index saved to {os.path.basename(file_path)}", 10000)
+            QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
         
     def save_results(self):
         """Save conversion results to file"""
-        if not self.converted_urls:
+        if not self.results:
             self.show_warning("No content to save")
             return
             
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Results", "", "Text Files (*.txt);;All Files (*)", options=options)
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Results", "", ";;".join(SAVE_FORMATS), options=options)
         
         if file_path:
             try:
-                if not file_path.lower().endswith('.txt'):
-                    file_path += '.txt'
+                import thunder_compress
+                fmt = SAVE_FORMATS.get(selected_filter)
+                extension = '.txt' if fmt is None else thunder_writers.FORMATS[fmt][1]
+                # A name ending in .gz, .bz2 or .xz is saved compressed; the format
+                # extension goes before it
+                base_path = thunder_compress.strip_extension(file_path)
+                if selected_filter == "All Files (*)":
+                    # Keep the extension the user typed under "All Files"
+                    extension = os.path.splitext(base_path)[1].lower()
+                    fmt = next((name for name, (_, ext, _) in thunder_writers.FORMATS.items()
+                                if ext == extension), None)
+                elif not base_path.lower().endswith(extension):
+                    file_path = base_path + extension + file_path[len(base_path):]
                     
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write("\n".join(self.converted_urls))
+                if fmt is None:
+                    with thunder_compress.open_output(file_path, text=True, newline=None) as f:
+                        f.write("\n".join(self.output_urls()))
+                else:
+                    # Records are numbered by their position in the input
+                    results = self.results
+                    if self.encoded:
+                        # Encoded rows hold the URL in the link column; swap back for the records
+                        results = (thunder_core.DecodeResult(result.url, result.link, *result[2:])
+                                   for result in results)
+                    records = thunder_writers.iter_records(results, count(1))
+                    thunder_writers.save_records(file_path, fmt, records)
                 
                 self.status_bar.showMessage(f"Results saved to {os.path.basename(file_path)}", 10000)
                 QMessageBox.information(self, "Save Successful", f"File saved to:\n{file_path}")
             except Exception as e:
                 self.show_error(f"Error saving file: {str(e)}")
     
+    def output_urls(self):
+        """URLs handed to copy, open and save, without repeats if asked"""
+        urls = self.results.urls()
+        if self.unique_check.isChecked():
+            return thunder_report.unique_urls(urls)
+        return urls
+        
+    def output_count(self):
+        """Number of URLs output_urls yields"""
+        if self.unique_check.isChecked():
+            report = self.current_report()
+            return report.ok - report.duplicates
+        return self.results.ok_count
+        
+    def current_report(self):
+        """Batch report of the current results, recounted after live edits"""
+        if self.report is None:
+            self.report = thunder_report.BatchReport(exact_limit=None)
+            self.report.update(self.results)
+        return self.report
+        
+    def show_report(self):
+        """Show duplicate counts, top hosts and extensions and the error breakdown"""
+        QMessageBox.information(self, "Batch Report", format_report(self.current_report().summary()))
+        
+    def diagnostics(self):
+        """Collect result, cache and profiling figures as plain values"""
+        return {
+            'results': {
+                'total': len(self.results),
+                'ok': self.results.ok_count,
+                'failed': self.results.error_count,
+                'bytes': self.results.nbytes(),
+            },
+            'cache': self.decode_cache.stats(),
+            'profile': None if self.profiler is None else self.profiler.snapshot(),
+        }
+        
+    def show_diagnostics(self):
+        dialog = DiagnosticsDialog(self)
+        dialog.exec_()
+        
+    def receive_links(self, links):
+        """Bring the window to the front and convert the links handed over by a launch"""
+        self.setWindowState(self.windowState() & ~Qt.WindowMinimized | Qt.WindowActive)
+        self.raise_()
+        self.activateWindow()
+        if not links:
+            return
+        self.input_field.appendPlainText("\n".join(links))
+        # Live mode picks the new lines up by itself
+        if self.convert_btn.isEnabled():
+            self.convert_links()
+        
     def show_about(self):
         dialog = AboutDialog(self)
         dialog.exec_()
+        
+    def closeEvent(self, event):
+        """Stop the worker threads before closing the window"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+        if self.download_worker is not None:
+            self.download_worker.stop()
+            self.download_thread.quit()
+            self.download_thread.wait()
+        self.stop_opening()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     window = ThunderConverter()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    instance_server = InstanceServer(window)
+    instance_server.links_received.connect(window.receive_links)
+    instance_server.listen()
+    # Links the program was launched with, e.g. as the thunder:// protocol handler
+    if sys.argv[1:] and thunder_instance.is_forwardable(sys.argv[1:]):
+        QTimer.singleShot(0, lambda: window.receive_links(sys.argv[1:]))
+    sys.exit(app.exec_())
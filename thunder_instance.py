@@ -0,0 +1,54 @@
+'''
+Single-instance hand-off for thunder-https
+While a window is open, a new launch (e.g. a click on a thunder:// link
+with the program registered as its protocol handler) passes its links to
+that window over a local socket and exits, instead of starting a second
+copy of Qt. Only the standard library is used here, and the GUI calls
+forward() before importing PyQt5, so the hand-off takes milliseconds.
+
+The window listens with QLocalServer on server_name(). A message is the
+links, one per line, ended by closing the connection; an empty message
+just brings the window to the front.
+'''
+import os
+import sys
+
+# Seconds a launch waits for the running window before starting its own
+CONNECT_TIMEOUT = 1.0
+
+
+def server_name():
+    """Return the local server name of the current user's window
+
+    A socket path on POSIX, so that QLocalServer and forward() agree on
+    the directory; a pipe name on Windows.
+    """
+    if sys.platform == 'win32':
+        return f"thunder-https-{os.environ.get('USERNAME', 'user')}"
+    # QLocalServer puts relative names in QDir.tempPath(), which is this
+    return os.path.join(os.environ.get('TMPDIR') or '/tmp', f'thunder-https-{os.getuid()}')
+
+
+def is_forwardable(args):
+    """Return True if args are only links (or none), not a CLI command line"""
+    return all('://' in arg or arg.startswith('magnet:') for arg in args)
+
+
+def forward(args):
+    """Send links to the running window; return False if none is running"""
+    payload = ''.join(arg + '\n' for arg in args).encode('utf-8')
+    name = server_name()
+    try:
+        if sys.platform == 'win32':
+            with open('\\\\.\\pipe\\' + name, 'wb') as pipe:
+                pipe.write(payload)
+            return True
+        import socket
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(name)
+            sock.sendall(payload)
+        return True
+    except OSError:
+        # No window, or one that crashed and left its socket behind
+        return False
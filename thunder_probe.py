@@ -0,0 +1,295 @@
+'''
+Async HTTP probe stage for thunder-https
+Checks whether decoded URLs are alive with HEAD requests (falling back to a
+one-byte ranged GET when HEAD is not allowed), following redirects and
+reusing keep-alive connections per host. Only the standard library is
+used, so it runs anywhere the headless tools do.
+'''
+from collections import namedtuple
+from urllib import parse
+import asyncio
+import ssl
+import thunder_core
+
+DEFAULT_CONCURRENCY = 100
+DEFAULT_PER_HOST = 8
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_REDIRECTS = 5
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# HEAD rejected by the server, retry with a ranged GET
+HEAD_FALLBACK_STATUSES = (405, 501)
+RETRY_STATUSES = (502, 503, 504)
+# Bodies larger than this are not drained; the connection is dropped instead
+MAX_DRAIN_BYTES = 64 * 1024
+
+USER_AGENT = 'thunder-https'
+
+# Decode results probed per event loop run when streaming
+PROBE_BATCH_SIZE = 1000
+
+# Characters left alone when quoting decoded URLs for the request line
+SAFE_URL_CHARS = "/%?=&;:@!$'()*+,~#[]"
+
+ProbeResult = namedtuple('ProbeResult', 'url status content_length final_url error')
+
+
+class ProbeError(Exception):
+    """Raised for malformed responses and unsupported URLs"""
+
+
+class ConnectionPool:
+    """Idle keep-alive connections and a connection limit per host"""
+
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.per_host = per_host
+        self._idle = {}
+        self._limits = {}
+        self._ssl_context = None
+
+    def limit(self, key):
+        """Semaphore bounding the open connections to one host"""
+        sem = self._limits.get(key)
+        if sem is None:
+            sem = self._limits[key] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def connect(self, key):
+        """Return (reader, writer, reused), preferring an idle connection"""
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+        return reader, writer, False
+
+    def release(self, key, reader, writer, reusable):
+        if reusable and not writer.is_closing():
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+def split_url(url):
+    """Return ((scheme, host, port), request target, Host header value)"""
+    parts = parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ProbeError(f"unsupported URL: {url}")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    # Decoded thunder URLs are unquoted and may contain spaces or non-ASCII
+    target = parse.quote(parts.path or '/', safe=SAFE_URL_CHARS)
+    if parts.query:
+        target += '?' + parse.quote(parts.query, safe=SAFE_URL_CHARS)
+    try:
+        host = parts.hostname.encode('idna').decode('ascii')
+    except UnicodeError:
+        raise ProbeError(f"invalid host name: {parts.hostname}") from None
+    if ':' in host:
+        host = f'[{host}]'
+    if parts.port:
+        host += f':{parts.port}'
+    return (parts.scheme, parts.hostname, port), target, host
+
+
+async def read_headers(reader):
+    """Read a response head; return (HTTP version, status, lowercased headers)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed before response")
+    try:
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        status = int(status)
+    except ValueError:
+        raise ProbeError(f"malformed status line: {status_line!r}") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return version, status, headers
+
+
+async def drain_body(reader, method, status, headers):
+    """Consume the response body; return False if the connection can't be reused"""
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        return True
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        drained = 0
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return True
+            drained += size
+            if drained > MAX_DRAIN_BYTES:
+                return False
+            await reader.readexactly(size + 2)
+    length = headers.get('content-length')
+    if length is None:
+        return False
+    length = int(length)
+    if length > MAX_DRAIN_BYTES:
+        return False
+    await reader.readexactly(length)
+    return True
+
+
+async def _exchange(reader, writer, method, request):
+    """Write a request and read the response; return (status, headers, reusable)"""
+    writer.write(request)
+    await writer.drain()
+    version, status, headers = await read_headers(reader)
+    reusable = await drain_body(reader, method, status, headers)
+    reusable = (reusable and version == 'HTTP/1.1'
+                and headers.get('connection', '').lower() != 'close')
+    return status, headers, reusable
+
+
+class Prober:
+    """Probe URLs concurrently over pooled keep-alive connections"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_redirects=DEFAULT_MAX_REDIRECTS):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.pool = ConnectionPool(per_host)
+        self._limit = None
+
+    async def _request(self, method, url):
+        """Send one request and return (status, headers)"""
+        key, target, host = split_url(url)
+        request = (f"{method} {target} HTTP/1.1\r\n"
+                   f"Host: {host}\r\n"
+                   f"User-Agent: {USER_AGENT}\r\n"
+                   f"Accept-Encoding: identity\r\n")
+        if method == 'GET':
+            request += "Range: bytes=0-0\r\n"
+        request = (request + "\r\n").encode('latin-1')
+
+        async with self.pool.limit(key):
+            reader, writer, reused = await self.pool.connect(key)
+            reusable = False
+            try:
+                try:
+                    status, headers, reusable = await _exchange(
+                        reader, writer, method, request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    # Idle connection was closed by the server; retry on a fresh one
+                    writer.close()
+                    reader, writer, _ = await self.pool.connect(key)
+                    status, headers, reusable = await _exchange(
+                        reader, writer, method, request)
+            finally:
+                self.pool.release(key, reader, writer, reusable)
+        return status, headers
+
+    async def _probe_once(self, url):
+        """Probe a URL once, following redirects"""
+        method = 'HEAD'
+        for _ in range(self.max_redirects + 1):
+            status, headers = await asyncio.wait_for(
+                self._request(method, url), self.timeout)
+            if method == 'HEAD' and status in HEAD_FALLBACK_STATUSES:
+                method = 'GET'
+                continue
+            location = headers.get('location')
+            if status in REDIRECT_STATUSES and location:
+                url = parse.urljoin(url, location)
+                continue
+            length = headers.get('content-length')
+            content_range = headers.get('content-range', '')
+            if status == 206 and '/' in content_range:
+                length = content_range.rsplit('/', 1)[1]
+            length = int(length) if length and length.isdigit() else None
+            return status, length, url
+        raise ProbeError("too many redirects")
+
+    async def probe(self, url):
+        """Probe a URL, retrying with exponential backoff on transient failures"""
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        async with self._limit:
+            error = None
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                try:
+                    status, length, final_url = await self._probe_once(url)
+                except ProbeError as e:
+                    return ProbeResult(url, None, None, None, str(e))
+                except asyncio.TimeoutError:
+                    error = 'timeout'
+                    continue
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    error = str(e) or e.__class__.__name__
+                    continue
+                if status in RETRY_STATUSES and attempt < self.retries:
+                    continue
+                return ProbeResult(url, status, length, final_url, None)
+            return ProbeResult(url, None, None, None, error)
+
+    async def probe_many(self, urls):
+        """Probe URLs concurrently, returning results in input order"""
+        return await asyncio.gather(*(self.probe(url) for url in urls))
+
+    def close(self):
+        self.pool.close()
+
+
+def probe_urls(urls, **options):
+    """Synchronously probe a list of URLs; options are passed to Prober"""
+    async def run():
+        prober = Prober(**options)
+        try:
+            return await prober.probe_many(urls)
+        finally:
+            prober.close()
+    return asyncio.run(run())
+
+
+def probe_results(results, batch_size=PROBE_BATCH_SIZE, **options):
+    """Yield (result, probe) pairs for a stream of DecodeResults
+
+    Successful results are probed a batch at a time on one event loop, so
+    connections stay pooled across batches while only one batch is held in
+    memory. Failed decodes are paired with None.
+    """
+    ok = thunder_core.STATUS_OK
+    loop = asyncio.new_event_loop()
+    prober = Prober(**options)
+    try:
+        for chunk in thunder_core.iter_chunks(results, batch_size):
+            urls = [result.url for result in chunk if result.status == ok]
+            probes = iter(loop.run_until_complete(prober.probe_many(urls)))
+            for result in chunk:
+                yield result, next(probes) if result.status == ok else None
+    finally:
+        prober.close()
+        # Let the transports finish closing before the loop goes away
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
@@ -0,0 +1,268 @@
+'''
+Decode profiling for thunder-https
+Optional, sampling instrumentation of the decode pipeline. Nothing here is
+called unless profiling is switched on, so the normal path pays nothing.
+
+Two kinds of figures are collected:
+  - pipeline stages (read, decode, render): every item is counted, but
+    only about one in sample_every is timed and the total is extrapolated
+    from the sampled mean; coarse events such as a GUI chunk are timed
+    exactly
+  - decode steps (validate, base64, utf8, unquote): about one input link
+    in sample_every is decoded a second time by timed_decode, which calls
+    the step functions thunder_core decodes with, reading the clock
+    between them
+
+Sampled items are picked at random gaps rather than at a fixed period, so
+bursty stages (a worker pool hands back whole chunks at once) are not
+sampled in step with their bursts.
+'''
+from time import perf_counter_ns
+import binascii
+import json
+import os
+import platform
+import random
+import sys
+import thunder_core
+
+# One item in SAMPLE_EVERY is timed, on average
+SAMPLE_EVERY = 64
+
+# Step names, in decode order
+STEP_VALIDATE = 'validate'  # strip, prefix check and format regex
+STEP_BASE64 = 'base64'      # for bytes links, strip and validation too
+STEP_UTF8 = 'utf8'
+STEP_UNQUOTE = 'unquote'    # envelope check and percent-decoding, for bytes links UTF-8 too
+STEP_OTHER = 'other'        # links of other schemes, decoded as a whole
+STEPS = (STEP_VALIDATE, STEP_BASE64, STEP_UTF8, STEP_UNQUOTE, STEP_OTHER)
+
+
+class Stage:
+    """Counter and sampled timer of one stage"""
+    __slots__ = ('count', 'sampled', 'ns')
+
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+        self.ns = 0
+
+    def add(self, ns, count=1):
+        """Record count items that took ns nanoseconds in total"""
+        self.count += count
+        self.sampled += count
+        self.ns += ns
+
+    def snapshot(self):
+        mean = self.ns / self.sampled if self.sampled else 0.0
+        return {
+            'count': self.count,
+            'sampled': self.sampled,
+            'mean_us': mean / 1000,
+            'total_ms': mean * self.count / 1e6,  # extrapolated from the samples
+        }
+
+
+def _timed_decode_text(link, steps, clock):
+    """Time the steps of thunder_core.decode_link on a str link"""
+    start = clock()
+    link = link.strip()
+    error = thunder_core.check_link(link)
+    now = clock()
+    steps.append((STEP_VALIDATE, now - start))
+    if error is not None:
+        return
+    start = now
+    try:
+        decoded = thunder_core.decode_payload(link)
+    except binascii.Error:
+        decoded = None
+    now = clock()
+    steps.append((STEP_BASE64, now - start))
+    if decoded is None:
+        return
+    start = now
+    try:
+        text = decoded.decode('utf-8')
+    except UnicodeDecodeError:
+        text = None
+    now = clock()
+    steps.append((STEP_UTF8, now - start))
+    if text is None:
+        return
+    start = now
+    thunder_core.unwrap_url(text)
+    steps.append((STEP_UNQUOTE, clock() - start))
+
+
+def _timed_decode_bytes(line, steps, clock):
+    """Time the steps of thunder_core.decode_link_bytes; False if it would fall back"""
+    start = clock()
+    decoded = thunder_core.decode_payload_bytes(line.strip())
+    now = clock()
+    steps.append((STEP_BASE64, now - start))
+    if decoded is None:
+        return False
+    start = now
+    url = thunder_core.unwrap_url_bytes(decoded)
+    steps.append((STEP_UNQUOTE, clock() - start))
+    return url is not None
+
+
+def timed_decode(link, decode=thunder_core.decode_link, clock=perf_counter_ns):
+    """Decode a link step by step, returning [(step, nanoseconds), ...]
+
+    Takes the path thunder_core takes for the link type (str or bytes),
+    through the same step functions; links of other schemes are timed as
+    a whole through decode.
+    """
+    steps = []
+    if isinstance(link, str):
+        is_thunder = link.lstrip().startswith(thunder_core.PREFIX)
+    else:
+        is_thunder = link.lstrip().startswith(thunder_core.PREFIX_BYTES)
+    if not is_thunder and decode is not thunder_core.decode_link:
+        start = clock()
+        decode(link)
+        steps.append((STEP_OTHER, clock() - start))
+    elif isinstance(link, str):
+        _timed_decode_text(link, steps, clock)
+    elif not _timed_decode_bytes(link, steps, clock):
+        # thunder_core falls back to the str path for unusual links
+        steps = []
+        _timed_decode_text(link.decode('utf-8', 'surrogateescape'), steps, clock)
+    return steps
+
+
+class Profiler:
+    """Per-stage counters and sampled timers of one run"""
+
+    def __init__(self, sample_every=SAMPLE_EVERY, decode=thunder_core.decode_link):
+        self.sample_every = sample_every
+        self.decode = decode
+        self.stages = {}
+        self.steps = {}
+        self.inner = {}  # stage -> the stage it wraps
+        self.started = perf_counter_ns()
+        self.stopped = None
+
+    def stop(self):
+        """Freeze the elapsed time at the end of the run"""
+        self.stopped = perf_counter_ns()
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage()
+        return stage
+
+    def add(self, name, ns, count=1):
+        """Record an exactly timed event of count items"""
+        self.stage(name).add(ns, count)
+
+    def iterate(self, iterable, name, inner=None, exact=False):
+        """Pass items through, timing about one next() in sample_every as stage name
+
+        inner names the stage that times iterable itself; its time is
+        subtracted to give the time spent in this stage alone. exact times
+        every item, for bursty stages whose rare slow items sampling would
+        miss (e.g. waiting on a worker pool).
+        """
+        stage = self.stage(name)
+        if inner is not None:
+            self.inner[name] = inner
+        gap = (lambda: 0) if exact else self._gap
+        it = iter(iterable)
+        skip = gap()
+        while True:
+            if skip:
+                skip -= 1
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+            else:
+                skip = gap()
+                start = perf_counter_ns()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                stage.ns += perf_counter_ns() - start
+                stage.sampled += 1
+            stage.count += 1
+            yield item
+
+    def _gap(self):
+        """Items to skip before the next sample, sample_every - 1 on average"""
+        return random.randrange(2 * self.sample_every - 1)
+
+    def sample_links(self, links):
+        """Pass links through, timing the decode steps of about one in sample_every
+
+        Sampled links are decoded once more by timed_decode, which costs
+        about 1/sample_every of the decode work.
+        """
+        gap = self._gap
+        skip = gap()
+        for link in links:
+            if skip:
+                skip -= 1
+            else:
+                skip = gap()
+                self.sample(link)
+            yield link
+
+    def sample(self, link):
+        """Time the decode steps of one link"""
+        for step, ns in timed_decode(link, self.decode):
+            stage = self.steps.get(step)
+            if stage is None:
+                stage = self.steps[step] = Stage()
+            stage.add(ns)
+
+    def snapshot(self):
+        """Return the figures as a dict of plain values, ready for JSON"""
+        stages = {name: stage.snapshot() for name, stage in self.stages.items()}
+        for name, stats in stages.items():
+            inner = stages.get(self.inner.get(name))
+            # Both totals are estimates; never report a negative remainder
+            stats['self_ms'] = max(0.0, stats['total_ms'] - (inner['total_ms'] if inner else 0.0))
+        return {
+            'elapsed_ms': ((self.stopped or perf_counter_ns()) - self.started) / 1e6,
+            'sample_every': self.sample_every,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'strict_base64': thunder_core.HAVE_STRICT_BASE64,
+            'stages': stages,
+            'steps': {name: self.steps[name].snapshot() for name in STEPS
+                      if name in self.steps},
+        }
+
+    def dump(self, f):
+        """Write the snapshot as JSON"""
+        json.dump(self.snapshot(), f, indent=2)
+        f.write('\n')
+
+
+def format_snapshot(snapshot):
+    """Yield the lines of a human readable profile"""
+    yield (f"Profile: {snapshot['elapsed_ms']:.1f} ms elapsed, "
+           f"1 in {snapshot['sample_every']} items timed")
+    stages = snapshot['stages']
+    if stages:
+        yield "Stages (time spent in the stage itself):"
+        for name, stats in stages.items():
+            yield (f"  {name:<10} {stats['count']:>10} items  {stats['mean_us']:>9.3f} us/item"
+                   f"  ~{stats['self_ms']:>10.1f} ms")
+        other = snapshot['elapsed_ms'] - sum(stats['self_ms'] for stats in stages.values())
+        yield f"  {'other':<10} {'':>10}        {'':>9}          ~{max(other, 0.0):>10.1f} ms"
+    steps = snapshot['steps']
+    if steps:
+        total = sum(stats['total_ms'] for stats in steps.values())
+        yield "Decode steps (sampled):"
+        for name, stats in steps.items():
+            share = 100 * stats['total_ms'] / total if total else 0.0
+            yield (f"  {name:<10} {stats['count']:>10} items  {stats['mean_us']:>9.3f} us/item"
+                   f"  {share:5.1f}%")
@@ -0,0 +1,259 @@
+'''
+Batch report for thunder-https
+Summarises a decoded batch after the fact: how many URLs are duplicates,
+which hosts and file extensions dominate, and why links failed. Everything
+is counted in one streaming pass with bounded memory, so the report also
+works on inputs far larger than RAM.
+
+Duplicates are counted exactly with a set of 64-bit URL hashes up to
+exact_limit distinct URLs, and estimated at any size with a HyperLogLog
+sketch. Top hosts and extensions come from a count-min sketch that keeps
+a small table of the heaviest keys seen so far.
+'''
+from array import array
+from collections import Counter
+import math
+import thunder_core
+import thunder_writers
+
+# Distinct URLs whose hashes are kept for exact duplicate counts and
+# deduplication (about 64 MB); past it only the estimate is reported
+EXACT_LIMIT = 1000000
+
+# HyperLogLog registers are 2 ** HLL_PRECISION bytes, about 0.8% error
+HLL_PRECISION = 14
+
+# Count-min sketch size: over-counts by at most total / width with
+# probability 1 - 2 ** -depth
+CMS_WIDTH = 4096
+CMS_DEPTH = 4
+
+# Entries reported per top list, and candidates tracked per reported entry
+TOP_N = 10
+CANDIDATE_FACTOR = 4
+
+# Distinct keys counted exactly before a top list switches to the sketch
+EXACT_KEYS = 10000
+
+MASK64 = (1 << 64) - 1
+
+# Longest file extension counted
+MAX_EXTENSION_LEN = 10
+
+
+def url_hash(text):
+    """Return a 64-bit hash of text, stable within this process"""
+    # str hashes are SipHash, well mixed enough for the sketches
+    return hash(text) & MASK64
+
+
+def url_extension(url):
+    """Return the lowercased file extension of a URL, or None"""
+    if url is None:
+        return None
+    if url.startswith('ed2k://|file|'):
+        # ed2k://|file|NAME|SIZE|HASH|/
+        name = url.split('|', 3)[2]
+    else:
+        path = url.partition('?')[0].partition('#')[0].partition('://')[2]
+        slash = path.rfind('/')
+        if slash < 0:
+            return None
+        name = path[slash + 1:]
+    dot = name.rfind('.')
+    extension = name[dot + 1:]
+    if (dot < 0 or len(extension) > MAX_EXTENSION_LEN
+            or not (extension.isascii() and extension.isalnum())):
+        return None
+    return extension.lower()
+
+
+class HyperLogLog:
+    """Estimate the number of distinct hashes added"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, h):
+        precision = self.precision
+        index = h >> (64 - precision)
+        rest = h & ((1 << (64 - precision)) - 1)
+        rank = 64 - precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction: linear counting
+            return m * math.log(m / zeros)
+        return estimate
+
+
+class CountMinSketch:
+    """Approximate counts of keys in fixed memory; never under-counts"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.rows = [array('Q', bytes(8 * width)) for _ in range(depth)]
+
+    def add(self, key, count=1):
+        """Count key and return its new estimate"""
+        h = url_hash(key)
+        low, high = h & 0xffffffff, h >> 32
+        width = self.width
+        estimate = None
+        for i, row in enumerate(self.rows):
+            # Kirsch-Mitzenmacher: row hashes derived from one 64-bit hash
+            column = (low + i * high) % width
+            row[column] += count
+            if estimate is None or row[column] < estimate:
+                estimate = row[column]
+        return estimate
+
+
+class TopCounter:
+    """Track the most frequent keys
+
+    Keys are counted exactly until there are more than exact_keys of them
+    (hosts and extensions usually stay well below). Past that they go
+    through a count-min sketch, and only capacity candidate keys are kept;
+    a key seen more often than the lightest candidate replaces it.
+    """
+
+    def __init__(self, capacity, exact_keys=EXACT_KEYS):
+        self.capacity = capacity
+        self.exact_keys = exact_keys
+        self.counts = Counter()
+        self.sketch = None
+        self.candidates = {}
+        self._floor = 0  # lower bound of the lightest candidate count
+
+    def add(self, key):
+        if self.sketch is None:
+            counts = self.counts
+            counts[key] += 1
+            if len(counts) > self.exact_keys:
+                self._spill()
+            return
+        self._add_estimate(key, self.sketch.add(key))
+
+    def _spill(self):
+        """Move the exact counts into the sketch"""
+        self.sketch = CountMinSketch()
+        for key, count in self.counts.items():
+            self._add_estimate(key, self.sketch.add(key, count))
+        self.counts = None
+
+    def _add_estimate(self, key, estimate):
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.capacity:
+            candidates[key] = estimate
+        elif estimate > self._floor:
+            lightest = min(candidates, key=candidates.get)
+            self._floor = candidates[lightest]
+            if estimate > self._floor:
+                del candidates[lightest]
+                candidates[key] = estimate
+
+    def top(self, n):
+        """Return the n heaviest (key, count) pairs; counts are estimates past exact_keys"""
+        items = self.candidates.items() if self.counts is None else self.counts.items()
+        return sorted(items, key=lambda item: (-item[1], item[0]))[:n]
+
+
+class BatchReport:
+    """Duplicate, host, extension and error statistics of decode results
+
+    exact_limit None keeps every URL hash, for callers that hold the
+    results in memory anyway.
+    """
+
+    def __init__(self, top_n=TOP_N, exact_limit=EXACT_LIMIT):
+        self.top_n = top_n
+        self.exact_limit = exact_limit
+        self.total = 0
+        self.ok = 0
+        self.duplicates = 0  # exact while exact is True
+        self.exact = True
+        self.errors = Counter()
+        self._seen = set()
+        self._distinct = HyperLogLog()
+        self._hosts = TopCounter(top_n * CANDIDATE_FACTOR)
+        self._extensions = TopCounter(top_n * CANDIDATE_FACTOR)
+
+    def add(self, result):
+        """Count one result; return False if its URL was seen before"""
+        self.total += 1
+        if result.status != thunder_core.STATUS_OK:
+            self.errors[result.error] += 1
+            return True
+        self.ok += 1
+        url = result.url
+        host = thunder_writers.url_host(url)
+        if host:
+            self._hosts.add(host)
+        extension = url_extension(url)
+        if extension:
+            self._extensions.add(extension)
+        h = url_hash(url)
+        self._distinct.add(h)
+        seen = self._seen
+        if h in seen:
+            self.duplicates += 1
+            return False
+        if self.exact_limit is not None and len(seen) >= self.exact_limit:
+            # Untracked URLs may repeat; they are let through
+            self.exact = False
+        else:
+            seen.add(h)
+        return True
+
+    def update(self, results):
+        """Count a chunk of results"""
+        add = self.add
+        for result in results:
+            add(result)
+
+    def track(self, results, skip_duplicates=False, on_skip=None):
+        """Count results as they pass through, optionally dropping repeated URLs
+
+        on_skip, if given, is called with each dropped result, so state
+        kept alongside the results (e.g. line numbers) can drop it too.
+        """
+        add = self.add
+        for result in results:
+            if add(result) or not skip_duplicates:
+                yield result
+            elif on_skip is not None:
+                on_skip(result)
+
+    def summary(self):
+        """Return the report as a dict of plain values"""
+        distinct = min(self._distinct.estimate(), self.ok)
+        return {
+            'links': self.total,
+            'ok': self.ok,
+            'failed': self.total - self.ok,
+            'errors': dict(self.errors.most_common()),
+            'exact': self.exact,
+            'duplicates': self.duplicates if self.exact else None,
+            'unique_urls': self.ok - self.duplicates if self.exact else None,
+            'estimated_unique_urls': round(distinct),
+            'estimated_duplicates': max(0, self.ok - round(distinct)),
+            'top_hosts': self._hosts.top(self.top_n),
+            'top_extensions': self._extensions.top(self.top_n),
+        }
+
+
+def unique_urls(urls):
+    """Yield each URL once, in first-seen order"""
+    seen = set()
+    for url in urls:
+        if url not in seen:
+            seen.add(url)
+            yield url
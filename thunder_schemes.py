@@ -0,0 +1,150 @@
+'''
+Multi-scheme link decoders for thunder-https
+Mixed dumps carry FlashGet and QQ Xuanfeng links next to thunder ones, so
+decoders are registered per scheme prefix and a single dispatcher picks
+the right one with a prefix trie. Wrapped links (e.g. a thunder link
+around a flashget link) are unwrapped in the same pass.
+
+flashget://  base64("[FLASHGET]" + url + "[FLASHGET]"), optionally "&..."
+qqdl://      base64(url)
+ed2k://, magnet:?  passed through unchanged
+'''
+from collections import namedtuple
+import binascii
+import re
+import thunder_core
+from thunder_core import DecodeResult, STATUS_OK, STATUS_ERROR
+
+FLASHGET_PREFIX = 'flashget://'
+FLASHGET_MARKER = '[FLASHGET]'
+QQDL_PREFIX = 'qqdl://'
+
+# Base64 payload of the flashget and qqdl schemes
+BASE64_PATTERN = re.compile(r'[A-Za-z0-9+/]+=*')
+
+# Wrapped links are unwrapped at most this many levels deep
+MAX_NESTING = 4
+
+Scheme = namedtuple('Scheme', 'prefix decode wrapper')
+
+
+class PrefixTrie:
+    """Map prefixes to values, matching str and bytes keys alike"""
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix, value):
+        node = self._root
+        for char in prefix:
+            child = node.get(char)
+            if child is None:
+                # Bytes iterate as ints, so each node is reachable by both keys
+                child = node[char] = node[ord(char)] = {}
+            node = child
+        node[None] = value
+
+    def longest_prefix(self, text):
+        """Return the value of the longest registered prefix of text, or None"""
+        node = self._root
+        found = node.get(None)
+        for key in text:
+            node = node.get(key)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        return found
+
+
+def _text(link):
+    return link if isinstance(link, str) else link.decode('utf-8', 'surrogateescape')
+
+
+def _decode_base64(link, payload):
+    """Return (text, None) for a base64 payload, or (None, error result)"""
+    if BASE64_PATTERN.fullmatch(payload) is None:
+        return None, DecodeResult(link, None, STATUS_ERROR, thunder_core.ERROR_FORMAT, None)
+    try:
+        return binascii.a2b_base64(payload).decode('utf-8'), None
+    except (binascii.Error, UnicodeDecodeError) as e:
+        return None, DecodeResult(link, None, STATUS_ERROR, thunder_core.ERROR_DECODE, str(e))
+
+
+def decode_flashget(link):
+    """Decode a flashget:// link"""
+    link = _text(link)
+    # FlashGet appends "&" and a referrer id after the payload
+    payload = link[len(FLASHGET_PREFIX):].split('&', 1)[0]
+    text, error = _decode_base64(link, payload)
+    if error is not None:
+        return error
+    marker = len(FLASHGET_MARKER)
+    if (len(text) < 2 * marker or not text.startswith(FLASHGET_MARKER)
+            or not text.endswith(FLASHGET_MARKER)):
+        return DecodeResult(link, None, STATUS_ERROR, thunder_core.ERROR_CONTENT, None)
+    return DecodeResult(link, text[marker:-marker], STATUS_OK, None, None)
+
+
+def decode_qqdl(link):
+    """Decode a qqdl:// link"""
+    link = _text(link)
+    text, error = _decode_base64(link, link[len(QQDL_PREFIX):])
+    if error is not None:
+        return error
+    return DecodeResult(link, text, STATUS_OK, None, None)
+
+
+def passthrough(link):
+    """Links that are already usable by download managers"""
+    link = _text(link)
+    return DecodeResult(link, link, STATUS_OK, None, None)
+
+
+class SchemeRegistry:
+    """Dispatch links to the decoder registered for their scheme prefix"""
+
+    def __init__(self):
+        self._trie = PrefixTrie()
+        self.schemes = []
+
+    def register(self, prefix, decode, wrapper=True):
+        """Register a decoder; wrapper schemes may decode to another link"""
+        scheme = Scheme(prefix, decode, wrapper)
+        self._trie.insert(prefix, scheme)
+        self.schemes.append(scheme)
+
+    def lookup(self, link):
+        """Return the Scheme handling link, or None"""
+        return self._trie.longest_prefix(link)
+
+    def decode(self, link):
+        """Decode a link of any registered scheme into a DecodeResult"""
+        link = link.strip()
+        scheme = self._trie.longest_prefix(link)
+        if scheme is None:
+            return DecodeResult(_text(link), None, STATUS_ERROR,
+                                thunder_core.ERROR_SCHEME, None)
+        result = scheme.decode(link)
+        depth = 0
+        while scheme.wrapper and result.status == STATUS_OK and depth < MAX_NESTING:
+            scheme = self._trie.longest_prefix(result.url)
+            if scheme is None or not scheme.wrapper:
+                break
+            # Report the outer link the user gave, with the innermost outcome
+            result = scheme.decode(result.url)._replace(link=result.link)
+            depth += 1
+        return result
+
+
+DEFAULT_REGISTRY = SchemeRegistry()
+DEFAULT_REGISTRY.register(thunder_core.PREFIX, thunder_core.decode_link)
+DEFAULT_REGISTRY.register(FLASHGET_PREFIX, decode_flashget)
+DEFAULT_REGISTRY.register(QQDL_PREFIX, decode_qqdl)
+DEFAULT_REGISTRY.register('ed2k://', passthrough, wrapper=False)
+DEFAULT_REGISTRY.register('magnet:?', passthrough, wrapper=False)
+
+
+def decode_any(link):
+    """Decode a link of any supported scheme (str or bytes)"""
+    return DEFAULT_REGISTRY.decode(link)
@@ -0,0 +1,343 @@
+'''
+Local HTTP/JSON conversion service for thunder-https
+An asyncio HTTP/1.1 server, standard library only, that exposes the
+decoder to other local services. Connections are kept alive and pipelined
+requests are answered in order.
+
+Endpoints:
+    GET  /decode?link=LINK   one link, returns a JSON object
+    POST /decode             JSON array of links, returns a JSON array
+    POST /decode/stream      newline separated links (any length, may be
+                             chunked), returns NDJSON as the body arrives
+    GET  /metrics            request counts, throughput and latency histograms
+'''
+from collections import deque
+from urllib import parse
+import asyncio
+import json
+import time
+import thunder_core
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH = 10000
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_LINES = 100
+MAX_LINE_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 60.0
+
+# Links decoded per NDJSON chunk written by the stream endpoint
+STREAM_CHUNK_SIZE = 1000
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Seconds of history used for the recent throughput figure
+THROUGHPUT_WINDOW = 60
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    """Rejects a request with an HTTP status and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Metrics:
+    """Request counters, throughput and latency histograms per endpoint"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.endpoints = {}
+        self._recent = deque()  # (second, links) for the throughput window
+
+    def record(self, endpoint, links, seconds):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                'requests': 0, 'links': 0, 'seconds': 0.0,
+                'latency_ms': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        stats['requests'] += 1
+        stats['links'] += links
+        stats['seconds'] += seconds
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        stats['latency_ms'][bucket] += 1
+
+        now = int(time.monotonic())
+        if self._recent and self._recent[-1][0] == now:
+            self._recent[-1][1] += links
+        else:
+            self._recent.append([now, links])
+        while self._recent[0][0] <= now - THROUGHPUT_WINDOW:
+            self._recent.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        uptime = now - self.started
+        total = sum(stats['links'] for stats in self.endpoints.values())
+        recent = sum(links for second, links in self._recent
+                     if second > now - THROUGHPUT_WINDOW)
+        bounds = [str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf']
+        return {
+            'uptime_seconds': uptime,
+            'links': total,
+            'links_per_sec': total / uptime if uptime else 0.0,
+            'recent_links_per_sec': recent / min(uptime, THROUGHPUT_WINDOW) if uptime else 0.0,
+            'endpoints': {
+                endpoint: dict(stats, latency_ms=dict(zip(bounds, stats['latency_ms'])))
+                for endpoint, stats in self.endpoints.items()
+            },
+        }
+
+
+def result_json(result):
+    # ASCII output keeps undecodable input bytes (lone surrogates) valid JSON
+    return json.dumps(result._asdict())
+
+
+async def _read_line(reader):
+    try:
+        line = await reader.readuntil(b'\n')
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "header line too long") from None
+    return line
+
+
+async def read_request(reader):
+    """Read a request head; return (method, target, version, headers) or None at EOF"""
+    try:
+        line = await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "request line too long") from None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        raise HttpError(400, "malformed request line")
+    method, target, version = parts
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await _read_line(reader)
+        if line in (b'\r\n', b'\n'):
+            return method, target, version, headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError(400, "too many headers")
+
+
+def body_length(headers):
+    """Return the Content-Length of a request body, or None if it is chunked"""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        return None
+    length = headers.get('content-length')
+    if length is None:
+        raise HttpError(411, "Content-Length or chunked body required")
+    try:
+        return int(length)
+    except ValueError:
+        raise HttpError(400, "invalid Content-Length") from None
+
+
+async def iter_body(reader, headers):
+    """Yield the request body in pieces, plain or chunked"""
+    remaining = body_length(headers)
+    if remaining is None:
+        while True:
+            try:
+                size = int((await _read_line(reader)).split(b';')[0], 16)
+            except ValueError:
+                raise HttpError(400, "malformed chunk size") from None
+            if size == 0:
+                while (await _read_line(reader)) not in (b'\r\n', b'\n'):
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    while remaining > 0:
+        piece = await reader.read(min(remaining, 1 << 16))
+        if not piece:
+            raise asyncio.IncompleteReadError(b'', remaining)
+        remaining -= len(piece)
+        yield piece
+
+
+async def read_body(reader, headers, limit=MAX_BODY_BYTES):
+    """Read the whole request body, rejecting bodies over limit bytes"""
+    length = headers.get('content-length')
+    if length and length.isdigit() and int(length) > limit:
+        raise HttpError(413, f"request body over {limit} bytes")
+    body = bytearray()
+    async for piece in iter_body(reader, headers):
+        body += piece
+        if len(body) > limit:
+            raise HttpError(413, f"request body over {limit} bytes")
+    return bytes(body)
+
+
+def query_param(query, name):
+    """Return the first value of a query string parameter, or None
+
+    Values are decoded with unquote, not unquote_plus: '+' is a base64
+    character, so a link sent without percent-encoding stays intact.
+    """
+    for field in query.split('&'):
+        key, sep, value = field.partition('=')
+        if sep and parse.unquote(key) == name:
+            return parse.unquote(value)
+    return None
+
+
+def write_response(writer, status, body, content_type='application/json', keep_alive=True):
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n")
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + body)
+
+
+class DecodeServer:
+    """Serve the decoder over HTTP/JSON"""
+
+    def __init__(self, decode=thunder_core.decode_link, max_batch=DEFAULT_MAX_BATCH):
+        self.decode = decode
+        self.max_batch = max_batch
+        self.metrics = Metrics()
+
+    async def handle_connection(self, reader, writer):
+        """Answer requests on one connection in order until it is closed"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    write_response(writer, e.status, self._error_body(e), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = (connection != 'close'
+                              and (version != 'HTTP/1.0' or connection == 'keep-alive'))
+                try:
+                    await self.dispatch(method, target, headers, reader, writer, keep_alive)
+                except HttpError as e:
+                    # The rest of the body may still be unread, so the connection ends
+                    write_response(writer, e.status, self._error_body(e), keep_alive=False)
+                    break
+                await writer.drain()
+                if not keep_alive:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _error_body(error):
+        return json.dumps({'error': str(error)}).encode('utf-8')
+
+    async def dispatch(self, method, target, headers, reader, writer, keep_alive):
+        url = parse.urlsplit(target)
+        start = time.perf_counter()
+        if url.path == '/decode':
+            if method == 'GET':
+                link = query_param(url.query, 'link')
+                if not link:
+                    raise HttpError(400, "missing link parameter")
+                body = result_json(self.decode(link)).encode('utf-8')
+                count = 1
+            elif method == 'POST':
+                links = self._parse_batch(await read_body(reader, headers))
+                results = thunder_core.decode_many(links, decode=self.decode)
+                body = ('[' + ','.join(map(result_json, results)) + ']').encode('utf-8')
+                count = len(links)
+            else:
+                raise HttpError(405, "use GET or POST")
+            write_response(writer, 200, body, keep_alive=keep_alive)
+        elif url.path == '/decode/stream':
+            if method != 'POST':
+                raise HttpError(405, "use POST")
+            count = await self._stream(reader, writer, headers, keep_alive)
+        elif url.path == '/metrics':
+            if method != 'GET':
+                raise HttpError(405, "use GET")
+            body = json.dumps(self.metrics.snapshot()).encode('utf-8')
+            write_response(writer, 200, body, keep_alive=keep_alive)
+            return
+        else:
+            raise HttpError(404, f"no such endpoint: {url.path}")
+        self.metrics.record(url.path, count, time.perf_counter() - start)
+
+    def _parse_batch(self, body):
+        try:
+            links = json.loads(body)
+        except ValueError as e:
+            raise HttpError(400, f"invalid JSON: {e}") from None
+        if not isinstance(links, list) or not all(isinstance(link, str) for link in links):
+            raise HttpError(400, "expected a JSON array of strings")
+        if len(links) > self.max_batch:
+            raise HttpError(413, f"batch over {self.max_batch} links")
+        return links
+
+    async def _stream(self, reader, writer, headers, keep_alive):
+        """Decode a newline separated body into a chunked NDJSON response"""
+        # A body without valid framing is still refused with a status
+        body_length(headers)
+        head = ("HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/x-ndjson\r\n"
+                "Transfer-Encoding: chunked\r\n")
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n")
+        count = 0
+        tail = b''
+        try:
+            async for piece in iter_body(reader, headers):
+                lines = (tail + piece).split(b'\n')
+                tail = lines.pop()
+                for chunk in thunder_core.iter_chunks(thunder_core.iter_links(lines),
+                                                      STREAM_CHUNK_SIZE):
+                    count += len(chunk)
+                    self._write_chunk(writer, thunder_core.decode_many(chunk, decode=self.decode))
+                # Backpressure: stop reading while the client is not reading
+                await writer.drain()
+                if len(tail) > MAX_LINE_BYTES:
+                    raise HttpError(413, f"line over {MAX_LINE_BYTES} bytes")
+        except HttpError as e:
+            # The response has started, so the only way to fail is to hang up
+            raise ConnectionAbortedError(str(e)) from None
+        if tail.strip():
+            count += 1
+            self._write_chunk(writer, [self.decode(tail)])
+        writer.write(b"0\r\n\r\n")
+        return count
+
+    @staticmethod
+    def _write_chunk(writer, results):
+        data = ''.join([result_json(result) + '\n' for result in results]).encode('utf-8')
+        writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None, **options):
+    """Run the service until cancelled; ready is called with the bound address"""
+    service = DecodeServer(**options)
+    server = await asyncio.start_server(service.handle_connection, host, port,
+                                        limit=MAX_LINE_BYTES)
+    async with server:
+        if ready is not None:
+            ready(server.sockets[0].getsockname())
+        await server.serve_forever()
@@ -0,0 +1,148 @@
+'''
+Result store for thunder-https
+Keeps the decode results of a conversion run in input order and serves
+them by row, so the GUI table, copy, save and open all read one copy of
+the data instead of parallel lists.
+
+Links and URLs live in one contiguous UTF-8 buffer indexed by an offset
+array, and error codes are interned as small integers, so each result
+costs its text plus a few bytes instead of several Python objects.
+DecodeResults are rebuilt only when a row is read.
+'''
+from array import array
+import sys
+import thunder_core
+import thunder_writers
+
+# Lone surrogates (undecodable input bytes) survive the round trip
+TEXT_ERRORS = 'surrogatepass'
+
+# Code of successful results in the code array
+OK_CODE = 0
+
+
+class ResultStore:
+    """Decode results of one conversion run, in input order"""
+    __slots__ = ('_text', '_offsets', '_codes', '_code_names', '_code_index',
+                 '_details', 'ok_count')
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._codes)
+        code = self._codes[index]
+        text = self._text
+        start, middle, end = self._offsets[2 * index:2 * index + 3]
+        link = text[start:middle].decode('utf-8', TEXT_ERRORS)
+        if code == OK_CODE:
+            url = text[middle:end].decode('utf-8', TEXT_ERRORS)
+            return thunder_core.DecodeResult(link, url, thunder_core.STATUS_OK, None, None)
+        return thunder_core.DecodeResult(link, None, thunder_core.STATUS_ERROR,
+                                         self._code_names[code], self._details.get(index))
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self._codes)))
+
+    @property
+    def error_count(self):
+        return len(self._codes) - self.ok_count
+
+    def nbytes(self):
+        """Approximate memory used by the stored results"""
+        return (len(self._text) + self._offsets.itemsize * len(self._offsets)
+                + len(self._codes) + sys.getsizeof(self._details))
+
+    def _intern_code(self, error):
+        code = self._code_index.get(error)
+        if code is None:
+            code = self._code_index[error] = len(self._code_names)
+            self._code_names.append(error)
+        return code
+
+    def extend(self, results):
+        """Append a chunk of DecodeResults"""
+        ok = thunder_core.STATUS_OK
+        text, offsets, codes = self._text, self._offsets, self._codes
+        for result in results:
+            text += result.link.encode('utf-8', TEXT_ERRORS)
+            offsets.append(len(text))
+            if result.status == ok:
+                text += result.url.encode('utf-8', TEXT_ERRORS)
+                codes.append(OK_CODE)
+                self.ok_count += 1
+            else:
+                if result.detail is not None:
+                    self._details[len(codes)] = sys.intern(result.detail)
+                codes.append(self._intern_code(result.error))
+            offsets.append(len(text))
+
+    def replace(self, start, end, results):
+        """Replace the rows start..end (exclusive) by a list of DecodeResults
+
+        Rows after end are moved, not re-encoded, so patching a few rows of
+        a large store costs a copy of the tail rather than a rebuild.
+        """
+        text, offsets, codes = self._text, self._offsets, self._codes
+        text_end = offsets[2 * end]
+        tail_text = text[text_end:]
+        tail_offsets = offsets[2 * end + 1:]
+        tail_codes = codes[end:]
+        shift = len(results) - (end - start)
+        details = {}
+        for index, detail in self._details.items():
+            if index < start:
+                details[index] = detail
+            elif index >= end:
+                details[index + shift] = detail
+        self._details = details
+        self.ok_count -= codes[start:end].count(OK_CODE)
+        del text[offsets[2 * start]:]
+        del offsets[2 * start + 1:]
+        del codes[start:]
+        self.extend(results)
+        moved = len(text) - text_end
+        text += tail_text
+        offsets.extend(tail_offsets if not moved else
+                       array('q', [offset + moved for offset in tail_offsets]))
+        codes.extend(tail_codes)
+
+    def clear(self):
+        self._text = bytearray()
+        self._offsets = array('q', [0])  # link start, URL start, ... end
+        self._codes = array('B')
+        self._code_names = [None]
+        self._code_index = {}
+        self._details = {}  # index -> detail, for the few errors that have one
+        self.ok_count = 0
+
+    def _url(self, index):
+        return self._text[self._offsets[2 * index + 1]:
+                          self._offsets[2 * index + 2]].decode('utf-8', TEXT_ERRORS)
+
+    def urls(self):
+        """Yield the URLs of the successful results"""
+        url = self._url
+        for index, code in enumerate(self._codes):
+            if code == OK_CODE:
+                yield url(index)
+
+    def find(self, errors_only=False, host='', start=0):
+        """Yield the indices, from start on, of results matching the filters
+
+        host keeps successful results whose host contains it (case-insensitive).
+        """
+        host = host.lower()
+        url_host = thunder_writers.url_host
+        codes = self._codes
+        for index in range(start, len(codes)):
+            code = codes[index]
+            if errors_only and code == OK_CODE:
+                continue
+            if host and (code != OK_CODE or host not in (url_host(self._url(index)) or '')):
+                continue
+            yield index
@@ -0,0 +1,345 @@
+'''
+Watch-folder daemon for thunder-https
+Watches a spool directory for link files and converts the bytes appended
+to each file since the last run. Per-file offset checkpoints make restarts
+resume where they stopped, every output file is written to a temporary
+name and renamed into place, and files are converted in worker processes
+with a bounded number of increments in flight.
+
+Changes are picked up with inotify on Linux; elsewhere, or when inotify
+is unavailable, the directory is polled.
+'''
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import ctypes
+import ctypes.util
+import fnmatch
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+import thunder_core
+import thunder_writers
+
+DEFAULT_PATTERN = '*.txt'
+DEFAULT_POLL_INTERVAL = 2.0
+CHECKPOINT_NAME = '.thunder_checkpoints.json'
+OUTPUT_DIR_NAME = 'converted'
+
+# Bytes of a file converted per work unit, bounding the memory of a burst
+MAX_INCREMENT = 8 * 1024 * 1024
+
+# Seconds between checks for finished work while increments are in flight
+WAIT_SLICE = 0.2
+
+# Every file is rescanned this often even when inotify reports nothing,
+# in case events were lost
+RESCAN_INTERVAL = 60.0
+
+# A failed increment is retried after RETRY_DELAY seconds, doubling up to
+# MAX_RETRIES times; after that the file waits for its next change
+RETRY_DELAY = 1.0
+MAX_RETRIES = 5
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Report the names of files changed in a directory using Linux inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"cannot watch {directory}")
+
+    def wait(self, timeout):
+        """Return the names changed within timeout seconds, None to rescan all"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        names = set()
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+                pos += INOTIFY_EVENT.size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                name = data[pos:pos + length].rstrip(b'\0')
+                pos += length
+                if name:
+                    names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Ask for a full rescan of the directory every interval seconds"""
+
+    def __init__(self, interval=DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._due = time.monotonic()
+
+    def wait(self, timeout):
+        delay = self._due - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        if delay > 0:
+            time.sleep(delay)
+        self._due = time.monotonic() + self.interval
+        return None
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Return an inotify watcher where supported, a polling one otherwise"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(poll_interval)
+
+
+def write_atomic(path, fmt, results):
+    """Write results to path through a temporary file and a rename"""
+    tmp = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    if fmt == 'text':
+        with open(tmp, 'w', encoding='utf-8', newline='', errors='surrogatepass') as f:
+            f.writelines(result.url + '\n' for result, _ in results
+                         if result.status == thunder_core.STATUS_OK)
+    else:
+        records = thunder_writers.iter_records(
+            (result for result, _ in results), (number for _, number in results))
+        thunder_writers.save_records(tmp, fmt, records)
+    os.replace(tmp, path)
+
+
+def convert_increment(path, start, out_path, fmt, first_line, decode=thunder_core.decode_link):
+    """Convert the complete lines of path from byte offset start on
+
+    Reads at most MAX_INCREMENT bytes and returns (bytes consumed, lines
+    consumed, successful, failed). A trailing line without a newline is
+    left for the next call, unless it alone exceeds MAX_INCREMENT.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(MAX_INCREMENT)
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        if len(data) < MAX_INCREMENT:
+            return 0, 0, 0, 0
+        end = len(data)
+    lines = data[:end].split(b'\n')
+    if not lines[-1]:
+        lines.pop()
+    numbered = [(line, number) for number, line in enumerate(map(bytes.strip, lines), first_line)
+                if line]
+    decoded = thunder_core.decode_many([line for line, _ in numbered], decode=decode)
+    results = [(result, number) for result, (_, number) in zip(decoded, numbered)]
+    if results:
+        write_atomic(out_path, fmt, results)
+    ok = sum(1 for result in decoded if result.status == thunder_core.STATUS_OK)
+    return end, len(lines), ok, len(decoded) - ok
+
+
+def _ignore_sigint():
+    # Ctrl+C is handled by the daemon, which lets running work finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Checkpoints:
+    """Per-file [inode, byte offset, line count, generation] saved as JSON
+
+    The generation counts the times a file was replaced or truncated;
+    entries saved before it was recorded have none and are generation 0.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.files = json.load(f)
+        except FileNotFoundError:
+            self.files = {}
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.files, f)
+        os.replace(tmp, self.path)
+
+
+class WatchDaemon:
+    """Convert new lines of the link files in a directory as they arrive"""
+
+    def __init__(self, directory, output_dir=None, fmt='text', workers=1,
+                 pattern=DEFAULT_PATTERN, poll_interval=DEFAULT_POLL_INTERVAL,
+                 decode=thunder_core.decode_link, log=None):
+        self.directory = directory
+        self.output_dir = output_dir or os.path.join(directory, OUTPUT_DIR_NAME)
+        self.fmt = fmt
+        self.workers = workers or os.cpu_count() or 1
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.decode = decode
+        self.log = log
+        self.checkpoints = Checkpoints(os.path.join(directory, CHECKPOINT_NAME))
+        self._pending = {}  # name -> monotonic time it may be dispatched, in arrival order
+        self._failures = {}  # name -> failed attempts in a row
+        self._inflight = {}  # future -> (name, start offset, line count)
+        self._stopping = False
+
+    def stop(self):
+        """Stop after the increments in flight are written"""
+        self._stopping = True
+
+    def _changed(self, name):
+        """Return True if name has bytes past its checkpoint"""
+        if name.startswith('.') or not fnmatch.fnmatch(name, self.pattern):
+            return False
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return False
+        inode, offset, lines, *rest = self.checkpoints.files.get(name, (st.st_ino, 0, 0))
+        generation = rest[0] if rest else 0
+        if inode != st.st_ino or st.st_size < offset:
+            # Replaced or truncated: start over, into new output files
+            offset = lines = 0
+            generation += 1
+        self.checkpoints.files[name] = [st.st_ino, offset, lines, generation]
+        return st.st_size > offset
+
+    def scan(self, names=None):
+        """Queue changed files; names None rescans the whole directory"""
+        if names is None:
+            names = sorted(entry.name for entry in os.scandir(self.directory)
+                           if entry.is_file())
+        for name in names:
+            if name not in self._pending and self._changed(name):
+                self._pending[name] = 0.0
+
+    def dispatch(self, pool):
+        """Submit queued files, keeping at most two increments per worker in flight"""
+        busy = {name for name, _, _ in self._inflight.values()}
+        now = time.monotonic()
+        for name in list(self._pending):
+            if len(self._inflight) >= self.workers * 2:
+                break
+            if name in busy or self._pending[name] > now:
+                continue
+            del self._pending[name]
+            _, offset, lines, generation = self.checkpoints.files[name]
+            stem = os.path.splitext(name)[0]
+            if generation:
+                # A replaced or truncated file starts again at offset 0
+                stem += f".g{generation}"
+            ext = '.txt' if self.fmt == 'text' else thunder_writers.FORMATS[self.fmt][1]
+            # Named after the start offset, so redoing an increment overwrites it
+            out_path = os.path.join(self.output_dir, f"{stem}.{offset:012d}{ext}")
+            future = pool.submit(convert_increment, os.path.join(self.directory, name),
+                                 offset, out_path, self.fmt, lines + 1, self.decode)
+            self._inflight[future] = (name, offset, lines)
+            busy.add(name)
+
+    def collect(self, timeout):
+        """Record finished increments in the checkpoints"""
+        if not self._inflight:
+            return
+        done, _ = wait(self._inflight, timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, offset, lines = self._inflight.pop(future)
+            try:
+                consumed, line_count, ok, failed = future.result()
+            except OSError as e:
+                self._retry(name, e)
+                continue
+            self._failures.pop(name, None)
+            entry = self.checkpoints.files.get(name)
+            if entry is None or entry[1] != offset:
+                continue
+            entry[1] = offset + consumed
+            entry[2] = lines + line_count
+            self.checkpoints.save()
+            if self.log and consumed:
+                self.log(f"{name}: {ok} successful, {failed} failed")
+            if consumed:
+                self.scan([name])
+
+    def _retry(self, name, error):
+        """Queue a file again after a failed increment, with a growing delay"""
+        attempt = self._failures.get(name, 0) + 1
+        if attempt > MAX_RETRIES:
+            # Its next change, or the next rescan, starts a fresh round of retries
+            del self._failures[name]
+            if self.log:
+                self.log(f"{name}: {error}; giving up until the file changes")
+            return
+        self._failures[name] = attempt
+        delay = RETRY_DELAY * 2 ** (attempt - 1)
+        if self.log:
+            self.log(f"{name}: {error}; retrying in {delay:g}s")
+        self._pending[name] = time.monotonic() + delay
+
+    def retry_wait(self):
+        """Seconds until the first queued file may be dispatched"""
+        return max(0.0, min(self._pending.values(), default=0.0) - time.monotonic())
+
+    def run(self, once=False):
+        """Convert until stop() is called, or until the spool is drained if once"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        watcher = None if once else create_watcher(self.directory, self.poll_interval)
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=_ignore_sigint) as pool:
+                self.scan()
+                rescan_due = time.monotonic() + RESCAN_INTERVAL
+                while True:
+                    if not self._stopping:
+                        self.dispatch(pool)
+                    if self._stopping or (once and not self._pending):
+                        if not self._inflight:
+                            break
+                        self.collect(None)
+                        continue
+                    if self._inflight:
+                        self.collect(WAIT_SLICE)
+                        if once:
+                            continue
+                        names = watcher.wait(0)
+                    elif once:
+                        # Only files waiting to be retried are left
+                        time.sleep(self.retry_wait())
+                        continue
+                    elif self._pending:
+                        names = watcher.wait(min(self.poll_interval, self.retry_wait()))
+                    else:
+                        names = watcher.wait(self.poll_interval)
+                    if time.monotonic() >= rescan_due:
+                        names = None
+                        rescan_due = time.monotonic() + RESCAN_INTERVAL
+                    self.scan(names)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.checkpoints.save()
@@ -0,0 +1,165 @@
+'''
+Result writers for thunder-https
+Qt-free helpers that write converted links to files in a streaming way,
+shared by the GUIs and the headless tools.
+
+Structured formats (JSONL, CSV and Parquet) carry one record per input
+link with the FIELDS below, written a batch at a time so memory use does
+not grow with the number of results.
+'''
+from itertools import islice, repeat
+import csv
+import html
+import json
+import re
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+</head>
+<body>
+<h1>{title}</h1>
+<ol>
+"""
+
+HTML_FOOTER = """</ol>
+</body>
+</html>
+"""
+
+FIELDS = ('line', 'link', 'url', 'status', 'error', 'detail', 'host')
+
+# Records formatted and written per write call
+WRITE_BATCH_SIZE = 10000
+# Rows per Parquet row group
+ROW_GROUP_SIZE = 100000
+
+# Host of scheme://[user@]host[:port]/... URLs, IPv6 literals included
+HOST_PATTERN = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://(?:[^@/?#]*@)?(\[[^\]/]*\]|[\w.~%-]+)')
+
+
+def write_html_index(f, urls, title="thunder-https"):
+    """Write an HTML page listing every URL as a link; return the count"""
+    escape = html.escape
+    count = 0
+    f.write(HTML_HEADER.format(title=escape(title)))
+    for url in urls:
+        url = escape(url)
+        f.write(f'<li><a href="{url}">{url}</a></li>\n')
+        count += 1
+    f.write(HTML_FOOTER)
+    return count
+
+
+def url_host(url):
+    """Return the lowercased host of a URL, or None if it has none"""
+    if url is None:
+        return None
+    match = HOST_PATTERN.match(url)
+    if match is None:
+        return None
+    return match.group(1).lower()
+
+
+def iter_records(results, lines=None):
+    """Yield a tuple of FIELDS for each DecodeResult
+
+    lines is an iterable of input line numbers matching the results; it is
+    advanced after each result, so it may be filled while results are read.
+    """
+    for result, line in zip(results, repeat(None) if lines is None else lines):
+        yield (line, result.link, result.url, result.status, result.error,
+               result.detail, url_host(result.url))
+
+
+def _batches(records, size=WRITE_BATCH_SIZE):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_jsonl(f, records):
+    """Write records as JSON Lines to a text file; return the count"""
+    dumps = json.dumps
+    count = 0
+    for batch in _batches(records):
+        f.write(''.join([dumps(dict(zip(FIELDS, record)), ensure_ascii=False) + '\n'
+                         for record in batch]))
+        count += len(batch)
+    return count
+
+
+def write_csv(f, records):
+    """Write records as CSV with a header row; return the count
+
+    f should be opened with newline=''.
+    """
+    writer = csv.writer(f)
+    writer.writerow(FIELDS)
+    count = 0
+    for batch in _batches(records):
+        writer.writerows(batch)
+        count += len(batch)
+    return count
+
+
+def load_pyarrow():
+    """Import pyarrow with its parquet module; ImportError says how to install it"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def write_parquet(f, records):
+    """Write records to a binary file as Parquet; return the count
+
+    Needs the optional pyarrow package.
+    """
+    pyarrow = load_pyarrow()
+    schema = pyarrow.schema([(name, pyarrow.int64() if name == 'line' else pyarrow.string())
+                             for name in FIELDS])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(f, schema) as writer:
+        for batch in _batches(records, ROW_GROUP_SIZE):
+            columns = [list(column) for column in zip(*batch)]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+            count += len(batch)
+    return count
+
+
+# Structured formats: name -> (writer, file extension, binary file)
+FORMATS = {
+    'jsonl': (write_jsonl, '.jsonl', False),
+    'csv': (write_csv, '.csv', False),
+    'parquet': (write_parquet, '.parquet', True),
+}
+
+
+def check_format(fmt):
+    """Raise ImportError if a format needs an optional package that is missing
+
+    Called before the output is opened, so a missing package leaves no
+    empty file behind.
+    """
+    if fmt == 'parquet':
+        load_pyarrow()
+
+
+def save_records(path, fmt, records):
+    """Write records to path in one of FORMATS; return the count
+
+    A path ending in .gz, .bz2 or .xz is written compressed.
+    """
+    import thunder_compress
+    writer, _, binary = FORMATS[fmt]
+    check_format(fmt)
+    with thunder_compress.open_output(path, not binary, 'surrogateescape') as f:
+        return writer(f, records)